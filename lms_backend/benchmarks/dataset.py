@@ -0,0 +1,179 @@
+"""
+Seeded synthetic library data for the benchmarks.
+
+`generate(books, seed)` fills the current database with a catalog shaped like
+load_data's, scaled up: its genres, its authors plus generated ones, and its
+copies per book (1 to 6). Books go through CatalogImporter, so counters, the
+search index and the genre rollups are set as in production.
+
+Loans follow book popularity, drawn from a Pareto distribution, so a few
+titles are lent far more often than the rest. Each copy has a history of
+returned loans, and its latest loan is still out with OPEN_SHARE odds, due
+within two weeks or up to a week overdue. Readers are skewed too: the first
+users borrow most. The same `books` and `seed` always give the same rows.
+"""
+
+import random
+from datetime import date, timedelta
+
+from django.db.models import F  # type: ignore
+
+from myapp import stats
+from myapp.catalog_import import CatalogImporter
+from myapp.management.commands import load_data
+from myapp.models import Book, BookCopies, Reservations, User
+
+# Sign-in details of the users the benchmarks act as
+STAFF_EMAIL = 'benchmark-staff@example.com'
+READER_EMAIL = 'reader0@example.com'
+PASSWORD = 'benchmark'
+
+BOOKS_PER_USER = 10
+BOOKS_PER_AUTHOR = 25
+POPULARITY_ALPHA = 1.5
+MAX_LOANS_PER_COPY = 20
+OPEN_SHARE = 0.3
+LOAN_DAYS = 14
+CHUNK_SIZE = 5000
+
+FIRST_NAMES = [
+    'Ada', 'Alan', 'Alice', 'Amir', 'Ana', 'Ben', 'Carla', 'Chen', 'Dara', 'David', 'Elena', 'Emeka',
+    'Farah', 'Felix', 'Grace', 'Hana', 'Ivan', 'Jonas', 'Julia', 'Kenji', 'Lena', 'Luis', 'Maya', 'Mira',
+    'Noah', 'Nora', 'Omar', 'Paula', 'Priya', 'Rosa', 'Sam', 'Sofia', 'Tariq', 'Vera', 'Yara', 'Zoe',
+]
+LAST_NAMES = [
+    'Adeyemi', 'Berg', 'Castro', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen',
+    'Kowalski', 'Larsen', 'Moreau', 'Novak', 'Okafor', 'Petrov', 'Quinn', 'Rossi', 'Silva', 'Tanaka',
+    'Umarov', 'Varga', 'Weber', 'Xu', 'Yilmaz', 'Zhou',
+]
+ADJECTIVES = [
+    'Silent', 'Broken', 'Golden', 'Hidden', 'Last', 'Lost', 'Distant', 'Burning', 'Secret', 'Forgotten',
+    'Crimson', 'Endless', 'Quiet', 'Winter', 'Wild', 'Northern', 'Hollow', 'Bright', 'Little', 'Iron',
+]
+NOUNS = [
+    'River', 'Garden', 'City', 'Mirror', 'Kingdom', 'Shadow', 'Island', 'Letter', 'House', 'Road',
+    'Ocean', 'Forest', 'Tower', 'Storm', 'Map', 'Orchard', 'Bridge', 'Harbor', 'Clock', 'Lantern',
+    'Machine', 'Winter', 'Empire', 'Sister', 'Stranger', 'Journey', 'Mountain', 'Song', 'Fire', 'Moon',
+]
+
+
+def isbn13(number):
+    """
+    Return the `number`th ISBN-13 of the 979-8 range, which no book in load_data uses.
+    """
+    digits = f'9798{number:08d}'
+    check = -sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(digits)) % 10
+    return f'{digits}{check}'
+
+
+def title(rng):
+    pattern = rng.random()
+    if pattern < 0.4:
+        return f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+    if pattern < 0.7:
+        return f'The {rng.choice(NOUNS)} of the {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+    return f'{rng.choice(NOUNS)}s of {rng.choice(NOUNS)}'
+
+
+def catalog_records(count, rng):
+    """
+    Yield `count` import records, with load_data's genres and copy counts.
+    """
+    authors = [author['name'] for author in load_data.authors]
+    authors += [f'{first} {last}' for first in FIRST_NAMES for last in LAST_NAMES]
+    authors = authors[:max(len(load_data.authors), count // BOOKS_PER_AUTHOR)]
+    genres = [genre['name'] for genre in load_data.genres]
+    quantities = [book['quantity'] for book in load_data.books]
+    for number in range(count):
+        yield {
+            'title': title(rng),
+            # Prolific authors first: lower indexes are drawn more often
+            'author': authors[int(len(authors) * rng.random() ** 2)],
+            'genre': rng.choice(genres),
+            'isbn': isbn13(number),
+            'copies': rng.choice(quantities),
+        }
+
+
+def create_users(count):
+    users = [
+        User(name=f'Reader {i}', email=f'reader{i}@example.com', password='!')
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=CHUNK_SIZE)
+    reader = User.objects.get(email=READER_EMAIL)
+    reader.set_password(PASSWORD)
+    reader.save()
+    User.objects.create_user(name='Benchmark Staff', email=STAFF_EMAIL, password=PASSWORD, is_staff=True)
+    return list(User.objects.filter(is_staff=False).order_by('pk').values_list('pk', flat=True))
+
+
+def lend_copy(copy_id, book_id, popularity, user_ids, today, rng):
+    """
+    Return a copy's loans, oldest first, so its latest loan has the highest id.
+    """
+    count = min(MAX_LOANS_PER_COPY, int(popularity * rng.random()))
+    if not count:
+        return [], False
+    is_out = rng.random() < OPEN_SHARE
+    # The latest loan started up to three weeks ago if still out, else before its return
+    start = today - timedelta(days=rng.randint(0, 21) if is_out else rng.randint(LOAN_DAYS + 1, 60))
+    loans = []
+    for _ in range(count):
+        loans.append(Reservations(
+            user_id=user_ids[int(len(user_ids) * rng.random() ** 2)], book_id=book_id, copy_id=copy_id,
+            start_date=start, due_date=start + timedelta(days=LOAN_DAYS),
+        ))
+        start -= timedelta(days=rng.randint(LOAN_DAYS + 1, 60))
+    loans.reverse()
+    return loans, is_out
+
+
+def create_loans(user_ids, today, rng):
+    """
+    Lend copies book by book, in chunks, and update each chunk's counters.
+    """
+    loans_created = out = 0
+    last_id = 0
+    while True:
+        book_ids = list(Book.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not book_ids:
+            return loans_created, out
+        last_id = book_ids[-1]
+        popularity = {book_id: rng.paretovariate(POPULARITY_ALPHA) for book_id in book_ids}
+        copies = BookCopies.objects.filter(book_id__in=book_ids).order_by('pk').values_list('pk', 'book_id')
+        loans, lent = [], []
+        for copy_id, book_id in copies:
+            history, is_out = lend_copy(copy_id, book_id, popularity[book_id], user_ids, today, rng)
+            loans += history
+            if is_out:
+                lent.append(copy_id)
+        Reservations.objects.bulk_create(loans, batch_size=CHUNK_SIZE)
+        BookCopies.objects.filter(pk__in=lent).update(is_available=False)
+        Book.objects.filter(pk__in=book_ids).with_counted_copies().update(available_copies=F('counted_available'))
+        loans_created += len(loans)
+        out += len(lent)
+
+
+def generate(books, seed, today=None):
+    """
+    Fill the database with `books` books, their copies, users and loans.
+    Returns the number of rows of each kind.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    importer = CatalogImporter(chunk_size=CHUNK_SIZE)
+    for _ in importer.run(catalog_records(books, rng)):
+        pass
+    user_ids = create_users(max(100, books // BOOKS_PER_USER))
+    loans, out = create_loans(user_ids, today, rng)
+    # The importer kept the genre rollups; loans change all of them
+    stats.rebuild()
+    return {
+        'books': importer.stats['books'],
+        'copies': importer.stats['copies'],
+        'authors': importer.stats['authors'],
+        'users': len(user_ids) + 1,
+        'loans': loans,
+        'loans_out': out,
+    }
@@ -0,0 +1,126 @@
+"""
+Minimal HTTP load generator for comparing server modes.
+
+Runs `--concurrency` client threads, each with its own keep-alive connection,
+for `--duration` seconds against one or more paths, then prints throughput
+and latency percentiles. Only the standard library is needed, so it can run
+inside the backend container:
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 \\
+        --path /api/books/ --path /api/books/1/ --concurrency 16 --duration 30
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(url, paths, headers, deadline, results, lock):
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(parts.hostname, parts.port, timeout=60)
+    latencies, errors, reconnects, index = [], 0, 0, 0
+
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server closed an idle keep-alive connection (e.g. a recycled
+            # worker); like browsers do, reconnect and retry the request.
+            reconnects += 1
+            connection.close()
+            continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    connection.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+        results['reconnects'] += reconnects
+
+
+def run(url, paths, concurrency, duration, headers):
+    results = {'latencies': [], 'errors': 0, 'reconnects': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(url, paths, headers, deadline, results, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results['latencies'])
+    return {
+        'requests': len(latencies),
+        'errors': results['errors'],
+        'reconnects': results['reconnects'],
+        'seconds': round(elapsed, 2),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+            'p50': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99': round(percentile(latencies, 0.99) * 1000, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server base URL")
+    parser.add_argument('--path', action='append', dest='paths', help="Path to request (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent client connections")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+    parser.add_argument('--token', help="JWT access token sent as a Bearer Authorization header")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    headers = {'Accept': 'application/json'}
+    if args.token:
+        headers['Authorization'] = f'Bearer {args.token}'
+    paths = args.paths or ['/api/books/']
+
+    summary = run(args.url, paths, args.concurrency, args.duration, headers)
+    if args.json:
+        print(json.dumps(summary))
+        return
+    latency = summary['latency_ms']
+    print(
+        f"{summary['requests']} requests in {summary['seconds']}s, "
+        f"{summary['errors']} errors, {summary['reconnects']} reconnects"
+    )
+    print(f"{summary['requests_per_second']} req/s")
+    print(f"latency ms: mean {latency['mean']}  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure the CPU cost of signing in.
+
+Creates a throwaway user in a fresh in-memory test database, then posts
+`--requests` sign-ins to /api/auth/sign-in/ through Django's test client and
+reports CPU time and password hashes (PBKDF2 derivations) per sign-in. The
+`--double-hash` flow reproduces the old view, which authenticated once in
+UserSignInSerializer and again in TokenObtainPairSerializer, for comparison.
+Run it from the backend directory:
+
+    python benchmarks/login.py --requests 20
+    python benchmarks/login.py --requests 20 --iterations 600000
+"""
+
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_backend.settings_test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import hashers  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer  # noqa: E402
+
+from myapp.serializers.signin_serializers import UserSignInSerializer  # noqa: E402
+
+EMAIL = 'login-benchmark@example.com'
+PASSWORD = 'benchmark-password-123'
+
+
+def sign_in(client):
+    response = client.post('/api/auth/sign-in/', {'email': EMAIL, 'password': PASSWORD},
+                           content_type='application/json')
+    assert response.status_code == 200, response.content
+
+
+def double_hash_sign_in(client):
+    # What SignInAPIView did before minting tokens from the authenticated user
+    serializer = UserSignInSerializer(data={'email': EMAIL, 'password': PASSWORD})
+    assert serializer.is_valid(), serializer.errors
+    tokens = TokenObtainPairSerializer(data={'email': EMAIL, 'password': PASSWORD})
+    assert tokens.is_valid(), tokens.errors
+
+
+def measure(flow, client, requests):
+    derivations = 0
+    pbkdf2 = hashers.pbkdf2
+
+    def counting_pbkdf2(*args, **kwargs):
+        nonlocal derivations
+        derivations += 1
+        return pbkdf2(*args, **kwargs)
+
+    with mock.patch.object(hashers, 'pbkdf2', counting_pbkdf2):
+        flow(client)  # warm up imports and caches
+        derivations = 0
+        started_cpu, started = time.process_time(), time.perf_counter()
+        for _ in range(requests):
+            flow(client)
+        cpu, elapsed = time.process_time() - started_cpu, time.perf_counter() - started
+    return {
+        'cpu_ms': cpu / requests * 1000,
+        'wall_ms': elapsed / requests * 1000,
+        'hashes': derivations / requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20, help="Sign-ins per flow")
+    parser.add_argument('--iterations', type=int, default=None,
+                        help="PASSWORD_HASH_ITERATIONS to hash with (default: Django's)")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    with override_settings(PASSWORD_HASHERS=['myapp.hashers.PBKDF2PasswordHasher'],
+                           PASSWORD_HASH_ITERATIONS=args.iterations):
+        get_user_model().objects.create_user(name='Login Benchmark', email=EMAIL, password=PASSWORD)
+        iterations = hashers.get_hasher().iterations
+        client = Client()
+        print(f"{args.requests} sign-ins per flow, PBKDF2-SHA256 with {iterations} iterations")
+        print(f"{'Flow':<14} {'CPU ms':>8} {'Wall ms':>8} {'Hashes':>7}")
+        for name, flow in (('single-pass', sign_in), ('double-hash', double_hash_sign_in)):
+            result = measure(flow, client, args.requests)
+            print(f"{name:<14} {result['cpu_ms']:>8.1f} {result['wall_ms']:>8.1f} {result['hashes']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
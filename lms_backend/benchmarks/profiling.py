@@ -0,0 +1,94 @@
+"""
+Measure the overhead of request profiling.
+
+Fills a fresh in-memory test database with `--books` books, then times
+`--requests` GETs of the book list and of a book's details through Django's
+test client at each profiling sample rate. Rates take turns in `--rounds`
+rounds, in a rotating order so that drift affects them alike, and each rate's
+median round is reported, with its overhead over profiling being off (rate 0).
+Run it from the backend directory:
+
+    python benchmarks/profiling.py --rounds 20 --requests 200
+    python benchmarks/profiling.py --rates 0 0.01 0.1 1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_backend.settings_test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+
+from myapp import metrics, profiling  # noqa: E402
+from myapp.circulation import add_copies  # noqa: E402
+from myapp.models import Author, Book, Genre  # noqa: E402
+
+
+def create_books(count):
+    author = Author.objects.create(name='Profiling Benchmark')
+    genre = Genre.objects.create(name='Benchmark')
+    books = Book.objects.bulk_create([
+        Book(title=f'Benchmark Book {i}', author=author, genre=genre, isbn='9780306406157') for i in range(count)
+    ])
+    for book in books:
+        add_copies(book, 2)
+    return books
+
+
+def run(client, paths, requests):
+    started = time.perf_counter()
+    for i in range(requests):
+        response = client.get(paths[i % len(paths)])
+        assert response.status_code == 200, response.content
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=200, help="Books in the catalog")
+    parser.add_argument('--rounds', type=int, default=20, help="Rounds of requests per rate")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per rate and round")
+    parser.add_argument('--rates', type=float, nargs='+', default=[0, 0.01, 0.1, 1], help="Sample rates to compare")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    books = create_books(args.books)
+    paths = ['/api/books/', f'/api/books/{books[0].book_id}/']
+
+    # Middleware is set up per client, under the rate in effect at its first request
+    clients = {}
+    for rate in args.rates:
+        with override_settings(PROFILING_SAMPLE_RATE=rate):
+            clients[rate] = Client()
+            run(clients[rate], paths, len(paths))
+
+    rounds = {rate: [] for rate in args.rates}
+    for round_number in range(args.rounds):
+        # Rotate the order, so that no rate always runs first
+        shift = round_number % len(args.rates)
+        for rate in args.rates[shift:] + args.rates[:shift]:
+            rounds[rate].append(run(clients[rate], paths, args.requests) / args.requests)
+    metrics.reset()
+    profiling.reset()
+
+    baseline = statistics.median(rounds[args.rates[0]])
+    print(f"{args.books} books, {args.rounds} rounds of {args.requests} requests per rate (list and detail)")
+    print(f"{'Rate':>6} {'ms/request':>11} {'Overhead':>9}")
+    for rate in args.rates:
+        per_request = statistics.median(rounds[rate])
+        print(f"{rate:>6g} {per_request * 1000:>11.3f} {(per_request / baseline - 1) * 100:>8.1f}%")
+
+
+if __name__ == '__main__':
+    main()
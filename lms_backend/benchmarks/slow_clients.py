@@ -0,0 +1,92 @@
+"""
+Measure how a server copes with slow clients while serving normal traffic.
+
+Opens `--slow-clients` connections that each send their request a few bytes
+at a time over `--trickle` seconds (a phone on a bad network), and meanwhile
+drives `--concurrency` fast keep-alive clients with loadtest.py. A server that
+ties a thread to each connection stalls the fast clients once the slow ones
+hold every thread; an event loop keeps serving them.
+
+    python benchmarks/slow_clients.py --url http://127.0.0.1:8000 \\
+        --path /api/async/books/ --slow-clients 50 --trickle 5 --duration 20
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from loadtest import run as run_fast_clients
+
+
+def slow_client(url, path, trickle, deadline, results, lock):
+    parts = urlsplit(url)
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {parts.hostname}\r\n"
+        "Accept: application/json\r\nConnection: close\r\n\r\n"
+    ).encode('ascii')
+    pause = trickle / len(request)
+    completed = failed = 0
+
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection((parts.hostname, parts.port or 80), timeout=60) as sock:
+                for byte in request:
+                    sock.sendall(bytes([byte]))
+                    time.sleep(pause)
+                response = b''
+                while chunk := sock.recv(65536):
+                    response += chunk
+            if response.startswith(b'HTTP/1.1 200'):
+                completed += 1
+            else:
+                failed += 1
+        except OSError:
+            failed += 1
+
+    with lock:
+        results['completed'] += completed
+        results['failed'] += failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server base URL")
+    parser.add_argument('--path', action='append', dest='paths', help="Path to request (repeatable)")
+    parser.add_argument('--slow-clients', type=int, default=50, help="Connections trickling requests")
+    parser.add_argument('--trickle', type=float, default=5, help="Seconds each slow client takes to send a request")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent fast client connections")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds to run")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    paths = args.paths or ['/api/books/']
+    slow = {'completed': 0, 'failed': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=slow_client, args=(args.url, paths[0], args.trickle, deadline, slow, lock))
+        for _ in range(args.slow_clients)
+    ]
+    for thread in threads:
+        thread.start()
+    # Let the slow clients occupy the server before measuring
+    time.sleep(1)
+    fast = run_fast_clients(args.url, paths, args.concurrency, args.duration - 1, {'Accept': 'application/json'})
+    for thread in threads:
+        thread.join()
+
+    summary = {'fast': fast, 'slow': slow}
+    if args.json:
+        print(json.dumps(summary))
+        return
+    latency = fast['latency_ms']
+    print(f"fast clients: {fast['requests_per_second']} req/s, {fast['errors']} errors, "
+          f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    print(f"slow clients: {slow['completed']} completed, {slow['failed']} failed")
+
+
+if __name__ == '__main__':
+    main()
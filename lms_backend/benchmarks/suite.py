@@ -0,0 +1,281 @@
+"""
+Benchmark the API endpoints against a seeded synthetic catalog.
+
+Fills a fresh in-memory test database with `--books` books and their copies,
+users and loans (see benchmarks/dataset.py), then sends `--requests` requests
+to each endpoint through Django's test client and the real URL routes, after
+`--warmup` unmeasured ones. Reports, per endpoint, the p50/p95/p99 latency,
+the queries (and duplicate queries) per request and the peak Python memory of
+a request, as JSON. Memory is traced in a separate, shorter pass, since tracing
+slows requests down. Run it from the backend directory:
+
+    python benchmarks/suite.py --books 10000 --output before.json
+    python benchmarks/suite.py --books 10000 --baseline before.json
+    python benchmarks/suite.py --books 100000 --database /tmp/books-100k.sqlite3 --endpoints books.list books.search
+
+With `--database`, the generated data is saved to an SQLite file on the first
+run and loaded from it on later ones, so large catalogs are only generated
+once. Runs never change the file. Delete it after schema changes.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_backend.settings_test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+import dataset  # noqa: E402
+from myapp import profiling  # noqa: E402
+from myapp.models import Book, Reservations  # noqa: E402
+
+GENERATOR_VERSION = 1
+
+
+def sign_in(email):
+    client = Client()
+    response = client.post('/api/auth/sign-in/', {'email': email, 'password': dataset.PASSWORD},
+                           content_type='application/json')
+    assert response.status_code == 200, response.content
+    return Client(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+
+
+def endpoints(count, rng):
+    """
+    Return {name: (client, requests)} where `requests` lists `count`
+    (method, path, body) tuples. Mutating endpoints come last, each request
+    acting on a different book or loan.
+    """
+    anonymous, reader, staff = Client(), sign_in(dataset.READER_EMAIL), sign_in(dataset.STAFF_EMAIL)
+    book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+    available = list(Book.objects.filter(available_copies__gt=0).order_by('pk').values_list('pk', flat=True))
+    out = list(Reservations.objects.open_loans().order_by('pk').values_list('pk', flat=True))
+    words = [noun.lower() for noun in dataset.NOUNS]
+    # A page past the first, as a client paging through the catalog would reach it
+    next_page = urlsplit(anonymous.get('/api/books/').json()['next'])
+    today = date.today().isoformat()
+
+    def gets(paths):
+        return [('get', path, None) for path in paths]
+
+    return {
+        'books.list': (anonymous, gets(['/api/books/'] * count)),
+        'books.next_page': (anonymous, gets([f'{next_page.path}?{next_page.query}'] * count)),
+        'books.search': (anonymous, gets(f'/api/books/?q={rng.choice(words)}' for _ in range(count))),
+        'books.detail': (anonymous, gets(f'/api/books/{rng.choice(book_ids)}/' for _ in range(count))),
+        'async.books.list': (anonymous, gets(['/api/async/books/'] * count)),
+        'reservations.list': (reader, gets(['/api/reservations/'] * count)),
+        'reservations.list_staff': (staff, gets(['/api/reservations/'] * count)),
+        'stats.dashboard': (staff, gets(['/api/stats/dashboard/'] * count)),
+        'reservations.checkout': (staff, [
+            ('post', '/api/reservations/', {'email': dataset.READER_EMAIL, 'book_id': book_id, 'start_date': today})
+            for book_id in rng.sample(available, min(count, len(available)))
+        ]),
+        'reservations.return': (staff, [
+            ('put', f'/api/reservations/{reservation_id}/', {})
+            for reservation_id in rng.sample(out, min(count, len(out)))
+        ]),
+    }
+
+
+def send(client, method, path, body):
+    if body is None:
+        return getattr(client, method)(path)
+    return getattr(client, method)(path, json.dumps(body), content_type='application/json')
+
+
+def measure(client, requests):
+    """
+    Send `requests` and return their latencies (seconds), query counts,
+    duplicate query counts and response statuses.
+    """
+    latencies, queries, duplicates, statuses = [], [], [], {}
+    for method, path, body in requests:
+        recorder = profiling.QueryRecorder(slow_seconds=float('inf'))
+        with connection.execute_wrapper(recorder):
+            started = time.perf_counter()
+            response = send(client, method, path, body)
+            latencies.append(time.perf_counter() - started)
+        queries.append(recorder.queries)
+        duplicates.append(recorder.duplicates)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    return latencies, queries, duplicates, statuses
+
+
+def peak_memory(client, requests):
+    """
+    Return the largest Python memory allocated while serving one of `requests`, in KiB.
+    """
+    peak = 0
+    tracemalloc.start()
+    try:
+        for method, path, body in requests:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            send(client, method, path, body)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def summarize(latencies, queries, duplicates, statuses, memory):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'requests': len(latencies),
+        'statuses': statuses,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'duplicate_queries_per_request': round(statistics.fmean(duplicates), 2),
+        'peak_memory_kib': memory,
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision.stdout.strip() + ('-dirty' if dirty.stdout.strip() else '')
+
+
+def load_database(args):
+    """
+    Generate the dataset, or load it from `args.database` when that file was
+    generated with the same parameters. Returns the dataset's description.
+    """
+    params = {'books': args.books, 'seed': args.seed, 'generator': GENERATOR_VERSION}
+    info_path = f'{args.database}.json' if args.database else None
+    if info_path and os.path.exists(args.database):
+        with open(info_path) as info_file:
+            info = json.load(info_file)
+        if {key: info.get(key) for key in params} != params:
+            sys.exit(f"{args.database} holds another dataset ({info_path}); delete it or pick another file.")
+        source = sqlite3.connect(args.database)
+        connection.ensure_connection()
+        source.backup(connection.connection)
+        source.close()
+        # Apply migrations added since the file was generated
+        call_command('migrate', verbosity=0)
+        print(f"Loaded {args.database}", file=sys.stderr)
+        return info
+
+    print(f"Generating {args.books} books (seed {args.seed})...", file=sys.stderr)
+    started = time.perf_counter()
+    counts = dataset.generate(args.books, args.seed)
+    info = {**params, 'generated_on': date.today().isoformat(),
+            'generation_seconds': round(time.perf_counter() - started, 1), 'rows': counts}
+    if info_path:
+        target = sqlite3.connect(args.database)
+        connection.connection.backup(target)
+        target.close()
+        with open(info_path, 'w') as info_file:
+            json.dump(info, info_file, indent=2)
+    print(f"Generated in {info['generation_seconds']} s: {counts}", file=sys.stderr)
+    return info
+
+
+def compare(baseline, results):
+    """
+    Print how each endpoint's p50, p95 and queries changed since `baseline`.
+    """
+    if baseline['dataset']['books'] != results['dataset']['books'] or baseline['dataset']['seed'] != results['dataset']['seed']:
+        print("The baseline used another dataset; the numbers are not comparable.", file=sys.stderr)
+    print(f"{'Endpoint':<26} {'p50 ms':>26} {'p95 ms':>26} {'Queries':>12}", file=sys.stderr)
+    for name, after in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+
+        def change(key):
+            delta = (after[key] / before[key] - 1) * 100 if before[key] else 0
+            return f"{before[key]:g} -> {after[key]:g} ({delta:+.0f}%)"
+
+        print(f"{name:<26} {change('p50_ms'):>26} {change('p95_ms'):>26} "
+              f"{before['queries_per_request']:>5g} -> {after['queries_per_request']:g}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000, help="Books in the catalog (e.g. 10000, 100000, 1000000)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the data generator and request sampling")
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests per endpoint, sent first")
+    parser.add_argument('--memory-requests', type=int, default=20, help="Requests per endpoint in the memory pass")
+    parser.add_argument('--endpoints', nargs='+', help="Endpoints to run (default: all)")
+    parser.add_argument('--database', help="SQLite file to save the generated data to, or load it from")
+    parser.add_argument('--output', help="File to write the JSON results to (default: stdout)")
+    parser.add_argument('--baseline', help="Earlier results to compare with, printed to stderr")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    info = load_database(args)
+
+    rng = random.Random(args.seed)
+    total = args.warmup + args.requests + args.memory_requests
+    suite = endpoints(total, rng)
+    unknown = set(args.endpoints or []) - suite.keys()
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(sorted(unknown))}. Choose from: {', '.join(suite)}.")
+
+    results = {
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'page_size': settings.REST_FRAMEWORK['PAGE_SIZE'],
+        'dataset': info,
+        'endpoints': {},
+    }
+    for name, (client, requests) in suite.items():
+        if args.endpoints and name not in args.endpoints:
+            continue
+        if len(requests) < total:
+            print(f"Skipping {name}: only {len(requests)} books or loans to act on", file=sys.stderr)
+            continue
+        warmup = requests[:args.warmup]
+        measured = requests[args.warmup:args.warmup + args.requests]
+        traced = requests[args.warmup + args.requests:]
+        measure(client, warmup)
+        latencies, queries, duplicates, statuses = measure(client, measured)
+        memory = peak_memory(client, traced) if traced else None
+        results['endpoints'][name] = summarize(latencies, queries, duplicates, statuses, memory)
+        print(f"{name:<26} p50 {results['endpoints'][name]['p50_ms']:>8.2f} ms", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(json.load(baseline_file), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure the due-date sweep over a large loan table.
+
+Fills a fresh in-memory test database with `--loans` open loans due over the
+last 30 days, then times the two passes of `sweep_due_loans`: recording
+notices, and dispatching them to a throwaway FileOutbox. Run it from the
+backend directory:
+
+    python benchmarks/sweep.py --loans 200000
+    python benchmarks/sweep.py --loans 200000 --chunk-size 5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lms_backend.settings_test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from myapp.models import Author, Book, BookCopies, Genre, Reservations, User  # noqa: E402
+from myapp.notices import FileOutbox, dispatch_notices, record_notices  # noqa: E402
+
+TODAY = date(2024, 6, 15)
+
+
+def create_loans(count):
+    author = Author.objects.create(name='Sweep Benchmark')
+    genre = Genre.objects.create(name='Benchmark')
+    book = Book.objects.create(title='Sweep Benchmark', author=author, genre=genre, isbn='9780306406157')
+    users = User.objects.bulk_create(
+        [User(name=f'Reader {i}', email=f'reader{i}@example.com', password='!') for i in range(max(count // 4, 1))],
+        batch_size=5000,
+    )
+    copies = BookCopies.objects.bulk_create(
+        [BookCopies(book=book, is_available=False) for _ in range(count)], batch_size=5000,
+    )
+    Reservations.objects.bulk_create([
+        Reservations(user=users[i % len(users)], book=book, copy=copy, start_date=TODAY,
+                     due_date=TODAY - timedelta(days=i % 30))
+        for i, copy in enumerate(copies)
+    ], batch_size=5000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--loans', type=int, default=200000, help="Open loans to create")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Loans or notices read per query")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    create_loans(args.loans)
+
+    with tempfile.TemporaryDirectory() as outbox_dir:
+        outbox = FileOutbox(os.path.join(outbox_dir, 'notices.ndjson'))
+        print(f"{args.loans} open loans, chunks of {args.chunk_size}")
+        print(f"{'Pass':<10} {'Seconds':>8} {'Rows/s':>9}")
+
+        started = time.perf_counter()
+        recorded = sum(notices for _, notices in record_notices(TODAY, 2, chunk_size=args.chunk_size))
+        elapsed = time.perf_counter() - started
+        print(f"{'record':<10} {elapsed:>8.1f} {recorded / elapsed:>9.0f}")
+
+        started = time.perf_counter()
+        sent = sum(notices for _, notices in dispatch_notices(outbox, chunk_size=args.chunk_size))
+        elapsed = time.perf_counter() - started
+        print(f"{'dispatch':<10} {elapsed:>8.1f} {sent / elapsed:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
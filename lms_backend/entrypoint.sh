@@ -23,6 +23,21 @@ else
     echo "Mock data already loaded, skipping..."
 fi
 
-# Start the Django development server
-echo "Starting Django server..."
-exec python manage.py runserver 0.0.0.0:8000
+# Start the server. SERVER_MODE=wsgi (default) or asgi runs gunicorn with the
+# settings in gunicorn.conf.py; SERVER_MODE=dev runs the auto-reloading
+# development server.
+SERVER_MODE="${SERVER_MODE:-wsgi}"
+case "$SERVER_MODE" in
+    dev)
+        echo "Starting Django development server..."
+        exec python manage.py runserver 0.0.0.0:8000
+        ;;
+    wsgi|asgi)
+        echo "Starting gunicorn ($SERVER_MODE)..."
+        exec gunicorn --config gunicorn.conf.py
+        ;;
+    *)
+        echo "Unknown SERVER_MODE '$SERVER_MODE' (expected wsgi, asgi or dev)" >&2
+        exit 1
+        ;;
+esac
@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration used by entrypoint.sh in production mode.
+
+Every setting can be overridden through the environment, e.g.
+`GUNICORN_WORKERS=4 GUNICORN_TIMEOUT=60`. SERVER_MODE=asgi serves
+lms_backend.asgi with uvicorn workers instead of the WSGI sync/thread workers.
+"""
+
+import multiprocessing
+import os
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# The usual (2 x cores) + 1: enough workers to keep every core busy while
+# others wait on MySQL.
+workers = env_int('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'lms_backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'lms_backend.wsgi:application'
+    # Threads let a sync worker overlap requests blocked on the database
+    threads = env_int('GUNICORN_THREADS', 2)
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Kill and replace a worker stuck on one request for longer than this
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+# On SIGTERM / SIGHUP, let in-flight requests finish for up to this long
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers after roughly this many requests to bound memory growth;
+# the jitter keeps them from all restarting at once.
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    # Open the pool's minimum connections before the worker takes requests,
+    # so the first requests after a (re)start don't pay the handshake.
+    from myapp.db.pool import warm_up_pools
+
+    try:
+        warm_up_pools()
+    except Exception as exc:
+        worker.log.warning("Database pool warm-up failed: %s", exc)
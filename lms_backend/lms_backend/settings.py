@@ -41,9 +41,11 @@ INSTALLED_APPS = [
     'corsheaders',
     'myapp',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
 ]
 
 MIDDLEWARE = [
+    'myapp.middleware.ProfilingMiddleware',  # Only used with PROFILING_SAMPLE_RATE > 0
     'corsheaders.middleware.CorsMiddleware',  # Add this before CommonMiddleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'myapp.middleware.ReplicaRoutingMiddleware',
 ]
 
 
@@ -113,25 +116,39 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'myapp.serializers.auth_serializers.CustomTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'myapp.serializers.auth_serializers.CustomTokenRefreshSerializer',
 }
 
+# Seconds a user's auth fields (staff flag, name, email, active flag) are
+# cached for token authentication; saves and deletes drop them immediately.
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', '60'))
+
 CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'myapp.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'myapp.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '50')),
+    # Sliding-window counters in the default cache (see myapp/throttling.py).
+    # Views with a `throttle_scope` get that scope's rate instead of anon/user.
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'myapp.throttling.AnonSlidingWindowThrottle',
+        'myapp.throttling.UserSlidingWindowThrottle',
+        'myapp.throttling.ScopedSlidingWindowThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '20/minute',
-        'user': '100/minute'
+        'user': '100/minute',
+        'sign-in': '10/minute',  # sign-in, sign-up and token refresh, per client
+        'catalog': '120/minute',  # book listing, search and details
+        'checkout': '30/minute',  # reservations and bulk checkout/return
     }
 }
 
@@ -149,15 +166,144 @@ AUTHENTICATION_BACKENDS = [
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # Stock MySQL backend plus a per-process connection pool (myapp/db/backends/mysql)
+        'ENGINE': 'myapp.db.backends.mysql',
         'NAME': os.environ.get('DB_NAME', 'bookworm'),
         'USER': os.environ.get('DB_USER', 'bookworm_user'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'securepassword'),
         'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
         'PORT': os.environ.get('DB_PORT', '3306'),
+        # Seconds to keep a thread's connection open between requests. Must stay 0
+        # while pooling, which keeps connections open itself.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+        'OPTIONS': {},
+    }
+}
+
+# Connection pool per server worker; set DB_POOL_MAX_SIZE=0 to disable it.
+# Size it so that workers x DB_POOL_MAX_SIZE stays below MySQL's max_connections.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+if DB_POOL_MAX_SIZE > 0:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'max_size': DB_POOL_MAX_SIZE,
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
     }
+
+
+# Read replicas, as "host[:port][=weight]" separated by commas, e.g.
+# DB_REPLICAS="replica1:3306=3,replica2=1". Safe-method requests read from them
+# (see myapp/db/routers.py); writes and transactions always use the primary.
+DATABASE_REPLICAS = {}
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    address, _, weight = replica.strip().partition('=')
+    host, _, port = address.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+
+DATABASE_ROUTERS = ['myapp.db.routers.ReplicaRouter']
+
+# Seconds a replica may lag before it is skipped, and for which a client's reads
+# stay on the primary after it writes. Lag is re-checked at most this often.
+DATABASE_REPLICA_LAG_TOLERANCE = float(os.environ.get('DB_REPLICA_LAG_TOLERANCE', '5'))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', '10'))
+
+
+# Caches. The `catalog` alias holds serialized books and list pages (see
+# myapp/cache.py). Set REDIS_URL to share it between workers; otherwise each
+# process keeps its own local-memory cache. Both evict least-recently-used
+# keys when full (for Redis, run it with `maxmemory-policy allkeys-lru`).
+REDIS_URL = os.environ.get('REDIS_URL')
+
+CACHES = {
+    # Shared between workers when Redis is available: holds throttling counters
+    # and read-after-write pins for the replica router.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'lms-default',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'lms',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', '10000'))},
+    },
 }
 
+# Seconds a cached book payload, and a cached list or search page, may be served
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '300'))
+CATALOG_LIST_CACHE_TIMEOUT = int(os.environ.get('CATALOG_LIST_CACHE_TIMEOUT', '60'))
+
+
+# Catalog search backend used by BookListView (see myapp/search.py).
+BOOK_SEARCH_BACKEND = os.environ.get('BOOK_SEARCH_BACKEND', 'myapp.search.MySQLFullTextBackend')
+
+
+# Overdue and due-soon notices (see myapp/notices.py), sent by
+# `manage.py sweep_due_loans`. The outbox is myapp.notices.FileOutbox, which
+# appends batches to LOAN_NOTICE_OUTBOX_PATH, or myapp.notices.EmailOutbox.
+LOAN_NOTICE_OUTBOX = os.environ.get('LOAN_NOTICE_OUTBOX', 'myapp.notices.FileOutbox')
+LOAN_NOTICE_OUTBOX_PATH = os.environ.get('LOAN_NOTICE_OUTBOX_PATH', str(BASE_DIR / 'outbox' / 'loan_notices.ndjson'))
+LOAN_DUE_SOON_DAYS = int(os.environ.get('LOAN_DUE_SOON_DAYS', '2'))
+
+
+# Request profiling (see myapp/profiling.py): the share of requests, from 0
+# (off) to 1, whose wall time, database time and queries are recorded per view
+# in /api/metrics/, and the duration from which a query's SQL and stack are
+# kept at /api/metrics/slow-queries/, up to PROFILING_SLOW_QUERY_LOG_SIZE.
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SLOW_QUERY_MS = float(os.environ.get('PROFILING_SLOW_QUERY_MS', '100'))
+PROFILING_SLOW_QUERY_LOG_SIZE = int(os.environ.get('PROFILING_SLOW_QUERY_LOG_SIZE', '100'))
+
+
+# Refresh token blacklist (see myapp/token_blacklist.py). A Bloom filter of
+# blacklisted tokens lets most refreshes skip the blacklist lookup: 'redis'
+# shares it through the default cache, 'local' keeps one per process (only
+# for a single server process), 'off' always queries. Expired tokens are
+# pruned one batch at a time, at most every TOKEN_BLACKLIST_PRUNE_INTERVAL
+# seconds; `manage.py compact_token_blacklist` prunes them all.
+TOKEN_BLACKLIST_BLOOM = os.environ.get('TOKEN_BLACKLIST_BLOOM', 'redis' if REDIS_URL else 'off')
+TOKEN_BLACKLIST_BLOOM_CAPACITY = int(os.environ.get('TOKEN_BLACKLIST_BLOOM_CAPACITY', '1000000'))
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = float(os.environ.get('TOKEN_BLACKLIST_BLOOM_ERROR_RATE', '0.01'))
+TOKEN_BLACKLIST_PRUNE_INTERVAL = int(os.environ.get('TOKEN_BLACKLIST_PRUNE_INTERVAL', '3600'))
+TOKEN_BLACKLIST_PRUNE_BATCH_SIZE = int(os.environ.get('TOKEN_BLACKLIST_PRUNE_BATCH_SIZE', '1000'))
+
+
+# Password hashing. New passwords are hashed with PASSWORD_HASHER; hashes made
+# by the other hashers below still verify, and are re-hashed with it when their
+# user signs in. The same goes for PBKDF2 hashes whose iteration count differs
+# from PASSWORD_HASH_ITERATIONS (Django's default, 1,000,000, when unset).
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2_sha256')
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', '0')) or None
+
+_PASSWORD_HASHERS = {
+    'pbkdf2_sha256': 'myapp.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',  # needs argon2-cffi
+    'bcrypt_sha256': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',  # needs bcrypt
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
 
 
 # Password validation
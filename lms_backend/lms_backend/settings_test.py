@@ -10,8 +10,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # A separate database standing in for a read replica. Nothing replicates
+    # into it, so tests can tell which database a read went to. Replica routing
+    # is off unless a test enables it with DATABASE_REPLICAS.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
+DATABASE_REPLICAS = {}
 
 # Speed up password hashing in tests
 PASSWORD_HASHERS = [
@@ -21,3 +29,20 @@ PASSWORD_HASHERS = [
 # Disable throttling for tests
 REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] = []
 REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}
+
+# SQLite has no FULLTEXT indexes; use the portable inverted index
+BOOK_SEARCH_BACKEND = 'myapp.search.InvertedIndexBackend'
+
+# Tests share one process, so a real catalog cache would leak between them;
+# tests of the cache itself override this with a local-memory cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Tests run in one process, where a per-process Bloom filter is exact
+TOKEN_BLACKLIST_BLOOM = 'local'
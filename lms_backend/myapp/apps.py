@@ -4,3 +4,12 @@ from django.apps import AppConfig # type: ignore
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        # Register signal handlers
+        from myapp import signals  # noqa: F401
+
+        # Report connection pool occupancy and wait times on /api/metrics/
+        from myapp import metrics
+        from myapp.db.pool import pool_stats
+        metrics.register_gauge('db_pool', pool_stats)
@@ -0,0 +1,143 @@
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.core.exceptions import ValidationError  # type: ignore
+from django.db import transaction  # type: ignore
+from django.utils.translation import gettext_lazy as _  # type: ignore
+from rest_framework_simplejwt.authentication import JWTAuthentication  # type: ignore
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken  # type: ignore
+from rest_framework_simplejwt.settings import api_settings  # type: ignore
+from rest_framework_simplejwt import tokens  # type: ignore
+
+from myapp import metrics, token_blacklist
+from myapp.models import User
+
+# User fields carried in access tokens and in the user cache
+USER_CLAIMS = ('email', 'name', 'is_staff')
+
+# Cached for users that don't exist (any more), so bad tokens don't query either
+MISSING = 'missing'
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    RefreshToken whose blacklist checks go through the Bloom filter in
+    myapp.token_blacklist, skipping the database for tokens it rules out.
+    """
+
+    def check_blacklist(self):
+        if not token_blacklist.surely_not_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        # Into the filter first: a false positive only costs a lookup
+        token_blacklist.add_blacklisted(self.payload[api_settings.JTI_CLAIM])
+        blacklisted = super().blacklist()
+        token_blacklist.prune_if_due()
+        return blacklisted
+
+
+def add_user_claims(token, user):
+    """
+    Put USER_CLAIMS of `user` into `token` (and the access tokens minted from it).
+    """
+    for field in USER_CLAIMS:
+        token[field] = getattr(user, field)
+    return token
+
+
+def tokens_for(user):
+    """
+    Return a refresh token for `user` carrying its USER_CLAIMS.
+    """
+    return add_user_claims(RefreshToken.for_user(user), user)
+
+
+def claimed_user_id(validated_token):
+    """
+    Return the user id of `validated_token` as a primary key value (tokens carry it as a string).
+    """
+    try:
+        return User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+    except (KeyError, ValidationError):
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _load_state(user_id):
+    values = User.objects.filter(pk=user_id).values('is_active', *USER_CLAIMS).first()
+    return values if values is not None else MISSING
+
+
+def user_state(user_id):
+    """
+    Return the cached auth fields of `user_id` (or MISSING), loading them on a miss.
+    """
+    state = cache.get(user_key(user_id))
+    metrics.incr('auth.user.hit' if state is not None else 'auth.user.miss')
+    if state is None:
+        state = _load_state(user_id)
+        cache.set(user_key(user_id), state, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+    return state
+
+
+async def auser_state(user_id):
+    """
+    Async version of user_state().
+    """
+    state = await cache.aget(user_key(user_id))
+    metrics.incr('auth.user.hit' if state is not None else 'auth.user.miss')
+    if state is None:
+        values = await User.objects.filter(pk=user_id).values('is_active', *USER_CLAIMS).afirst()
+        state = values if values is not None else MISSING
+        await cache.aset(user_key(user_id), state, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+    return state
+
+
+def invalidate_user(user_id):
+    """
+    Forget the cached auth fields of `user_id`, now and again on commit.
+    """
+    cache.delete(user_key(user_id))
+    transaction.on_commit(lambda: cache.delete(user_key(user_id)))
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError("Request users built from the auth cache are read-only; load the User to change it.")
+
+
+def build_user(user_id, state):
+    """
+    Return a User instance holding only the cached fields, for request.user.
+
+    It is enough for permission checks, filters (`user=request.user`) and the
+    claims, but has no password, so saving and deleting it are refused.
+    """
+    if state == MISSING:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not state['is_active']:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    user = User(pk=user_id, **{field: state[field] for field in USER_CLAIMS})
+    user._state.adding = False
+    user.save = user.delete = _read_only
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from a short-lived cache.
+
+    The user's email, name, staff flag and active flag are cached for
+    AUTH_USER_CACHE_TIMEOUT seconds, and dropped when the user is saved or
+    deleted, so most requests cost no query. The same fields are also added
+    to tokens as claims for clients. They are not trusted on their own,
+    because a token outlives a demotion or deletion by up to its lifetime,
+    while the cache bounds that to its timeout even where invalidation can't
+    reach (a per-process cache).
+    """
+
+    def get_user(self, validated_token):
+        user_id = claimed_user_id(validated_token)
+        return build_user(user_id, user_state(user_id))
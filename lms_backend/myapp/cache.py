@@ -0,0 +1,128 @@
+import hashlib
+import time
+
+from django.conf import settings  # type: ignore
+from django.core.cache import caches  # type: ignore
+from django.db import transaction  # type: ignore
+
+from myapp import metrics
+from myapp.models import Book
+
+# Catalog reads are cached in their own alias so they can live in a shared
+# store (Redis) while the default cache stays process-local.
+CACHE_ALIAS = 'catalog'
+GENERATION_KEY = 'catalog:generation'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def book_key(book_id):
+    return f'catalog:book:{book_id}'
+
+
+def _generation(cache):
+    """
+    Return the current listing generation, starting one if it was evicted.
+
+    A fresh generation starts from the clock so it never reuses a value that
+    keys of an older generation may still be stored under.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def listing_key(request):
+    """
+    Key for a book list or search page, scoped to the listing generation.
+    """
+    url = request.build_absolute_uri()
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return f'catalog:list:{_generation(get_cache())}:{digest}'
+
+
+def book_payloads(book_ids, serialize):
+    """
+    Return the serialized payloads of `book_ids`, in order, reading through the cache.
+
+    Books not cached are loaded in one query and serialized with `serialize`,
+    which takes a list of books and returns their payloads. Ids of books that
+    no longer exist are skipped.
+    """
+    cache = get_cache()
+    cached = cache.get_many([book_key(book_id) for book_id in book_ids])
+    payloads = {book_id: cached[book_key(book_id)] for book_id in book_ids if book_key(book_id) in cached}
+    missing = [book_id for book_id in book_ids if book_id not in payloads]
+    metrics.incr('catalog.book.hit', len(payloads))
+    metrics.incr('catalog.book.miss', len(missing))
+
+    if missing:
+        books = list(Book.objects.with_listing_data().filter(pk__in=missing))
+        fresh = dict(zip([book.pk for book in books], serialize(books)))
+        store_books(fresh)
+        payloads.update(fresh)
+    return [payloads[book_id] for book_id in book_ids if book_id in payloads]
+
+
+def store_books(payloads):
+    """
+    Cache serialized books, keyed by book id.
+    """
+    if payloads:
+        get_cache().set_many(
+            {book_key(book_id): dict(payload) for book_id, payload in payloads.items()},
+            timeout=settings.CATALOG_CACHE_TIMEOUT,
+        )
+
+
+def get_listing(key):
+    """
+    Return the cached listing under `key`: a dict with the page's book `ids`
+    and, for paginated listings, its `links`. None on a miss.
+    """
+    listing = get_cache().get(key)
+    metrics.incr('catalog.list.hit' if listing is not None else 'catalog.list.miss')
+    return listing
+
+
+def store_listing(key, books, payloads, links=None):
+    """
+    Cache a listing page as book ids plus the payloads of its books, so a
+    change to one book invalidates its payload without dropping the page.
+    """
+    store_books({book.pk: payload for book, payload in zip(books, payloads)})
+    get_cache().set(
+        key,
+        {'ids': [book.pk for book in books], 'links': links},
+        timeout=settings.CATALOG_LIST_CACHE_TIMEOUT,
+    )
+
+
+def _invalidate(book_ids, listings):
+    cache = get_cache()
+    if book_ids:
+        cache.delete_many([book_key(book_id) for book_id in book_ids])
+    if listings:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Evicted: the next read starts a new generation anyway
+            pass
+
+
+def invalidate_books(book_ids, listings=False):
+    """
+    Drop the cached payloads of `book_ids`. With `listings=True`, also retire
+    every cached list and search page, for changes that can move books between
+    pages (creates, deletes and edits of searchable fields).
+
+    Keys are dropped right away, so reads later in the same transaction miss,
+    and again on commit, in case a concurrent read cached the old rows.
+    """
+    book_ids = list(book_ids)
+    _invalidate(book_ids, listings)
+    transaction.on_commit(lambda: _invalidate(book_ids, listings))
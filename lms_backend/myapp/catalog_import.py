@@ -0,0 +1,311 @@
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction  # type: ignore
+from stdnum import isbn as stdnum_isbn  # type: ignore
+
+from myapp import stats
+from myapp.cache import invalidate_books
+from myapp.models import Author, Book, BookCopies, Genre
+from myapp.search import get_search_backend
+
+# Input formats, and the file extensions they are recognized by
+FORMATS = {
+    'csv': ('.csv',),
+    'ndjson': ('.ndjson', '.jsonl'),
+    'marc': ('.mrk', '.marc'),
+}
+
+# Alternative column / key names accepted for each record field
+FIELD_ALIASES = {
+    'author_name': 'author',
+    'genre_name': 'genre',
+    'quantity': 'copies',
+    'copy_number': 'copies',
+}
+
+MAX_COPIES = 1000
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def detect_format(path):
+    """
+    Return the input format of `path` from its extension.
+    """
+    lowered = path.lower()
+    for name, extensions in FORMATS.items():
+        if lowered.endswith(extensions):
+            return name
+    raise ValueError(f"Cannot tell the format of {path}; pass one of: {', '.join(FORMATS)}.")
+
+
+def normalize_keys(record):
+    normalized = {}
+    for key, value in record.items():
+        key = str(key).strip().lower()
+        normalized[FIELD_ALIASES.get(key, key)] = value
+    return normalized
+
+
+def read_csv(lines):
+    """
+    Read records from CSV with a header row naming title, author, genre,
+    isbn and (optionally) copies.
+    """
+    for row in csv.DictReader(lines):
+        yield normalize_keys(row)
+
+
+def read_ndjson(lines):
+    """
+    Read one JSON object per line. Unparsable lines become InvalidRecord
+    entries, so the rest of the file still imports.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield InvalidRecord("Invalid JSON.")
+            continue
+        yield normalize_keys(record) if isinstance(record, dict) else InvalidRecord("Not a JSON object.")
+
+
+def _subfields(content):
+    """
+    Split a mnemonic MARC data field ("10$aTitle :$bsubtitle") into {code: [values]}.
+    """
+    subfields = {}
+    for part in content[2:].split('$')[1:]:
+        if part:
+            subfields.setdefault(part[0], []).append(part[1:].strip())
+    return subfields
+
+
+def _marc_record(fields):
+    def first(tag, code='a'):
+        for content in fields.get(tag, []):
+            values = _subfields(content).get(code)
+            if values:
+                return values[0]
+        return None
+
+    title = first('245')
+    subtitle = first('245', 'b')
+    if title and subtitle:
+        title = f"{title.rstrip(' :;/')}: {subtitle}"
+    isbn = first('020')
+    return {
+        'title': title.rstrip(' /:;,.') if title else None,
+        'author': (first('100') or first('110') or first('700') or '').rstrip(' ,.') or None,
+        'genre': (first('655') or first('650') or '').rstrip(' .') or None,
+        # "9780306406157 (pbk.)": the qualifier is not part of the ISBN
+        'isbn': isbn.split()[0] if isbn else None,
+        # One 952 holdings field per item, as in Koha exports
+        'copies': len(fields.get('952', [])) or 1,
+    }
+
+
+def read_marc(lines):
+    """
+    Read MARC-lite: mnemonic MARC text (MarcEdit .mrk), one `=TAG  content`
+    line per field, records separated by blank lines or `=LDR`. Uses 245
+    $a/$b (title), 100/110/700 $a (author), 655/650 $a (genre), 020 $a (ISBN)
+    and one 952 field per copy.
+    """
+    fields = {}
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('=LDR') or not line.strip():
+            if fields:
+                yield _marc_record(fields)
+            fields = {}
+            continue
+        if line.startswith('=') and len(line) > 4:
+            fields.setdefault(line[1:4], []).append(line[6:])
+    if fields:
+        yield _marc_record(fields)
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+    'marc': read_marc,
+}
+
+
+def read_records(lines, input_format):
+    return READERS[input_format](lines)
+
+
+def _text(record, field, max_length):
+    value = record.get(field)
+    value = str(value).strip() if value is not None else None
+    if not value:
+        raise InvalidRecord(f"{field} is required.")
+    if len(value) > max_length:
+        raise InvalidRecord(f"{field} is longer than {max_length} characters.")
+    return value
+
+
+def clean_record(record):
+    """
+    Validate a record and return (title, author, genre, isbn, copies), with
+    text stripped and the ISBN as compact ISBN-13. Text is stored as given, like
+    load_data and the serializer do; the frontend escapes it on display.
+    Raises InvalidRecord with the reason otherwise.
+    """
+    if isinstance(record, InvalidRecord):
+        raise record
+    title = _text(record, 'title', Book._meta.get_field('title').max_length)
+    author = _text(record, 'author', Author._meta.get_field('name').max_length)
+    genre = _text(record, 'genre', Genre._meta.get_field('name').max_length)
+
+    isbn = str(record.get('isbn') or '').strip()
+    if not stdnum_isbn.is_valid(isbn):
+        raise InvalidRecord(f"Invalid ISBN {isbn!r}.")
+    isbn = stdnum_isbn.to_isbn13(stdnum_isbn.compact(isbn))
+
+    copies = record.get('copies')
+    try:
+        copies = 1 if copies in (None, '') else int(copies)
+    except (TypeError, ValueError):
+        raise InvalidRecord("copies must be an integer.")
+    if not 0 <= copies <= MAX_COPIES:
+        raise InvalidRecord(f"copies must be between 0 and {MAX_COPIES}.")
+    return title, author, genre, isbn, copies
+
+
+class CatalogImporter:
+    """
+    Import catalog records in chunks, one transaction per chunk.
+
+    Each chunk costs a constant number of queries: authors and genres are
+    resolved through in-memory name -> id maps (filled by one lookup per
+    chunk for names not seen yet, with bulk creates for new ones), books
+    whose ISBN is already catalogued are skipped, and new books and their
+    copies are bulk-created with their counters set. Skipping known ISBNs
+    makes re-running a chunk harmless, which is what makes imports resumable.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.authors = {}
+        self.genres = {}
+        self.stats = Counter()
+
+    def run(self, records, offset=0):
+        """
+        Import `records`, skipping the first `offset`. After each committed
+        chunk, yields the offset reached and the chunk's rejected records as
+        (record number, reason) pairs.
+        """
+        entries = islice(enumerate(records, start=1), offset, None)
+        while True:
+            chunk = list(islice(entries, self.chunk_size))
+            if not chunk:
+                return
+            try:
+                with transaction.atomic():
+                    errors = self.import_chunk(chunk)
+            except Exception:
+                # Ids created in the rolled-back transaction are gone
+                self.authors.clear()
+                self.genres.clear()
+                raise
+            offset += len(chunk)
+            yield offset, errors
+
+    def import_chunk(self, entries):
+        errors = []
+        rows = []
+        for number, record in entries:
+            try:
+                rows.append(clean_record(record))
+            except InvalidRecord as e:
+                errors.append((number, str(e)))
+        self.stats['invalid'] += len(errors)
+
+        existing = self.catalogued({row[3] for row in rows})
+        new_rows = []
+        for row in rows:
+            if row[3] in existing:
+                self.stats['existing'] += 1
+            else:
+                existing.add(row[3])
+                new_rows.append(row)
+        if not new_rows:
+            return errors
+
+        authors = self.resolve(Author, self.authors, {row[1] for row in new_rows}, 'authors')
+        genres = self.resolve(Genre, self.genres, {row[2] for row in new_rows}, 'genres')
+        Book.objects.bulk_create(
+            [
+                Book(
+                    title=title, author_id=authors[author], genre_id=genres[genre], isbn=isbn,
+                    quantity=copies, total_copies=copies, available_copies=copies,
+                )
+                for title, author, genre, isbn, copies in new_rows
+            ],
+            batch_size=self.chunk_size,
+        )
+        # Not every backend returns ids from bulk inserts (MySQL doesn't)
+        book_ids = dict(
+            Book.objects.filter(isbn__in=[row[3] for row in new_rows]).order_by('pk').values_list('isbn', 'pk')
+        )
+        BookCopies.objects.bulk_create(
+            [
+                BookCopies(book_id=book_ids[isbn], is_available=True)
+                for _, _, _, isbn, copies in new_rows
+                for _ in range(copies)
+            ],
+            batch_size=self.chunk_size,
+        )
+        counts = {book_ids[isbn]: copies for _, _, _, isbn, copies in new_rows}
+        stats.record(
+            total=counts, available=counts,
+            genres={book_ids[isbn]: genres[genre] for _, _, genre, isbn, _ in new_rows},
+        )
+
+        get_search_backend().index_books(book_ids.values())
+        # New books have no cached payloads, only listings to retire
+        invalidate_books([], listings=True)
+        self.stats['books'] += len(new_rows)
+        self.stats['copies'] += sum(row[4] for row in new_rows)
+        return errors
+
+    @staticmethod
+    def catalogued(isbns):
+        """
+        Return which of `isbns` (ISBN-13) are already in the catalog, which may
+        also hold ISBN-10s.
+        """
+        isbn10s = {stdnum_isbn.to_isbn10(isbn): isbn for isbn in isbns if isbn.startswith('978')}
+        found = Book.objects.filter(isbn__in=isbns | isbn10s.keys()).values_list('isbn', flat=True)
+        return {isbn10s.get(isbn, isbn) for isbn in found}
+
+    def resolve(self, model, known, names, stat):
+        """
+        Return {name: pk} for `names`, creating the ones not in the table.
+        """
+        missing = names - known.keys()
+        if missing:
+            self._load(model, known, missing)
+            created = missing - known.keys()
+            if created:
+                model.objects.bulk_create([model(name=name) for name in created], batch_size=self.chunk_size)
+                self._load(model, known, created)
+                self.stats[stat] += len(created)
+        return known
+
+    @staticmethod
+    def _load(model, known, names):
+        # Names aren't unique; like get_or_create would, use the oldest row
+        for pk, name in model.objects.filter(name__in=names).order_by('pk').values_list('pk', 'name'):
+            known.setdefault(name, pk)
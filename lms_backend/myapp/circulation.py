@@ -0,0 +1,489 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction  # type: ignore
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When  # type: ignore
+from django.db.models.functions import Coalesce  # type: ignore
+from django.utils import timezone  # type: ignore
+
+from myapp import stats
+from myapp.cache import invalidate_books
+from myapp.models import Book, BookCopies, Reservations, Waitlist
+
+LOAN_PERIOD = timedelta(days=7)
+# How long a returned copy is held for the head of the waitlist
+HOLD_PERIOD = timedelta(days=3)
+# How long a place in a waitlist lasts unless the reader asks otherwise
+WAITLIST_PERIOD = timedelta(days=90)
+
+
+class CopyUnavailable(Exception):
+    """
+    Raised when the requested copy, or every copy of a book, is already on loan.
+    """
+
+
+class AlreadyWaiting(Exception):
+    """
+    Raised when a reader joins the waitlist of a book they are already waiting for.
+    """
+
+
+class CopyAvailable(Exception):
+    """
+    Raised when a reader joins the waitlist of a book that has a copy to lend.
+    """
+
+
+def _unheld(q=Q()):
+    """
+    Narrow the copy filter `q` to copies not on hold. The hold check is a
+    subquery rather than a join, so UPDATEs through it keep a single-table WHERE.
+    """
+    return q & ~Exists(Waitlist.objects.filter(copy=OuterRef('pk')))
+
+
+def add_copies(book, count):
+    """
+    Create `count` available copies of `book` and bump its copy counters.
+    """
+    BookCopies.objects.bulk_create([BookCopies(book=book, is_available=True) for _ in range(count)])
+    Book.objects.filter(pk=book.pk).update(
+        # First: MySQL evaluates SET clauses in order, reading columns already set
+        quantity=F('total_copies') + count,
+        total_copies=F('total_copies') + count,
+        available_copies=F('available_copies') + count,
+    )
+    book.refresh_from_db(fields=['total_copies', 'available_copies', 'quantity'])
+    stats.record(total={book.pk: count}, available={book.pk: count}, genres={book.pk: book.genre_id})
+    invalidate_books([book.pk])
+
+
+def _claim_copy(book_id, copy_id):
+    """
+    Flip one available copy of `book_id` to checked out and return its id.
+
+    The `UPDATE ... WHERE is_available` is what makes the claim exclusive: of
+    two concurrent checkouts of the same copy, only one updates a row. When
+    `copy_id` is None the lowest free copy is picked; on databases supporting
+    it, copies locked by another checkout are skipped instead of waited on.
+    Copies on hold for a waitlist are not claimed.
+    """
+    available = BookCopies.objects.filter(_unheld(), book_id=book_id, is_available=True)
+    if copy_id is not None:
+        return copy_id if available.filter(pk=copy_id).update(is_available=False) else None
+
+    tried = []
+    while True:
+        candidate = (
+            available.exclude(pk__in=tried)
+            .select_for_update(skip_locked=True)
+            .order_by('copy_id')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        if available.filter(pk=candidate).update(is_available=False):
+            return candidate
+        # Taken by a concurrent checkout between the read and the update
+        tried.append(candidate)
+
+
+@transaction.atomic
+def checkout(user, book_id, start_date, copy_id=None):
+    """
+    Lend a copy of `book_id` to `user` and return the new reservation.
+
+    Picks a free copy when `copy_id` is omitted, or the copy on hold for
+    `user`, if any. Raises Book.DoesNotExist or BookCopies.DoesNotExist for
+    an unknown book or copy, and CopyUnavailable if the copy, or every copy,
+    is on loan or on hold. The loan ends the user's wait for the book.
+    """
+    entry = Waitlist.objects.filter(user=user, book_id=book_id).values_list('queue_id', 'copy_id').first()
+    held = entry[1] if entry else None
+    if held is not None and copy_id in (None, held):
+        claimed = held if BookCopies.objects.filter(pk=held, is_available=True).update(is_available=False) else None
+    else:
+        claimed = _claim_copy(book_id, copy_id)
+    if claimed is None:
+        if not Book.objects.filter(pk=book_id).exists():
+            raise Book.DoesNotExist("Book not found.")
+        if copy_id is None:
+            raise CopyUnavailable("No copies of this book are available.")
+        if not BookCopies.objects.filter(pk=copy_id, book_id=book_id).exists():
+            raise BookCopies.DoesNotExist("Copy not found for this book.")
+        raise CopyUnavailable("This copy is not available.")
+
+    due_date = start_date + LOAN_PERIOD
+    # A held copy was already taken off available_copies when the hold was placed
+    _adjust_available(
+        {book_id: -1} if claimed != held else {}, changed=[book_id],
+        on_loan={book_id: 1}, borrowed={book_id: 1}, due={due_date: 1},
+    )
+    if entry:
+        Waitlist.objects.filter(pk=entry[0]).delete()
+        if held is not None and claimed != held:
+            # They took another copy; theirs goes to the next reader in line
+            _shelve({book_id: [held]})
+    invalidate_books([book_id])
+    return Reservations.objects.create(
+        user=user,
+        book_id=book_id,
+        copy=BookCopies(pk=claimed, book_id=book_id, is_available=False),
+        start_date=start_date,
+        due_date=due_date,
+    )
+
+
+def _adjust_available(deltas, changed=(), **rollups):
+    """
+    Add `deltas[book_id]` to the available_copies of each book in one UPDATE,
+    and record the change in the dashboard rollups along with the other
+    `rollups` changes (see myapp.stats.record) of the same operation.
+
+    Books of `changed` whose copies changed without their counter doing so
+    (copies put on or taken off hold) are stamped as modified all the same,
+    since their copy lists, and so their ETags, changed.
+    """
+    stats.record(available=deltas, **rollups)
+    untouched = [book_id for book_id in changed if book_id not in deltas]
+    if untouched:
+        Book.objects.filter(pk__in=untouched).touch()
+    if not deltas:
+        return
+    delta = Case(
+        *[When(pk=book_id, then=Value(change)) for book_id, change in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    Book.objects.filter(pk__in=list(deltas)).update(available_copies=F('available_copies') + delta)
+
+
+@transaction.atomic
+def bulk_checkout(loans):
+    """
+    Check out many copies in one transaction and a constant number of queries.
+
+    `loans` is a list of (user, book_id, copy_id, start_date) tuples, with
+    copy_id None to pick a free copy. Returns a list aligned with `loans`
+    holding either the new Reservation or the exception checkout() would
+    have raised for that loan; failed loans do not affect the others. As in
+    checkout(), readers get the copy on hold for them, and their loans end
+    their wait.
+    """
+    if not loans:
+        return []
+    book_ids = {book_id for _, book_id, _, _ in loans}
+    copy_ids = {copy_id for _, _, copy_id, _ in loans if copy_id is not None}
+    auto_book_ids = {book_id for _, book_id, copy_id, _ in loans if copy_id is None}
+
+    books = Book.objects.only('book_id', 'title', 'genre').in_bulk(list(book_ids))
+    known_copies = dict(
+        BookCopies.objects.filter(pk__in=list(copy_ids)).values_list('pk', 'book_id')
+    ) if copy_ids else {}
+    entries = {
+        (user_id, book_id): (queue_id, held)
+        for queue_id, user_id, book_id, held in Waitlist.objects.filter(
+            user__in={user.pk for user, _, _, _ in loans}, book_id__in=list(book_ids),
+        ).values_list('queue_id', 'user_id', 'book_id', 'copy_id')
+    }
+    # Copies on hold for these readers; copies on hold for anyone else are left alone
+    holders = {held: user_id for (user_id, _), (_, held) in entries.items() if held is not None}
+    free = list(
+        BookCopies.objects
+        .filter(
+            _unheld(Q(pk__in=list(copy_ids)) | Q(book_id__in=list(auto_book_ids))) | Q(pk__in=list(holders)),
+            is_available=True,
+        )
+        .select_for_update()
+        .order_by('copy_id')
+        .values_list('pk', 'book_id')
+    )
+    free_ids = {pk for pk, _ in free}
+    free_by_book = {}
+    for pk, book_id in free:
+        if pk not in copy_ids and pk not in holders:
+            free_by_book.setdefault(book_id, []).append(pk)
+
+    results = []
+    claimed = {}
+    settled = {}
+    for user, book_id, copy_id, start_date in loans:
+        if book_id not in books:
+            results.append(Book.DoesNotExist("Book not found."))
+            continue
+        queue_id, held = entries.get((user.pk, book_id), (None, None))
+        if copy_id is None and held in free_ids and held not in claimed:
+            copy_id = held
+        elif copy_id is None:
+            if not free_by_book.get(book_id):
+                results.append(CopyUnavailable("No copies of this book are available."))
+                continue
+            copy_id = free_by_book[book_id].pop(0)
+        elif known_copies.get(copy_id) != book_id:
+            results.append(BookCopies.DoesNotExist("Copy not found for this book."))
+            continue
+        elif copy_id not in free_ids or copy_id in claimed or holders.get(copy_id, user.pk) != user.pk:
+            results.append(CopyUnavailable("This copy is not available."))
+            continue
+
+        claimed[copy_id] = book_id
+        if queue_id is not None:
+            settled[queue_id] = (book_id, held)
+        results.append(Reservations(
+            user=user,
+            book=books[book_id],
+            copy=BookCopies(pk=copy_id, book_id=book_id, is_available=False),
+            start_date=start_date,
+            due_date=start_date + LOAN_PERIOD,
+        ))
+
+    if not claimed:
+        return results
+
+    updated = BookCopies.objects.filter(pk__in=list(claimed), is_available=True).update(is_available=False)
+    if updated != len(claimed):
+        # Only possible without row locks (SQLite); fail the batch rather than double-lend
+        raise CopyUnavailable("Copies were checked out concurrently; retry the request.")
+
+    deltas = {}
+    for copy_id, book_id in claimed.items():
+        # Held copies were taken off available_copies when the hold was placed
+        if copy_id not in holders:
+            deltas[book_id] = deltas.get(book_id, 0) - 1
+    reservations = [result for result in results if isinstance(result, Reservations)]
+    lent = Counter(claimed.values())
+    _adjust_available(
+        deltas, changed=set(claimed.values()), on_loan=lent, borrowed=lent,
+        due=Counter(reservation.due_date for reservation in reservations),
+        genres={book_id: book.genre_id for book_id, book in books.items()},
+    )
+    if settled:
+        Waitlist.objects.filter(pk__in=list(settled)).delete()
+        # Readers who took another copy than the one held for them pass it on
+        released = {}
+        for book_id, held in settled.values():
+            if held is not None and held not in claimed:
+                released.setdefault(book_id, []).append(held)
+        if released:
+            _shelve(released)
+    invalidate_books(set(claimed.values()))
+
+    Reservations.objects.bulk_create(reservations)
+    if reservations[0].pk is None:
+        # MySQL does not return ids from bulk inserts; the newest row per copy is ours
+        ids = dict(
+            Reservations.objects.filter(copy_id__in=list(claimed))
+            .values('copy_id').annotate(last=Max('reservation_id')).values_list('copy_id', 'last')
+        )
+        for reservation in reservations:
+            reservation.pk = ids[reservation.copy_id]
+    return results
+
+
+@transaction.atomic
+def bulk_return(reservations):
+    """
+    Return the copies of many reservations in a constant number of queries,
+    plus one per returned book that has readers waiting.
+
+    Returns the set of reservation ids that were open loans and whose copy
+    is now available again, and updates their loaded copies; the others were
+    already returned, including older loans of a copy since lent again.
+    Returned copies go on hold for their waitlists.
+    """
+    copy_ids = [reservation.copy_id for reservation in reservations]
+    due_dates = dict(
+        BookCopies.objects.filter(pk__in=copy_ids, is_available=False)
+        .select_for_update()
+        .values_list('pk', stats.loan_due_date())
+    )
+    if not due_dates:
+        return set()
+    # Read with the copies locked, so no checkout can open a newer loan meanwhile
+    open_ids = set(
+        Reservations.objects.open_loans()
+        .filter(pk__in=[reservation.pk for reservation in reservations], copy_id__in=list(due_dates))
+        .values_list('pk', flat=True)
+    )
+    if not open_ids:
+        return set()
+
+    returned = set()
+    copies_by_book = {}
+    genres = {}
+    for reservation in reservations:
+        if reservation.pk in open_ids and reservation.pk not in returned:
+            reservation.copy.is_available = True
+            returned.add(reservation.pk)
+            copies_by_book.setdefault(reservation.book_id, []).append(reservation.copy_id)
+            genres[reservation.book_id] = reservation.book.genre_id
+    shelved = [copy_id for copy_ids in copies_by_book.values() for copy_id in copy_ids]
+    BookCopies.objects.filter(pk__in=shelved).update(is_available=True)
+    _shelve(
+        copies_by_book,
+        on_loan={book_id: -len(copy_ids) for book_id, copy_ids in copies_by_book.items()},
+        due={due_date: -count for due_date, count in Counter(due_dates[copy_id] for copy_id in shelved).items()},
+        genres=genres,
+    )
+    return returned
+
+
+@transaction.atomic
+def mark_returned(copy):
+    """
+    Mark `copy` as returned and either put it on hold for the head of its
+    book's waitlist or increment the book's available counter.
+    Returns False, changing nothing, if the copy was already available.
+    """
+    due_date = stats.open_loan_due_dates([copy.pk]).get(copy.pk)
+    updated = BookCopies.objects.filter(pk=copy.pk, is_available=False).update(is_available=True)
+    if updated:
+        _shelve({copy.book_id: [copy.pk]}, on_loan={copy.book_id: -1}, due={due_date: -1} if due_date else {})
+    copy.is_available = True
+    return bool(updated)
+
+
+@transaction.atomic
+def extend(reservation, period):
+    """
+    Push the due date of `reservation` back by `period` and save it.
+    """
+    was_due = reservation.due_date
+    reservation.due_date += period
+    reservation.save()
+    if Reservations.objects.open_loans().filter(pk=reservation.pk).exists():
+        stats.record(due={was_due: -1, reservation.due_date: 1})
+
+
+def _place_holds(copies_by_book, today):
+    """
+    Hold the copies of `copies_by_book` ({book_id: [copy_id]}) for the readers
+    first in line for each book, and return how many were held per book.
+
+    The head of a line is read through the (book, book_lent, date_placed)
+    index, so allocation costs one indexed query per book with readers
+    waiting, not a scan.
+    """
+    waiting = Waitlist.objects.filter(book_id__in=list(copies_by_book), book_lent=False, limit_date__gte=today)
+    holds = []
+    for book_id in waiting.values_list('book_id', flat=True).distinct():
+        copy_ids = copies_by_book[book_id]
+        head = (
+            Waitlist.objects.select_for_update()
+            .filter(book_id=book_id, book_lent=False, limit_date__gte=today)
+            .order_by('date_placed', 'queue_id')[:len(copy_ids)]
+        )
+        for entry, copy_id in zip(head, copy_ids):
+            entry.book_lent = True
+            entry.copy_id = copy_id
+            entry.limit_date = today + HOLD_PERIOD
+            holds.append(entry)
+    if holds:
+        Waitlist.objects.bulk_update(holds, fields=['book_lent', 'copy', 'limit_date'])
+    return Counter(entry.book_id for entry in holds)
+
+
+def _shelve(copies_by_book, **rollups):
+    """
+    Hold the newly free copies of `copies_by_book` for their waitlists, and
+    add the rest to their books' available counters.
+    """
+    held = _place_holds(copies_by_book, timezone.localdate())
+    _adjust_available({
+        book_id: len(copy_ids) - held[book_id]
+        for book_id, copy_ids in copies_by_book.items()
+        if len(copy_ids) > held[book_id]
+    }, changed=list(copies_by_book), **rollups)
+    invalidate_books(copies_by_book)
+
+
+@transaction.atomic
+def join_waitlist(user, book_id, limit_date=None):
+    """
+    Put `user` at the end of the waitlist for `book_id` until `limit_date`
+    (WAITLIST_PERIOD from today by default) and return the entry.
+
+    Raises Book.DoesNotExist for an unknown book, CopyAvailable if a copy
+    can be checked out now, and AlreadyWaiting if the user is in line already.
+    """
+    today = timezone.localdate()
+    # Locking the book orders the join against returns, which update its row
+    available = Book.objects.select_for_update().filter(pk=book_id).values_list('available_copies', flat=True).first()
+    if available is None:
+        raise Book.DoesNotExist("Book not found.")
+    if available > 0:
+        raise CopyAvailable("A copy of this book is available; check it out instead.")
+    try:
+        with transaction.atomic():
+            return Waitlist.objects.create(
+                user=user, book_id=book_id, date_placed=today,
+                limit_date=limit_date or today + WAITLIST_PERIOD,
+            )
+    except IntegrityError:
+        raise AlreadyWaiting("You are already on the waitlist for this book.")
+
+
+@transaction.atomic
+def leave_waitlist(user, book_id):
+    """
+    Take `user` off the waitlist for `book_id`, passing a copy on hold for
+    them to the next reader in line. Returns False if they weren't on it.
+    """
+    entry = Waitlist.objects.select_for_update().filter(user=user, book_id=book_id).first()
+    if entry is None:
+        return False
+    entry.delete()
+    if entry.copy_id is not None:
+        _shelve({book_id: [entry.copy_id]})
+    return True
+
+
+def with_positions(entries):
+    """
+    Annotate waitlist `entries` with `position`: their 1-based place in their
+    book's line, or 0 for entries with a copy on hold.
+    """
+    ahead = (
+        Waitlist.objects
+        .filter(book=OuterRef('book'), book_lent=False)
+        .filter(
+            Q(date_placed__lt=OuterRef('date_placed'))
+            | Q(date_placed=OuterRef('date_placed'), queue_id__lt=OuterRef('queue_id'))
+        )
+        .values('book')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return entries.annotate(position=Case(
+        When(book_lent=True, then=Value(0)),
+        default=Coalesce(Subquery(ahead), 0) + 1,
+        output_field=IntegerField(),
+    ))
+
+
+@transaction.atomic
+def expire_holds(today=None):
+    """
+    Expire, in bulk, holds not collected by their limit_date and waitlist
+    entries that lapsed. Copies whose hold expired go to the next reader in
+    line, or back on the shelf. Returns (holds expired, entries lapsed).
+    """
+    today = today or timezone.localdate()
+    expired = list(
+        Waitlist.objects.select_for_update()
+        .filter(book_lent=True, limit_date__lt=today)
+        .values_list('queue_id', 'book_id', 'copy_id')
+    )
+    if expired:
+        Waitlist.objects.filter(pk__in=[queue_id for queue_id, _, _ in expired]).delete()
+    lapsed, _ = Waitlist.objects.filter(book_lent=False, limit_date__lt=today).delete()
+
+    copies_by_book = {}
+    for _, book_id, copy_id in expired:
+        if copy_id is not None:
+            copies_by_book.setdefault(book_id, []).append(copy_id)
+    if copies_by_book:
+        _shelve(copies_by_book)
+    return len(expired), lapsed
@@ -0,0 +1,51 @@
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_cache_control  # type: ignore
+from django.utils.http import http_date  # type: ignore
+
+# Bump when serializer output changes shape, so clients don't keep old payloads
+PAYLOAD_VERSION = '1'
+
+
+def validators(rows, scope=''):
+    """
+    Build a strong ETag and a Last-Modified timestamp for a response from `rows`.
+
+    `rows` are tuples that change whenever the payload does, typically primary
+    keys with `updated_at` timestamps fetched by a cheap values_list() query;
+    `scope` separates responses built from the same rows, e.g. per URL or user.
+    Last-Modified is the newest datetime in `rows`; it cannot reflect deleted
+    rows, which is why clients should prefer the ETag.
+    """
+    digest = hashlib.sha1(f'{PAYLOAD_VERSION}|{scope}'.encode('utf-8'))
+    newest = None
+    for row in rows:
+        digest.update(repr(tuple(row)).encode('utf-8'))
+        for value in row:
+            if isinstance(value, datetime) and (newest is None or value > newest):
+                newest = value
+    last_modified = int(newest.timestamp()) if newest is not None else None
+    return f'"{digest.hexdigest()}"', last_modified
+
+
+def add_validators(response, etag, last_modified, private=False):
+    """
+    Set ETag and Last-Modified on `response` and ask clients to revalidate.
+    """
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True, private=private, public=not private)
+    return response
+
+
+def not_modified(request, etag, last_modified, private=False):
+    """
+    Return a 304 (or 412) response if the client's copy is still current,
+    otherwise None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        add_validators(response, etag, last_modified, private=private)
+    return response
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import connections  # type: ignore
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection could be checked out within the pool timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of DB-API connections for one process.
+
+    `connect` opens a new connection, `close` closes one and `check` returns
+    whether one still works. At most `max_size` connections exist at a time;
+    when all are in use, `acquire` waits up to `timeout` seconds. Connections
+    idle for longer than `max_idle` seconds are closed, down to `min_size`,
+    and idle ones older than `check_after` seconds are checked before reuse.
+
+    Pools are per process: each server worker gets its own, so size them so
+    that workers x `max_size` stays below the server's max_connections.
+    """
+
+    def __init__(self, connect, close, check, max_size=10, min_size=0,
+                 max_idle=300.0, timeout=10.0, check_after=30.0):
+        self.connect = connect
+        self.close_connection = close
+        self.check = check
+        self.max_size = max_size
+        self.min_size = min_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_after = check_after
+        self.pid = os.getpid()
+
+        self._idle = deque()  # (connection, released_at), most recently used last
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'acquired': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def acquire(self):
+        """
+        Return a working connection, reusing an idle one if possible.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._condition:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    connection, released_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available within {self.timeout}s.")
+                waited = True
+                self._condition.wait(remaining)
+
+            self._stats['acquired'] += 1
+            if waited:
+                waited_for = time.monotonic() - started
+                self._stats['waits'] += 1
+                self._stats['wait_seconds_total'] += waited_for
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited_for)
+
+        if connection is not None:
+            if time.monotonic() - released_at < self.check_after or self.check(connection):
+                return connection
+            # Stale: close it and open a fresh one in the same slot
+            self._close(connection, release_slot=False)
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats['created'] += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        Return `connection` to the pool, or close it if `discard` is true.
+        """
+        if discard:
+            self._close(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def warm(self, count=None):
+        """
+        Open connections until `count` (default `min_size`) are idle.
+        """
+        count = min(self.min_size if count is None else count, self.max_size)
+        opened = []
+        try:
+            while len(self._idle) + len(opened) < count:
+                with self._condition:
+                    if self._size >= self.max_size:
+                        break
+                    self._size += 1
+                try:
+                    opened.append(self.connect())
+                except BaseException:
+                    with self._condition:
+                        self._size -= 1
+                    raise
+                with self._condition:
+                    self._stats['created'] += 1
+        finally:
+            for connection in opened:
+                self.release(connection)
+
+    def close_all(self):
+        """
+        Close every idle connection; connections in use are closed on release.
+        """
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.max_size,
+            )
+        return stats
+
+    def _evict_idle(self):
+        # Called with the lock held. The least recently used are on the left.
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._close_quietly(connection)
+
+    def _close(self, connection, release_slot=True):
+        with self._condition:
+            if release_slot:
+                self._size -= 1
+                self._condition.notify()
+            self._stats['closed'] += 1
+        self._close_quietly(connection)
+
+    def _close_quietly(self, connection):
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
+
+
+def pool_stats():
+    """
+    Return the stats of every pooled database connection in this process, by alias.
+    """
+    return {
+        alias: connections[alias].pool.stats()
+        for alias in connections
+        if getattr(connections[alias], 'pool', None) is not None
+    }
+
+
+def warm_up_pools():
+    """
+    Open each pool's `min_size` connections, e.g. right after a worker starts.
+    """
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            pool.warm()
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.db import DEFAULT_DB_ALIAS, connections  # type: ignore
+
+from myapp import metrics
+
+logger = logging.getLogger(__name__)
+
+# Whether the current request may read from replicas. Off by default, so
+# management commands, shells and anything outside a request use the primary.
+replica_reads_allowed = ContextVar('replica_reads_allowed', default=False)
+# The replica the current request reads from. The middleware sets an empty
+# dict per request and the router fills in the alias on the first read; the
+# dict is shared, not copied, with the threads and tasks serving the request.
+request_replica = ContextVar('request_replica', default=None)
+
+_lag_lock = threading.Lock()
+_lag_checked = {}  # alias -> (checked_at, lag seconds or None)
+
+
+def replica_lag(alias):
+    """
+    Return how many seconds `alias` is behind the primary, or None if it is
+    not replicating. Databases without replication status report no lag.
+    The app's database user needs the REPLICATION CLIENT privilege.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'mysql':
+        return 0.0
+    # SHOW REPLICA STATUS needs MySQL 8.0.22+; older servers and MariaDB know SHOW SLAVE STATUS
+    legacy = connection.mysql_is_mariadb or connection.mysql_version < (8, 0, 22)
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW SLAVE STATUS' if legacy else 'SHOW REPLICA STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [column[0] for column in cursor.description]
+    status = dict(zip(columns, row))
+    lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+    return None if lag is None else float(lag)
+
+
+def current_lag(alias):
+    """
+    replica_lag(), re-checked at most every DATABASE_REPLICA_LAG_CHECK_INTERVAL seconds.
+    A failed check is logged and counted, and skips the replica until the next one.
+    """
+    now = time.monotonic()
+    with _lag_lock:
+        checked = _lag_checked.get(alias)
+    if checked is not None and now - checked[0] < settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = replica_lag(alias)
+    except Exception:
+        logger.warning("Could not check the lag of replica %s; reading from the primary", alias, exc_info=True)
+        metrics.incr(f'db.replica.{alias}.lag_check_failed')
+        lag = None
+    with _lag_lock:
+        _lag_checked[alias] = (now, lag)
+    return lag
+
+
+def pin_key(client):
+    return f'db:primary-pin:{hashlib.sha1(client.encode("utf-8")).hexdigest()}'
+
+
+def pin_to_primary(client):
+    """
+    Route `client`'s reads to the primary until replicas have caught up with its writes.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(pin_key(client), True, timeout=settings.DATABASE_REPLICA_LAG_TOLERANCE)
+
+
+def is_pinned(client):
+    return bool(settings.DATABASE_REPLICAS) and cache.get(pin_key(client)) is not None
+
+
+async def apin_to_primary(client):
+    if settings.DATABASE_REPLICAS:
+        await cache.aset(pin_key(client), True, timeout=settings.DATABASE_REPLICA_LAG_TOLERANCE)
+
+
+async def ais_pinned(client):
+    return bool(settings.DATABASE_REPLICAS) and await cache.aget(pin_key(client)) is not None
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replicas in settings.DATABASE_REPLICAS and writes to the primary.
+
+    Replicas are picked at random, weighted by their DATABASE_REPLICAS value,
+    once per request: its later reads reuse the first read's pick.
+    Reads stay on the primary unless the request middleware allowed replica
+    reads, and inside transaction.atomic() blocks, so reads that follow a write
+    see it. Replicas lagging more than DATABASE_REPLICA_LAG_TOLERANCE seconds
+    are skipped. Users are always read from the primary, so a lagging replica
+    can't fail the authentication of a just-created account.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads_allowed.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if model._meta.label == settings.AUTH_USER_MODEL:
+            return DEFAULT_DB_ALIAS
+
+        choice = request_replica.get()
+        if choice is None:
+            return self.pick_replica()
+        if 'alias' not in choice:
+            choice['alias'] = self.pick_replica()
+        return choice['alias']
+
+    def pick_replica(self):
+        """
+        Return a replica within the lag tolerance, by weight, or the primary if there is none.
+        """
+        tolerance = settings.DATABASE_REPLICA_LAG_TOLERANCE
+        candidates = []
+        for alias, weight in settings.DATABASE_REPLICAS.items():
+            lag = current_lag(alias)
+            if lag is not None and lag <= tolerance:
+                candidates.append((alias, weight))
+        if not candidates:
+            return DEFAULT_DB_ALIAS
+        aliases, weights = zip(*candidates)
+        return random.choices(aliases, weights=weights)[0]
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
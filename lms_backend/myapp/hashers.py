@@ -0,0 +1,17 @@
+from django.conf import settings  # type: ignore
+from django.contrib.auth import hashers  # type: ignore
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2-SHA256 hasher with the iteration count taken from
+    settings.PASSWORD_HASH_ITERATIONS (Django's default when unset).
+
+    Hashes made with another count still verify, and Django re-hashes them
+    with this one when their user next signs in, so raising or lowering the
+    cost needs no migration.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', None) or super().iterations
@@ -0,0 +1,141 @@
+import json
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from myapp.models import Author, Book, BookCopies, BookStats, Genre, LoanNotice, Reservations, User, Waitlist
+from myapp.search import get_search_backend
+
+# Placeholder key and day used to build the queries; the plan does not depend on them.
+KEY = 1
+DAY = date(2024, 1, 1)
+
+# Representative queries issued by the API views, keyed by a short name.
+# Paginated lists are audited with a cursor applied (`pk__gt`), which is the
+# shape of every page after the first and is a primary-key range, not a scan.
+AUDITED_QUERIES = {
+    'book-list': lambda: Book.objects.with_listing_data().filter(book_id__gt=KEY).order_by('book_id')[:51],
+    'book-list-copies': lambda: BookCopies.objects.filter(book_id__in=[KEY, KEY + 1]).order_by('copy_id'),
+    'book-search': lambda: get_search_backend().search(Book.objects.with_listing_data(), 'library scie'),
+    'book-detail': lambda: Book.objects.with_listing_data().filter(pk=KEY),
+    'book-by-isbn': lambda: Book.objects.filter(isbn='9780306406157'),
+    'book-by-title': lambda: Book.objects.filter(title='Dune'),
+    'author-by-name': lambda: Author.objects.filter(name='Frank Herbert'),
+    'genre-by-name': lambda: Genre.objects.filter(name='Science Fiction'),
+    'book-copies': lambda: BookCopies.objects.filter(book_id=KEY).order_by('copy_id'),
+    'book-available-copy': lambda: BookCopies.objects.filter(book_id=KEY, is_available=True).order_by('copy_id')[:1],
+    'copy-open-reservation': lambda: Reservations.objects.filter(copy_id=KEY, copy__is_available=False)[:1],
+    'reservation-list': lambda: (
+        Reservations.objects.select_related('user', 'book', 'copy')
+        .filter(reservation_id__gt=KEY).order_by('reservation_id')[:51]
+    ),
+    'reservation-list-user': lambda: (
+        Reservations.objects.select_related('user', 'book', 'copy')
+        .filter(user_id=KEY, reservation_id__gt=KEY).order_by('reservation_id')[:51]
+    ),
+    'reservation-list-book': lambda: (
+        Reservations.objects.select_related('user', 'book', 'copy')
+        .filter(book_id=KEY, reservation_id__gt=KEY).order_by('reservation_id')[:51]
+    ),
+    'reservation-list-returned': lambda: (
+        Reservations.objects.select_related('user', 'book', 'copy')
+        .filter(copy__is_available=True, reservation_id__gt=KEY).order_by('reservation_id')[:51]
+    ),
+    'reservation-user-due': lambda: Reservations.objects.filter(user_id=KEY).order_by('due_date'),
+    'reservation-due-sweep': lambda: (
+        Reservations.objects.open_loans().filter(due_date__lte=DAY)
+        .order_by('due_date', 'reservation_id')[:1000]
+    ),
+    'loan-notice-unsent': lambda: (
+        LoanNotice.objects.filter(sent_at__isnull=True, user_id__gt=KEY).order_by('user_id', 'notice_id')[:1000]
+    ),
+    'stats-top-titles': lambda: BookStats.objects.filter(loans__gt=0).order_by('-loans', 'book_id')[:10],
+    'user-by-email': lambda: User.objects.filter(email='reader@example.com'),
+    'user-list': lambda: User.objects.filter(is_staff=False, user_id__gt=KEY).order_by('user_id')[:51],
+    'waitlist-head': lambda: (
+        Waitlist.objects.filter(book_id=KEY, book_lent=False, limit_date__gte=DAY)
+        .order_by('date_placed', 'queue_id')[:1]
+    ),
+    'waitlist-expired-holds': lambda: Waitlist.objects.filter(book_lent=True, limit_date__lt=DAY),
+}
+
+_SQLITE_SCAN_RE = re.compile(r'\bSCAN (\S+)(.*)$')
+
+
+def sqlite_full_scans(plan):
+    """
+    Return the tables SQLite reads without an index in a text EXPLAIN plan.
+
+    SQLite reports index use as `SEARCH t USING INDEX ...` or
+    `SCAN t USING [COVERING] INDEX ...`; a bare `SCAN t` reads every row.
+    """
+    scans = []
+    for line in plan.splitlines():
+        match = _SQLITE_SCAN_RE.search(line)
+        if match and 'USING' not in match.group(2) and match.group(1) != 'CONSTANT':
+            scans.append(match.group(1))
+    return scans
+
+
+def mysql_full_scans(plan):
+    """
+    Return the tables MySQL reads without an index in a JSON EXPLAIN plan.
+
+    The optimizer may still pick `access_type: ALL` on tiny tables when an
+    index exists, so only scans with no candidate index (`possible_keys`)
+    are reported; those are the ones a missing index causes.
+    """
+    scans = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('access_type') == 'ALL' and not node.get('possible_keys'):
+                scans.append(node.get('table_name', '?'))
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan))
+    return scans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the queries issued by the API views and fail if any of them scans a whole table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to audit")
+        parser.add_argument('names', nargs='*', help="Only audit these queries (default: all)")
+
+    def handle(self, *args, **options):
+        database = options['database']
+        vendor = connections[database].vendor
+        if vendor == 'sqlite':
+            explain, find_scans = {}, sqlite_full_scans
+        elif vendor == 'mysql':
+            explain, find_scans = {'format': 'json'}, mysql_full_scans
+        else:
+            raise CommandError(f"Index audit is not supported on {vendor}.")
+
+        names = options['names'] or list(AUDITED_QUERIES)
+        unknown = set(names) - set(AUDITED_QUERIES)
+        if unknown:
+            raise CommandError(f"Unknown queries: {', '.join(sorted(unknown))}")
+
+        failures = []
+        for name in names:
+            plan = AUDITED_QUERIES[name]().using(database).explain(**explain)
+            scans = find_scans(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} of {len(names)} queries scan a whole table: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"All {len(names)} queries use an index."))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from myapp.token_blacklist import prune_expired, rebuild_filter
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens in batches, then rebuild the Bloom filter"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Tokens deleted per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Count expired tokens without deleting them")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        if options['dry_run']:
+            expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: {expired.count()} of {OutstandingToken.objects.count()} outstanding tokens have expired, "
+                f"{BlacklistedToken.objects.filter(token__in=expired).count()} of them blacklisted."
+            ))
+            return
+
+        deleted = 0
+        started = time.perf_counter()
+        for count in prune_expired(batch_size=batch_size):
+            deleted += count
+            rate = deleted / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(f"Deleted {deleted} expired tokens ({rate:.0f} tokens/s)")
+
+        held = rebuild_filter()
+        if held is not None:
+            self.stdout.write(f"Rebuilt the Bloom filter with {held} blacklisted tokens.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired tokens; {OutstandingToken.objects.count()} outstanding remain."
+        ))
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from myapp.circulation import expire_holds
+from myapp.models import Waitlist
+
+
+class Command(BaseCommand):
+    help = "Expire uncollected holds and lapsed waitlist entries, passing freed copies down the line"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Expire as of this day (YYYY-MM-DD) instead of today")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would expire without changing anything")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--date must be in YYYY-MM-DD format.")
+
+        if options['dry_run']:
+            holds = Waitlist.objects.filter(book_lent=True, limit_date__lt=today).count()
+            lapsed = Waitlist.objects.filter(book_lent=False, limit_date__lt=today).count()
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: {holds} holds and {lapsed} waitlist entries would expire as of {today}."
+            ))
+            return
+
+        holds, lapsed = expire_holds(today)
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {holds} holds and {lapsed} waitlist entries as of {today}; "
+            f"{Waitlist.objects.filter(book_lent=True).count()} holds remain."
+        ))
@@ -1,19 +1,111 @@
-from django.core.management.base import BaseCommand
-from myapp.models import User  # Replace `myapp` with your app name
-from django.contrib.auth.hashers import make_password
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import identify_hasher, is_password_usable, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from myapp.models import User
+
+
+def is_hashed(password):
+    """
+    True if `password` is already encoded by one of the configured
+    PASSWORD_HASHERS, or deliberately unusable.
+    """
+    if not is_password_usable(password):
+        return True
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return False
+    return True
+
 
 class Command(BaseCommand):
     help = "Hash all plain-text passwords in the User table to meet Django standards"
 
-    def handle(self, *args, **kwargs):
-        users = User.objects.all()
-        for user in users:
-            # Skip already hashed passwords
-            if not user.password.startswith(('pbkdf2_sha256$', 'argon2$', 'bcrypt$', 'sha1$')):
-                original_password = user.password
-                hashed_password = make_password(original_password)
-                user.password = hashed_password
-                user.save()
-                self.stdout.write(self.style.SUCCESS(f"Password hashed for user: {user.email}"))
-            else:
-                self.stdout.write(self.style.WARNING(f"Password for user {user.email} is already hashed."))
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Users read and written per batch")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Processes hashing in parallel (default: one per core)")
+        parser.add_argument('--start-id', type=int, default=0,
+                            help="Start at this user id, e.g. to resume an interrupted run")
+        parser.add_argument('--dry-run', action='store_true', help="Count plain-text passwords without hashing them")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 1:
+            raise CommandError("--chunk-size and --workers must be at least 1.")
+        dry_run = options['dry_run']
+
+        # Hashing is CPU-bound and holds the GIL, so it is spread over processes
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+        last_id = options['start_id'] - 1
+        checked = hashed = skipped = 0
+        started = time.perf_counter()
+        try:
+            # Walk the table in primary-key order so memory use stays bounded
+            while True:
+                rows = list(
+                    User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'email', 'password')[:chunk_size]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                checked += len(rows)
+
+                plain = [(pk, email, password) for pk, email, password in rows if password and not is_hashed(password)]
+                # Empty passwords can't be used to sign in today; hashing them would allow it
+                skipped += sum(1 for row in rows if not row[2])
+                if plain and not dry_run:
+                    hashed += self.hash_chunk(plain, executor, workers)
+                elif plain:
+                    hashed += len(plain)
+                for _, email, _ in plain:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"Password {'to hash' if dry_run else 'hashed'} for user: {email}")
+
+                rate = checked / max(time.perf_counter() - started, 1e-9)
+                self.stdout.write(
+                    f"Up to user {last_id}: checked {checked}, "
+                    f"{'found' if dry_run else 'hashed'} {hashed} ({rate:.0f} users/s)"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {skipped} users with an empty password."))
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry run: {hashed} of {checked} passwords are plain text."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Hashed {hashed} of {checked} passwords."))
+
+    def hash_chunk(self, plain, executor, workers):
+        """
+        Hash the passwords of `plain` (pk, email, password) rows and save them,
+        skipping users whose password changed meanwhile. Returns how many were saved.
+        """
+        passwords = [password for _, _, password in plain]
+        if executor is None:
+            encoded = [make_password(password) for password in passwords]
+        else:
+            encoded = list(executor.map(make_password, passwords, chunksize=math.ceil(len(passwords) / workers)))
+
+        with transaction.atomic():
+            # Hashing takes a while; only write rows that still hold the password we hashed
+            current = dict(
+                User.objects.select_for_update()
+                .filter(pk__in=[pk for pk, _, _ in plain])
+                .values_list('pk', 'password')
+            )
+            users = [
+                User(pk=pk, password=new)
+                for (pk, _, old), new in zip(plain, encoded)
+                if current.get(pk) == old
+            ]
+            User.objects.bulk_update(users, fields=['password'])
+        return len(users)
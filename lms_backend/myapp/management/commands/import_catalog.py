@@ -0,0 +1,75 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from myapp.catalog_import import FORMATS, CatalogImporter, detect_format, read_records
+
+
+class Command(BaseCommand):
+    help = "Import books and copies from a CSV, NDJSON or MARC-lite (.mrk) file in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import")
+        parser.add_argument('--format', choices=list(FORMATS), help="Input format (default: from the extension)")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Records imported per transaction")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <path>.checkpoint)")
+        parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint of an interrupted run")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        try:
+            input_format = options['format'] or detect_format(path)
+        except ValueError as e:
+            raise CommandError(str(e))
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+
+        importer = CatalogImporter(chunk_size=options['chunk_size'])
+        offset = 0
+        if os.path.exists(checkpoint_path):
+            if not options['resume']:
+                raise CommandError(
+                    f"{checkpoint_path} exists from an interrupted import. "
+                    "Pass --resume to continue it, or delete it to start over."
+                )
+            with open(checkpoint_path) as checkpoint:
+                state = json.load(checkpoint)
+            if state['source'] != os.path.abspath(path):
+                raise CommandError(f"{checkpoint_path} belongs to an import of {state['source']}.")
+            offset = state['offset']
+            importer.stats.update(state['stats'])
+            self.stdout.write(f"Resuming after record {offset}.")
+
+        started = time.perf_counter()
+        first_offset = offset
+        with open(path, newline='', encoding='utf-8-sig') as source:
+            for offset, errors in importer.run(read_records(source, input_format), offset=offset):
+                for number, reason in errors:
+                    self.stderr.write(f"Record {number}: {reason}")
+                self.write_checkpoint(checkpoint_path, path, offset, importer.stats)
+                rate = (offset - first_offset) / max(time.perf_counter() - started, 1e-9)
+                self.stdout.write(f"{offset} records ({rate:.0f}/s): {self.summary(importer.stats)}")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {offset - first_offset} records in {elapsed:.1f}s: {self.summary(importer.stats)}"
+        ))
+
+    @staticmethod
+    def summary(stats):
+        return (
+            f"{stats['books']} books, {stats['copies']} copies, {stats['authors']} new authors, "
+            f"{stats['genres']} new genres, {stats['existing']} already catalogued, {stats['invalid']} invalid"
+        )
+
+    @staticmethod
+    def write_checkpoint(checkpoint_path, path, offset, stats):
+        # Written after each committed chunk; replace() keeps it whole if we crash mid-write
+        temporary = f'{checkpoint_path}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump({'source': os.path.abspath(path), 'offset': offset, 'stats': dict(stats)}, checkpoint)
+        os.replace(temporary, checkpoint_path)
@@ -1,7 +1,8 @@
-import os
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from myapp.models import Author, Genre, Book, BookCopies
+from django.db import transaction
+from myapp.models import Author, Genre
+from myapp.catalog_import import CatalogImporter
 
 User = get_user_model()
 
@@ -112,7 +113,7 @@ books = [
     {"title": "The Hound of the Baskervilles", "author_id": 13, "genre_id": 3, "isbn": "9780141032436", "quantity": 3},
     {"title": "Mrs. Dalloway", "author_id": 14, "genre_id": 7, "isbn": "9780156628709", "quantity": 4},
     {"title": "Fahrenheit 451", "author_id": 15, "genre_id": 2, "isbn": "9781451673319", "quantity": 5},
-    {"title": "The War of the Worlds", "author_id": 16, "genre_id": 2, "isbn": "9780345484218", "quantity": 6},
+    {"title": "The War of the Worlds", "author_id": 16, "genre_id": 2, "isbn": "9780345484215", "quantity": 6},
     {"title": "Norwegian Wood", "author_id": 17, "genre_id": 25, "isbn": "9780375704024", "quantity": 2},
     {"title": "One Hundred Years of Solitude", "author_id": 18, "genre_id": 21, "isbn": "9780060883287", "quantity": 4},
     {"title": "Slaughterhouse-Five", "author_id": 19, "genre_id": 20, "isbn": "9780385333849", "quantity": 3},
@@ -135,18 +136,18 @@ books = [
     {"title": "Macbeth", "author_id": 11, "genre_id": 17, "isbn": "9780743477109", "quantity": 3},
     {"title": "Carrie", "author_id": 12, "genre_id": 6, "isbn": "9780307743664", "quantity": 4},
     {"title": "A Study in Scarlet", "author_id": 13, "genre_id": 3, "isbn": "9780141032535", "quantity": 4},
-    {"title": "To the Lighthouse", "author_id": 14, "genre_id": 7, "isbn": "9780156907391", "quantity": 5},
+    {"title": "To the Lighthouse", "author_id": 14, "genre_id": 7, "isbn": "9780156907392", "quantity": 5},
     {"title": "The Martian Chronicles", "author_id": 15, "genre_id": 2, "isbn": "9780062079930", "quantity": 6},
-    {"title": "The Time Machine", "author_id": 16, "genre_id": 2, "isbn": "9780345321601", "quantity": 6},
+    {"title": "The Time Machine", "author_id": 16, "genre_id": 2, "isbn": "9780345321602", "quantity": 6},
     {"title": "Kafka on the Shore", "author_id": 17, "genre_id": 25, "isbn": "9781400079278", "quantity": 4},
-    {"title": "Love in the Time of Cholera", "author_id": 18, "genre_id": 21, "isbn": "9780307389731", "quantity": 4},
+    {"title": "Love in the Time of Cholera", "author_id": 18, "genre_id": 21, "isbn": "9780307389732", "quantity": 4},
     {"title": "Cat's Cradle", "author_id": 19, "genre_id": 20, "isbn": "9780385333481", "quantity": 2},
     {"title": "The Importance of Being Earnest", "author_id": 20, "genre_id": 13, "isbn": "9780486264783", "quantity": 4},
-    {"title": "The Horse and His Boy", "author_id": 21, "genre_id": 1, "isbn": "9780064471061", "quantity": 4},
+    {"title": "The Horse and His Boy", "author_id": 21, "genre_id": 1, "isbn": "9780064471060", "quantity": 4},
     {"title": "Anna Karenina", "author_id": 22, "genre_id": 11, "isbn": "9780140449174", "quantity": 5},
-    {"title": "The Last Man", "author_id": 23, "genre_id": 6, "isbn": "9780140439123", "quantity": 5},
-    {"title": "Island", "author_id": 24, "genre_id": 10, "isbn": "9780060850525", "quantity": 2},
-    {"title": "Agnes Grey", "author_id": 25, "genre_id": 24, "isbn": "9780140432100", "quantity": 4},
+    {"title": "The Last Man", "author_id": 23, "genre_id": 6, "isbn": "9780140439120", "quantity": 5},
+    {"title": "Island", "author_id": 24, "genre_id": 10, "isbn": "9780060085490", "quantity": 2},
+    {"title": "Agnes Grey", "author_id": 25, "genre_id": 24, "isbn": "9780140432107", "quantity": 4},
 ]
 
 
@@ -324,41 +325,28 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f"User '{user.email}' already exists.")
 
-        # Insert authors
-        for author_data in authors:
-            Author.objects.get_or_create(name=author_data["name"])
-
-        # Insert genres
-        for genre_data in genres:
-            Genre.objects.get_or_create(name=genre_data["name"])
-
-        # Insert books
-        for book_data in books:
-            try:
-                # Fetch author and genre instances by ID
-                author = Author.objects.get(pk=book_data["author_id"])
-                genre = Genre.objects.get(pk=book_data["genre_id"])
-
-                # Create or get the book
-                book, created = Book.objects.get_or_create(
-                    title=book_data["title"],
-                    author=author,  # Pass the Author instance
-                    genre=genre,  # Pass the Genre instance
-                    isbn=book_data["isbn"],
-                    quantity=book_data["quantity"],
-                )
-                # Create book copies based on the quantity
-                existing_copies = BookCopies.objects.filter(book=book).count()
-                copies_to_add = book.quantity - existing_copies
-                if copies_to_add > 0:
-                    BookCopies.objects.bulk_create([BookCopies(book=book) for _ in range(copies_to_add)])
-                    print(f"{copies_to_add} copies of '{book.title}' added.")
-                else:
-                    print(f"Book '{book.title}' already has {existing_copies} copies.")
-                    
-                if created:
-                    self.stdout.write(self.style.SUCCESS(f"Book '{book.title}' created."))
-                else:
-                    self.stdout.write(f"Book '{book.title}' already exists.")
-            except (Author.DoesNotExist, Genre.DoesNotExist) as e:
-                self.stdout.write(self.style.ERROR(f"Error: {e}"))
\ No newline at end of file
+        # Insert authors and genres, then the books and their copies in bulk
+        importer = CatalogImporter()
+        with transaction.atomic():
+            importer.resolve(Author, importer.authors, {author["name"] for author in authors}, 'authors')
+            importer.resolve(Genre, importer.genres, {genre["name"] for genre in genres}, 'genres')
+
+        records = (
+            {
+                "title": book_data["title"],
+                "author": authors[book_data["author_id"] - 1]["name"],
+                "genre": genres[book_data["genre_id"] - 1]["name"],
+                "isbn": book_data["isbn"],
+                "copies": book_data["quantity"],
+            }
+            for book_data in books
+        )
+        for _, errors in importer.run(records):
+            for number, reason in errors:
+                self.stdout.write(self.style.ERROR(f"Book {number}: {reason}"))
+
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['books']} books with {stats['copies']} copies created, "
+            f"{stats['existing']} already existed."
+        ))
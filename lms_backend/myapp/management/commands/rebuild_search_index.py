@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from myapp.models import Book
+from myapp.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the catalog search index for every book"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Books indexed per batch")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        last_id = 0
+        indexed = 0
+
+        # Walk the table in primary-key order so memory use stays bounded
+        while True:
+            book_ids = list(
+                Book.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not book_ids:
+                break
+            backend.index_books(book_ids)
+            indexed += len(book_ids)
+            last_id = book_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} books with {type(backend).__name__}."))
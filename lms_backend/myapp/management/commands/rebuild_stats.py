@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from myapp import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard rollups from the book_copy and reservations tables"
+
+    def handle(self, *args, **options):
+        genres, due_dates, books = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the rollups of {genres} genres, {due_dates} due dates and {books} books."
+        ))
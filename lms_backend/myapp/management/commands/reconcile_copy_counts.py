@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from myapp.cache import invalidate_books
+from myapp.models import Book
+
+
+class Command(BaseCommand):
+    help = "Recompute Book.total_copies / available_copies / quantity from the book_copy table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Books checked per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Report drifted books without fixing them")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        last_id = 0
+        checked = 0
+        fixed = 0
+
+        # Walk the table in primary-key order, one short transaction per batch
+        while True:
+            book_ids = list(
+                Book.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not book_ids:
+                break
+            last_id = book_ids[-1]
+            checked += len(book_ids)
+
+            with transaction.atomic():
+                drifted = list(
+                    Book.objects.select_for_update()
+                    .filter(pk__in=book_ids)
+                    .with_counted_copies()
+                    .exclude(
+                        total_copies=F('counted_total'),
+                        available_copies=F('counted_available'),
+                        quantity=F('counted_total'),
+                    )
+                    .values_list('pk', 'total_copies', 'available_copies', 'counted_total', 'counted_available')
+                )
+                for book_id, total, available, counted_total, counted_available in drifted:
+                    self.stdout.write(
+                        f"Book {book_id}: total {total} -> {counted_total}, "
+                        f"available {available} -> {counted_available}"
+                    )
+                if drifted and not dry_run:
+                    drifted_ids = [row[0] for row in drifted]
+                    Book.objects.filter(pk__in=drifted_ids).with_counted_copies().update(
+                        total_copies=F('counted_total'),
+                        available_copies=F('counted_available'),
+                        quantity=F('counted_total'),
+                    )
+                    invalidate_books(drifted_ids)
+                    fixed += len(drifted)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry run: checked {checked} books, none updated."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Checked {checked} books, fixed {fixed}."))
@@ -0,0 +1,64 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from myapp.models import LoanNotice
+from myapp.notices import due_loans, dispatch_notices, get_outbox, record_notices, unrecorded
+
+
+class Command(BaseCommand):
+    help = "Record overdue and due-soon notices for loans still out and send them to the outbox, one batch per user"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Sweep as of this day (YYYY-MM-DD) instead of today")
+        parser.add_argument('--due-soon-days', type=int, default=None,
+                            help="Notify loans due within this many days (default: LOAN_DUE_SOON_DAYS)")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Loans or notices read per query")
+        parser.add_argument('--dry-run', action='store_true', help="Count new notices without recording or sending them")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        due_soon_days = options['due_soon_days']
+        if due_soon_days is None:
+            due_soon_days = settings.LOAN_DUE_SOON_DAYS
+        if due_soon_days < 0:
+            raise CommandError("--due-soon-days must not be negative.")
+        today = timezone.localdate()
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--date must be in YYYY-MM-DD format.")
+
+        if options['dry_run']:
+            loans = due_loans(today, due_soon_days)
+            overdue = unrecorded(loans.filter(due_date__lt=today), LoanNotice.OVERDUE).count()
+            due_soon = unrecorded(loans.filter(due_date__gte=today), LoanNotice.DUE_SOON).count()
+            unsent = LoanNotice.objects.filter(sent_at__isnull=True).count()
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: {overdue} overdue and {due_soon} due-soon notices would be recorded as of {today}; "
+                f"{unsent} recorded notices are unsent."
+            ))
+            return
+
+        seen = recorded = 0
+        started = time.perf_counter()
+        for loans, notices in record_notices(today, due_soon_days, chunk_size=chunk_size):
+            seen += loans
+            recorded += notices
+            rate = seen / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(f"Swept {seen} due loans, {recorded} new notices ({rate:.0f} loans/s)")
+
+        users = sent = 0
+        for batch_users, batch_notices in dispatch_notices(get_outbox(), chunk_size=chunk_size):
+            users += batch_users
+            sent += batch_notices
+            self.stdout.write(f"Sent {sent} notices to {users} users")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Swept {seen} due loans as of {today}: recorded {recorded} notices, sent {sent} to {users} users."
+        ))
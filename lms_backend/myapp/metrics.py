@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+from collections import Counter
+
+# Counters are per process; with several server workers each reports its own.
+_lock = threading.Lock()
+_counters = Counter()
+_gauges = {}
+_timings = {}
+
+# Upper bounds (seconds) of the latency histogram buckets kept per timing
+TIMING_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def labelled(name, labels):
+    """
+    Return the key of metric `name` with `labels`, e.g. `view.wall{view="BookListView"}`.
+    """
+    if not labels:
+        return name
+    pairs = ','.join(f'{label}="{_escape(value)}"' for label, value in sorted(labels.items()))
+    return f'{name}{{{pairs}}}'
+
+
+def incr(name, amount=1, **labels):
+    """
+    Add `amount` to the counter `name` with `labels`.
+    """
+    name = labelled(name, labels)
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name, seconds, **labels):
+    """
+    Record a duration of `seconds` in the timing `name` with `labels`.
+    """
+    name = labelled(name, labels)
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(TIMING_BUCKETS)}
+        timing['count'] += 1
+        timing['sum'] += seconds
+        timing['max'] = max(timing['max'], seconds)
+        for index, bound in enumerate(TIMING_BUCKETS):
+            if seconds <= bound:
+                timing['buckets'][index] += 1
+                break
+
+
+def register_gauge(name, read):
+    """
+    Report the value returned by `read()` as gauge `name` in every snapshot.
+    """
+    with _lock:
+        _gauges[name] = read
+
+
+def snapshot():
+    """
+    Return the current counters and gauges of this process.
+    """
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        timings = {name: _summary(timing) for name, timing in _timings.items()}
+    return {
+        'pid': os.getpid(),
+        'counters': counters,
+        'gauges': {name: read() for name, read in gauges.items()},
+        'timings': timings,
+    }
+
+
+def _summary(timing):
+    # Cumulative bucket counts, as Prometheus histograms report them
+    buckets, seen = {}, 0
+    for bound, count in zip(TIMING_BUCKETS, timing['buckets']):
+        seen += count
+        buckets[str(bound)] = seen
+    buckets['+Inf'] = timing['count']
+    return {
+        'count': timing['count'],
+        'mean_ms': round(timing['sum'] / timing['count'] * 1000, 3),
+        'max_ms': round(timing['max'] * 1000, 3),
+        'sum_seconds': timing['sum'],
+        'buckets': buckets,
+    }
+
+
+def prometheus_text(snapshot, prefix='lms'):
+    """
+    Render `snapshot` in the Prometheus text exposition format: counters as
+    `<prefix>_<name>_total`, numeric gauges (nested ones joined by `_`) and
+    timings as `<prefix>_<name>_seconds` histograms. Metrics recorded with
+    labels become series of one family, e.g. `lms_view_wall_seconds{view="..."}`.
+
+    Every series carries the worker's `pid` label, since each server process
+    counts on its own: scrape every worker and sum over `pid` after `rate()`.
+    """
+    pid = f'pid="{snapshot["pid"]}"'
+    lines = []
+    families = set()
+
+    def family(metric, kind):
+        # Series of a family are adjacent, after one TYPE line
+        if metric not in families:
+            families.add(metric)
+            lines.append(f'# TYPE {metric} {kind}')
+
+    for name, labels, value in _series(snapshot['counters']):
+        metric = _metric_name(prefix, name, 'total')
+        family(metric, 'counter')
+        lines.append(f'{metric}{{{pid}{labels}}} {value}')
+    for name, value in sorted(_flatten(snapshot['gauges'])):
+        metric = _metric_name(prefix, name)
+        lines += [f'# TYPE {metric} gauge', f'{metric}{{{pid}}} {value}']
+    for name, labels, timing in _series(snapshot['timings']):
+        metric = _metric_name(prefix, name, 'seconds')
+        family(metric, 'histogram')
+        lines += [
+            f'{metric}_bucket{{{pid}{labels},le="{bound}"}} {count}' for bound, count in timing['buckets'].items()
+        ]
+        lines += [
+            f'{metric}_sum{{{pid}{labels}}} {timing["sum_seconds"]}',
+            f'{metric}_count{{{pid}{labels}}} {timing["count"]}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def _series(values):
+    """
+    Yield (name, labels, value) for the labelled() keys of `values`, grouped
+    by name. `labels` is empty or a `,`-prefixed label list.
+    """
+    series = []
+    for key, value in values.items():
+        name, _, labels = key.partition('{')
+        series.append((name, f',{labels[:-1]}' if labels else '', value))
+    return sorted(series, key=lambda entry: entry[:2])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric_name(*parts):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join(parts))
+
+
+def _flatten(gauges, path=''):
+    for name, value in gauges.items():
+        name = f'{path}.{name}' if path else str(name)
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, (int, float)):
+            yield name, int(value) if isinstance(value, bool) else value
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
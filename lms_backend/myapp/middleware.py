@@ -0,0 +1,152 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async  # type: ignore
+from django.conf import settings  # type: ignore
+from django.core.exceptions import MiddlewareNotUsed  # type: ignore
+from django.db import connections  # type: ignore
+from rest_framework import HTTP_HEADER_ENCODING  # type: ignore
+from rest_framework.permissions import SAFE_METHODS  # type: ignore
+from rest_framework_simplejwt.exceptions import InvalidToken  # type: ignore
+
+from myapp import profiling
+from myapp.authentication import CachedJWTAuthentication, claimed_user_id
+from myapp.db import routers
+
+
+def client_identity(request):
+    """
+    Identify the client making `request`: the user of its access token if
+    it sent a valid one, so the identity survives token refreshes, otherwise
+    its other credentials or its address.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION')
+    if header:
+        authentication = CachedJWTAuthentication()
+        raw_token = authentication.get_raw_token(header.encode(HTTP_HEADER_ENCODING))
+        if raw_token is not None:
+            try:
+                return f'user:{claimed_user_id(authentication.get_validated_token(raw_token))}'
+            except InvalidToken:
+                pass
+    return header or request.COOKIES.get('sessionid') or request.META.get('REMOTE_ADDR', '')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Allow safe-method requests to read from database replicas.
+
+    Unsafe requests use the primary throughout. After a successful one, the
+    client's reads stay on the primary for DATABASE_REPLICA_LAG_TOLERANCE
+    seconds, so it reads its own writes even if a replica is behind.
+    Works in both sync and async stacks, so async views run without a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        safe = request.method in SAFE_METHODS
+        client = client_identity(request)
+        allowed = safe and not routers.is_pinned(client)
+
+        token = routers.replica_reads_allowed.set(allowed)
+        replica_token = routers.request_replica.set({} if allowed else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.request_replica.reset(replica_token)
+            routers.replica_reads_allowed.reset(token)
+
+        if not safe and response.status_code < 400:
+            routers.pin_to_primary(client)
+        return response
+
+    async def __acall__(self, request):
+        safe = request.method in SAFE_METHODS
+        client = client_identity(request)
+        allowed = safe and not await routers.ais_pinned(client)
+
+        token = routers.replica_reads_allowed.set(allowed)
+        replica_token = routers.request_replica.set({} if allowed else None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.request_replica.reset(replica_token)
+            routers.replica_reads_allowed.reset(token)
+
+        if not safe and response.status_code < 400:
+            await routers.apin_to_primary(client)
+        return response
+
+
+def _wrap_queries(recorder):
+    """
+    Install `recorder` on every database connection of the current thread,
+    until the returned stack is closed.
+    """
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(recorder))
+    return stack
+
+
+class ProfilingMiddleware:
+    """
+    Profile a PROFILING_SAMPLE_RATE share of requests (see myapp/profiling.py).
+
+    Not used at all when the rate is 0, the default. Put it first, so the wall
+    time covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed()
+        self.slow_seconds = settings.PROFILING_SLOW_QUERY_MS / 1000
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = profiling.QueryRecorder(self.slow_seconds)
+        started = time.perf_counter()
+        with _wrap_queries(recorder):
+            response = self.get_response(request)
+        self.record(request, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        recorder = profiling.QueryRecorder(self.slow_seconds)
+        started = time.perf_counter()
+        # The async ORM queries from the request's thread-sensitive thread
+        stack = await sync_to_async(_wrap_queries)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, wall_seconds, recorder):
+        name = profiling.view_name(request)
+        if name is not None:
+            profiling.record(name, wall_seconds, recorder)
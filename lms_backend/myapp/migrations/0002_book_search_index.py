@@ -0,0 +1,108 @@
+# Generated by Django 5.1.3 on 2026-10-17 14:19
+
+import html
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_fulltext_index(apps, schema_editor):
+    # FULLTEXT indexes are MySQL-specific; other databases use the token table.
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX book_search_document_ft ON book_search_document (document)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX book_search_document_ft ON book_search_document')
+
+
+# The indexing below is a copy of myapp.search as of this migration, so later
+# changes to the search code don't change what the migration does.
+FIELD_WEIGHTS = {'title': 3, 'isbn': 3, 'author': 2, 'genre': 1}
+MAX_TOKEN_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+')
+ISBN_HYPHEN_RE = re.compile(r'(?<=\d)[- ](?=\d)')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = html.unescape(str(text))
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = ISBN_HYPHEN_RE.sub('', text.lower())
+    tokens = []
+    for token in TOKEN_RE.findall(text):
+        token = token[:MAX_TOKEN_LENGTH]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def index_existing_books(apps, schema_editor):
+    Book = apps.get_model('myapp', 'Book')
+    BookSearchDocument = apps.get_model('myapp', 'BookSearchDocument')
+    BookSearchToken = apps.get_model('myapp', 'BookSearchToken')
+    fulltext = settings.BOOK_SEARCH_BACKEND == 'myapp.search.MySQLFullTextBackend'
+
+    last_id = 0
+    while True:
+        books = list(Book.objects.filter(pk__gt=last_id).order_by('pk').select_related('author', 'genre')[:1000])
+        if not books:
+            break
+        last_id = books[-1].pk
+        documents, tokens = [], []
+        for book in books:
+            fields = {'title': book.title, 'isbn': book.isbn, 'author': book.author.name, 'genre': book.genre.name}
+            if fulltext:
+                document = ' '.join(' '.join(tokenize(text)) for text in fields.values())
+                documents.append(BookSearchDocument(book=book, document=document))
+                continue
+            weights = {}
+            for field, text in fields.items():
+                for token in tokenize(text):
+                    weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+            tokens += [BookSearchToken(book=book, token=token, weight=weight) for token, weight in weights.items()]
+        BookSearchDocument.objects.bulk_create(documents, batch_size=1000)
+        BookSearchToken.objects.bulk_create(tokens, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchDocument',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='myapp.book')),
+                ('document', models.TextField()),
+            ],
+            options={
+                'db_table': 'book_search_document',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='myapp.book')),
+            ],
+            options={
+                'db_table': 'book_search_token',
+                'indexes': [models.Index(fields=['token', 'book'], name='book_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(index_existing_books, migrations.RunPython.noop),
+    ]
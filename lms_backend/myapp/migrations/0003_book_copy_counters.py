@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-17 14:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_copy_counters(apps, schema_editor):
+    Book = apps.get_model('myapp', 'Book')
+    BookCopies = apps.get_model('myapp', 'BookCopies')
+
+    counts = BookCopies.objects.filter(book=OuterRef('pk')).values('book')
+    total = counts.annotate(n=Count('pk')).values('n')
+    available = counts.annotate(n=Count('pk', filter=Q(is_available=True))).values('n')
+    Book.objects.update(
+        total_copies=Coalesce(Subquery(total), 0),
+        available_copies=Coalesce(Subquery(available), 0),
+        quantity=Coalesce(Subquery(total), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_copy_counters, migrations.RunPython.noop),
+    ]
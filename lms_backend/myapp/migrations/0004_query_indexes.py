@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-17 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_book_copy_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['name'], name='author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['isbn'], name='book_isbn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='book_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookcopies',
+            index=models.Index(fields=['book', 'is_available'], name='book_copy_book_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['name'], name='genre_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservations',
+            index=models.Index(fields=['user', 'due_date'], name='reservations_user_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlist',
+            index=models.Index(fields=['book', 'date_placed'], name='waitlist_book_placed_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-17 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='bookcopies',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='reservations',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_modification_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='waitlist',
+            name='copy',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hold', to='myapp.bookcopies'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlist',
+            index=models.Index(fields=['book', 'book_lent', 'date_placed'], name='waitlist_book_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlist',
+            index=models.Index(fields=['limit_date', 'book_lent'], name='waitlist_limit_lent_idx'),
+        ),
+        # After the replacement exists, so the book foreign key always has an index
+        migrations.RemoveIndex(
+            model_name='waitlist',
+            name='waitlist_book_placed_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='waitlist',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='waitlist_user_book_uniq'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_waitlist_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanNotice',
+            fields=[
+                ('notice_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('overdue', 'Overdue'), ('due_soon', 'Due soon')], max_length=16)),
+                ('due_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'loan_notice',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reservations',
+            index=models.Index(fields=['due_date'], name='reservations_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='loannotice',
+            name='reservation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notices', to='myapp.reservations'),
+        ),
+        migrations.AddField(
+            model_name='loannotice',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='loannotice',
+            index=models.Index(fields=['sent_at', 'user', 'notice_id'], name='loan_notice_unsent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='loannotice',
+            constraint=models.UniqueConstraint(fields=('reservation', 'kind', 'due_date'), name='loan_notice_uniq'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.3 on 2026-10-17 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Fill the rollups from the existing copies and loans, as stats.rebuild()
+    did when this migration was written.
+    """
+    BookCopies = apps.get_model('myapp', 'BookCopies')
+    Reservations = apps.get_model('myapp', 'Reservations')
+    GenreStats = apps.get_model('myapp', 'GenreStats')
+    DueDateStats = apps.get_model('myapp', 'DueDateStats')
+    BookStats = apps.get_model('myapp', 'BookStats')
+
+    GenreStats.objects.bulk_create([
+        GenreStats(
+            genre_id=row['book__genre'], total_copies=row['total'],
+            available_copies=row['available'], on_loan=row['on_loan'],
+        )
+        for row in BookCopies.objects.order_by().values('book__genre').annotate(
+            total=Count('pk'),
+            available=Count('pk', filter=Q(is_available=True, hold__isnull=True)),
+            on_loan=Count('pk', filter=Q(is_available=False)),
+        )
+    ], batch_size=1000)
+    # A copy's open loan is its latest reservation, while the copy is checked out
+    later = Reservations.objects.filter(copy=OuterRef('copy'), reservation_id__gt=OuterRef('pk'))
+    open_loans = Reservations.objects.filter(copy__is_available=False).filter(~Exists(later))
+    DueDateStats.objects.bulk_create([
+        DueDateStats(due_date=due_date, on_loan=count)
+        for due_date, count in open_loans.order_by()
+        .values('due_date').annotate(count=Count('pk')).values_list('due_date', 'count')
+    ], batch_size=1000)
+    BookStats.objects.bulk_create([
+        BookStats(book_id=book_id, loans=count)
+        for book_id, count in Reservations.objects.order_by()
+        .values('book').annotate(count=Count('pk')).values_list('book', 'count')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_loan_notices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DueDateStats',
+            fields=[
+                ('due_date', models.DateField(primary_key=True, serialize=False)),
+                ('on_loan', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'stats_due_date',
+            },
+        ),
+        migrations.CreateModel(
+            name='GenreStats',
+            fields=[
+                ('genre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='myapp.genre')),
+                ('total_copies', models.IntegerField(default=0)),
+                ('available_copies', models.IntegerField(default=0)),
+                ('on_loan', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'stats_genre',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookStats',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='myapp.book')),
+                ('loans', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'stats_book',
+                'indexes': [models.Index(fields=['-loans'], name='stats_book_loans_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
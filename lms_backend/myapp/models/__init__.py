@@ -2,3 +2,6 @@ from .user_models import User
 from .book_models import Author, Genre, Book, BookCopies
 from .reservation_models import Reservations
 from .reservation_models import Waitlist
+from .reservation_models import LoanNotice
+from .search_models import BookSearchToken, BookSearchDocument
+from .stats_models import GenreStats, DueDateStats, BookStats
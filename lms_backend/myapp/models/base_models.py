@@ -0,0 +1,24 @@
+from django.db import models # type: ignore
+from django.utils import timezone # type: ignore
+
+
+class TimestampedQuerySet(models.QuerySet):
+    """
+    QuerySet for models with an `updated_at` field.
+
+    `auto_now` only applies to `save()`, so `update()` stamps the rows too
+    unless the caller sets `updated_at` itself. Conditional GETs rely on the
+    timestamp moving on every write.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def touch(self):
+        """
+        Mark the rows as modified, e.g. when data they serialize changed elsewhere.
+        """
+        return self.update(updated_at=timezone.now())
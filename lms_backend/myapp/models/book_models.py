@@ -1,4 +1,7 @@
 from django.db import models # type: ignore
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery # type: ignore
+from django.db.models.functions import Coalesce # type: ignore
+from .base_models import TimestampedQuerySet
 
 class Author(models.Model):
     """
@@ -12,6 +15,9 @@ class Author(models.Model):
 
     class Meta:
         db_table = "author"
+        indexes = [
+            models.Index(fields=['name'], name='author_name_idx'),
+        ]
 
 
 class Genre(models.Model):
@@ -26,6 +32,39 @@ class Genre(models.Model):
 
     class Meta:
         db_table = "genre"
+        indexes = [
+            models.Index(fields=['name'], name='genre_name_idx'),
+        ]
+
+
+class BookQuerySet(TimestampedQuerySet):
+    """
+    QuerySet helpers for loading books.
+    """
+
+    def with_listing_data(self):
+        """
+        Load everything BookSerializer reads (author, genre and copies) so a
+        whole page of books costs a constant number of queries instead of
+        several per book.
+        """
+        return self.select_related('author', 'genre').prefetch_related(
+            Prefetch('bookcopies_set', queryset=BookCopies.objects.order_by('copy_id'))
+        )
+
+    def with_counted_copies(self):
+        """
+        Annotate `counted_total` and `counted_available` from the book_copy
+        table, for checking the maintained counters against the real rows.
+        Copies on hold for a waitlist are on the shelf but not available.
+        """
+        copies = BookCopies.objects.filter(book=OuterRef('pk')).values('book')
+        total = copies.annotate(n=Count('pk')).values('n')
+        available = copies.annotate(n=Count('pk', filter=Q(is_available=True, hold__isnull=True))).values('n')
+        return self.annotate(
+            counted_total=Coalesce(Subquery(total), 0),
+            counted_available=Coalesce(Subquery(available), 0),
+        )
 
 
 class Book(models.Model):
@@ -38,12 +77,23 @@ class Book(models.Model):
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
     isbn = models.CharField(max_length=13)
     quantity = models.IntegerField(default=1)
+    # Maintained by myapp.circulation; rebuild with `manage.py reconcile_copy_counts`
+    total_copies = models.PositiveIntegerField(default=0)
+    available_copies = models.PositiveIntegerField(default=0)
+    # Bumped on every change to the book's serialized data, copies included
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
     class Meta:
         db_table = "book"
+        indexes = [
+            models.Index(fields=['isbn'], name='book_isbn_idx'),
+            models.Index(fields=['title'], name='book_title_idx'),
+        ]
 
 
 class BookCopies(models.Model):
@@ -53,9 +103,16 @@ class BookCopies(models.Model):
     copy_id = models.AutoField(primary_key=True)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     is_available = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TimestampedQuerySet.as_manager()
 
     def __str__(self):
         return str(self.copy_id)
 
     class Meta:
-        db_table = "book_copy"
\ No newline at end of file
+        db_table = "book_copy"
+        indexes = [
+            # Serves filter(book=..., is_available=...) and copy_id ordering per book
+            models.Index(fields=['book', 'is_available'], name='book_copy_book_avail_idx'),
+        ]
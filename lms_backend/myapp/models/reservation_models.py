@@ -1,5 +1,23 @@
 from django.db import models #type:ignore
+from django.db.models import Exists, OuterRef # type: ignore
 from . import User, Book, BookCopies
+from .base_models import TimestampedQuerySet
+
+
+class ReservationQuerySet(TimestampedQuerySet):
+    """
+    QuerySet helpers for reservations.
+    """
+
+    def open_loans(self):
+        """
+        Reservations whose copy is still out with them: the copy is checked
+        out and this is its latest reservation. Earlier reservations of a copy
+        lent again also read as not returned, since that derives from the copy.
+        """
+        later = Reservations.objects.filter(copy=OuterRef('copy'), reservation_id__gt=OuterRef('pk'))
+        return self.filter(copy__is_available=False).filter(~Exists(later))
+
 
 class Reservations(models.Model):
     reservation_id = models.AutoField(primary_key=True)
@@ -8,8 +26,11 @@ class Reservations(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     start_date = models.DateField()
     due_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
     # Remove 'returned' field
 
+    objects = ReservationQuerySet.as_manager()
+
     @property
     def returned(self):
         # If a copy is available again, it implies it has been returned.
@@ -20,15 +41,26 @@ class Reservations(models.Model):
 
     class Meta:
         db_table = "reservations"
+        indexes = [
+            models.Index(fields=['user', 'due_date'], name='reservations_user_due_idx'),
+            # Serves the due-date sweep: filter(due_date__lte=...) in (due_date, reservation_id) order
+            models.Index(fields=['due_date'], name='reservations_due_idx'),
+        ]
 
 
 class Waitlist(models.Model):
     """
     Table for the waitlist.
+
+    An entry waits in line (`book_lent` False) until `limit_date`. When a copy
+    of its book is returned, the head of the line gets a hold on it: `book_lent`
+    becomes True, `copy` is the held copy, and `limit_date` the last day to
+    collect it. Maintained by myapp.circulation.
     """
     queue_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    copy = models.OneToOneField(BookCopies, on_delete=models.CASCADE, null=True, blank=True, related_name='hold')
     date_placed = models.DateField()
     limit_date = models.DateField()
     book_lent = models.BooleanField(default=False)
@@ -38,3 +70,45 @@ class Waitlist(models.Model):
 
     class Meta:
         db_table = "waitlist"
+        indexes = [
+            # Serves the head of a book's line: filter(book=..., book_lent=False) ordered by date_placed
+            models.Index(fields=['book', 'book_lent', 'date_placed'], name='waitlist_book_queue_idx'),
+            # Serves expiry: filter(limit_date__lt=...) by book_lent
+            models.Index(fields=['limit_date', 'book_lent'], name='waitlist_limit_lent_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='waitlist_user_book_uniq'),
+        ]
+
+
+class LoanNotice(models.Model):
+    """
+    Ledger of overdue and due-soon notices, one per loan, kind and due date,
+    so sweeps can rerun without notifying twice; extending a loan makes its
+    notices due again. `sent_at` is set once the notice reached the outbox.
+    Maintained by myapp.notices.
+    """
+    OVERDUE = 'overdue'
+    DUE_SOON = 'due_soon'
+    KIND_CHOICES = [(OVERDUE, 'Overdue'), (DUE_SOON, 'Due soon')]
+
+    notice_id = models.BigAutoField(primary_key=True)
+    reservation = models.ForeignKey(Reservations, on_delete=models.CASCADE, related_name='notices')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    due_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return str(self.notice_id)
+
+    class Meta:
+        db_table = "loan_notice"
+        indexes = [
+            # Serves dispatch: filter(sent_at=None) in (user, notice_id) order
+            models.Index(fields=['sent_at', 'user', 'notice_id'], name='loan_notice_unsent_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['reservation', 'kind', 'due_date'], name='loan_notice_uniq'),
+        ]
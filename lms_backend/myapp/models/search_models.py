@@ -0,0 +1,36 @@
+from django.db import models #type:ignore
+from . import Book
+
+
+class BookSearchToken(models.Model):
+    """
+    Inverted index entry: one row per (token, book), weighted by the fields
+    the token appears in. Maintained by myapp.search.InvertedIndexBackend.
+    """
+    token = models.CharField(max_length=64)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_tokens')
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return self.token
+
+    class Meta:
+        db_table = "book_search_token"
+        indexes = [
+            models.Index(fields=['token', 'book'], name='book_search_token_idx'),
+        ]
+
+
+class BookSearchDocument(models.Model):
+    """
+    Denormalized search text for a book, covered by a MySQL FULLTEXT index.
+    Maintained by myapp.search.MySQLFullTextBackend.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    document = models.TextField()
+
+    def __str__(self):
+        return str(self.book_id)
+
+    class Meta:
+        db_table = "book_search_document"
@@ -0,0 +1,51 @@
+from django.db import models #type:ignore
+from . import Book, Genre
+
+
+class GenreStats(models.Model):
+    """
+    Rollup of the copies in a genre: all of them, those available to check
+    out, and those on loan (the rest are on hold). Maintained by myapp.stats.
+    """
+    genre = models.OneToOneField(Genre, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_copies = models.IntegerField(default=0)
+    available_copies = models.IntegerField(default=0)
+    on_loan = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.genre_id)
+
+    class Meta:
+        db_table = "stats_genre"
+
+
+class DueDateStats(models.Model):
+    """
+    Rollup of the loans still out per due date. Maintained by myapp.stats.
+    """
+    due_date = models.DateField(primary_key=True)
+    on_loan = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.due_date)
+
+    class Meta:
+        db_table = "stats_due_date"
+
+
+class BookStats(models.Model):
+    """
+    Rollup of how many times a book was checked out. Maintained by myapp.stats.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    loans = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.book_id)
+
+    class Meta:
+        db_table = "stats_book"
+        indexes = [
+            # Serves the most borrowed titles: order_by('-loans')[:n]
+            models.Index(fields=['-loans'], name='stats_book_loans_idx'),
+        ]
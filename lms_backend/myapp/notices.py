@@ -0,0 +1,206 @@
+"""
+Overdue and due-soon notices for loans still out.
+
+A sweep runs in two set-based passes, each streaming keyset chunks so memory
+stays bounded however many loans there are:
+
+1. record_notices() walks loans due by the end of the due-soon window whose
+   copy is still out, through the reservations(due_date) index, and records a
+   LoanNotice per loan, kind and due date that has none yet, with one
+   INSERT ... SELECT per chunk.
+2. dispatch_notices() walks unsent notices in user order and hands each
+   user's notices to the outbox as one batch, then marks them sent.
+
+The ledger makes reruns safe: a loan is recorded once per kind and due date,
+and only unsent notices are dispatched. A crash between writing a batch and
+marking it sent resends that batch on the next run, so delivery is at least
+once. The outbox is named by settings.LOAN_NOTICE_OUTBOX: FileOutbox appends
+batches to a local NDJSON file, EmailOutbox sends them through Django's mail.
+"""
+import json
+from collections import namedtuple
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+from pathlib import Path
+
+from django.conf import settings  # type: ignore
+from django.core.mail import EmailMessage, get_connection  # type: ignore
+from django.db import connections, router  # type: ignore
+from django.db.models import Case, CharField, DateTimeField, Exists, OuterRef, Value, When  # type: ignore
+from django.db.models.constants import OnConflict  # type: ignore
+from django.utils import timezone  # type: ignore
+from django.utils.module_loading import import_string  # type: ignore
+
+from myapp import metrics
+from myapp.models import LoanNotice, Reservations
+from myapp.pagination import chunked_values
+
+SUBJECTS = {
+    LoanNotice.OVERDUE: "Your library loans are overdue",
+    LoanNotice.DUE_SOON: "Your library loans are due soon",
+}
+
+
+def due_loans(today, due_soon_days):
+    """
+    Loans still out that are due within `due_soon_days` of `today`, or overdue.
+    """
+    return Reservations.objects.open_loans().filter(due_date__lte=today + timedelta(days=due_soon_days))
+
+
+def unrecorded(loans, kind):
+    """
+    Narrow `loans` to those with no notice of `kind` for their current due date.
+    """
+    recorded = LoanNotice.objects.filter(reservation=OuterRef('pk'), kind=kind, due_date=OuterRef('due_date'))
+    return loans.filter(~Exists(recorded))
+
+
+def notice_kind(today):
+    """
+    The kind of notice a loan is due, as an expression on its due_date.
+    """
+    return Case(
+        When(due_date__lt=today, then=Value(LoanNotice.OVERDUE)),
+        default=Value(LoanNotice.DUE_SOON),
+        output_field=CharField(),
+    )
+
+
+def _insert_notices(loans, today):
+    """
+    Record a notice for each of `loans` lacking one, in one INSERT ... SELECT,
+    and return how many were recorded.
+    """
+    rows = (
+        loans.annotate(notice_kind=notice_kind(today), notice_created=Value(timezone.now(), DateTimeField()))
+        .filter(~Exists(LoanNotice.objects.filter(
+            reservation=OuterRef('pk'), kind=OuterRef('notice_kind'), due_date=OuterRef('due_date'),
+        )))
+        .order_by()
+        # Fields before annotations: the order Django selects them in whatever the order given
+        .values_list('reservation_id', 'user_id', 'due_date', 'notice_kind', 'notice_created')
+    )
+    connection = connections[router.db_for_write(LoanNotice)]
+    fields = [LoanNotice._meta.get_field(name) for name in ('reservation', 'user', 'due_date', 'kind', 'created_at')]
+    select, params = rows.query.get_compiler(connection=connection).as_sql()
+    # A concurrent sweep may record the same notices; the unique constraint keeps one
+    sql = ' '.join(filter(None, [
+        connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        connection.ops.quote_name(LoanNotice._meta.db_table),
+        '(%s)' % ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        select,
+        connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    ]))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def record_notices(today, due_soon_days, chunk_size=1000):
+    """
+    Record a notice for every due or overdue loan without one for its kind
+    and due date. Yields (loans seen, notices recorded) after each chunk.
+
+    Each chunk's keys are read through the due_date index, then its notices
+    are inserted by the database from a SELECT, without loading rows here.
+    """
+    loans = due_loans(today, due_soon_days)
+    ordering = ('due_date', 'reservation_id')
+    for chunk in chunked_values(loans, ordering, ordering, chunk_size):
+        recorded = _insert_notices(loans.filter(pk__in=[reservation_id for _, reservation_id in chunk]), today)
+        yield len(chunk), recorded
+
+
+# An unsent notice as read for dispatch; the outbox gets lists of them, one list per user
+PendingNotice = namedtuple('PendingNotice', 'user_id notice_id email name reservation_id title kind due_date')
+PENDING_FIELDS = (
+    'user_id', 'notice_id', 'user__email', 'user__name', 'reservation_id', 'reservation__book__title', 'kind', 'due_date',
+)
+
+
+def dispatch_notices(outbox, chunk_size=1000):
+    """
+    Send unsent notices to `outbox`, one batch per user, and mark them sent.
+    Yields (users, notices) sent after each chunk.
+    """
+    pending = LoanNotice.objects.filter(sent_at__isnull=True)
+    # A user's notices can straddle chunks; the last user of a chunk waits for the next
+    carried = []
+    for chunk in chunked_values(pending, ('user_id', 'notice_id'), PENDING_FIELDS, chunk_size):
+        notices = carried + [PendingNotice(*row) for row in chunk]
+        carried = [notice for notice in notices if notice.user_id == notices[-1].user_id]
+        yield _send(outbox, notices[:len(notices) - len(carried)])
+    if carried:
+        yield _send(outbox, carried)
+
+
+def _send(outbox, notices):
+    if not notices:
+        return 0, 0
+    batches = [list(group) for _, group in groupby(notices, key=attrgetter('user_id'))]
+    outbox.send(batches)
+    LoanNotice.objects.filter(pk__in=[notice.notice_id for notice in notices]).update(sent_at=timezone.now())
+    metrics.incr('notices.sent', len(notices))
+    return len(batches), len(notices)
+
+
+def render_batch(notices):
+    """
+    Return the (subject, body) of the message telling a user about `notices`.
+    """
+    kinds = {notice.kind for notice in notices}
+    subject = SUBJECTS[LoanNotice.OVERDUE if LoanNotice.OVERDUE in kinds else LoanNotice.DUE_SOON]
+    lines = [f"Hello {notices[0].name},", ""]
+    for notice in notices:
+        state = "was due" if notice.kind == LoanNotice.OVERDUE else "is due"
+        lines.append(f"- {notice.title} {state} on {notice.due_date:%Y-%m-%d}")
+    lines += ["", "Please return or extend these loans."]
+    return subject, "\n".join(lines)
+
+
+class FileOutbox:
+    """
+    Appends one JSON object per user batch to LOAN_NOTICE_OUTBOX_PATH, a
+    stand-in for email that another process can pick up.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or settings.LOAN_NOTICE_OUTBOX_PATH)
+
+    def send(self, batches):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as outbox:
+            for notices in batches:
+                subject, body = render_batch(notices)
+                outbox.write(json.dumps({
+                    'to': notices[0].email,
+                    'subject': subject,
+                    'body': body,
+                    'notices': [
+                        {'notice_id': notice.notice_id, 'reservation_id': notice.reservation_id,
+                         'kind': notice.kind, 'due_date': notice.due_date.isoformat()}
+                        for notice in notices
+                    ],
+                }) + '\n')
+
+
+class EmailOutbox:
+    """
+    Sends each user batch as an email over one connection per chunk.
+    """
+
+    def send(self, batches):
+        messages = []
+        for notices in batches:
+            subject, body = render_batch(notices)
+            messages.append(EmailMessage(subject, body, to=[notices[0].email]))
+        get_connection().send_messages(messages)
+
+
+def get_outbox():
+    """
+    Return an instance of the outbox named by settings.LOAN_NOTICE_OUTBOX.
+    """
+    return import_string(settings.LOAN_NOTICE_OUTBOX)()
@@ -0,0 +1,318 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError  # type: ignore
+from django.db.models import Count, Max, Q  # type: ignore
+from rest_framework.exceptions import NotFound  # type: ignore
+from rest_framework.pagination import BasePagination  # type: ignore
+from rest_framework.response import Response  # type: ignore
+from rest_framework.settings import api_settings  # type: ignore
+from rest_framework.utils.urls import replace_query_param  # type: ignore
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Build the WHERE clause selecting rows strictly after `values` in `ordering`.
+
+    `ordering` is a sequence of field names, optionally prefixed with '-' for
+    descending order; the last field must be unique. With `reverse=True` the
+    rows strictly before `values` are selected instead.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            branch &= Q(**{previous.lstrip('-'): value})
+        condition |= branch
+    if len(ordering) > 1:
+        # Implied by the branches; bounds the index range on the leading field
+        # for databases that would otherwise evaluate the OR on every row
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') != reverse else 'gte'
+        condition &= Q(**{f'{first.lstrip("-")}__{lookup}': values[0]})
+    return condition
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+def row_position(row, ordering):
+    """
+    Return the values of `ordering` fields on `row`, i.e. its keyset position.
+    """
+    return [getattr(row, field.lstrip('-')) for field in ordering]
+
+
+def chunked_queryset(queryset, ordering, chunk_size):
+    """
+    Yield the rows of `queryset` in `ordering` as lists of up to `chunk_size`.
+
+    Each chunk is its own keyset query (`WHERE key > last_seen LIMIT n`), so
+    only one chunk is ever held in memory, on any database backend, and
+    prefetches run per chunk. Rows changed between chunks may be seen in
+    their old or new position, as with paging.
+    """
+    queryset = queryset.order_by(*ordering)
+    position = None
+    while True:
+        page = queryset if position is None else queryset.filter(keyset_filter(ordering, position))
+        rows = list(page[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        position = row_position(rows[-1], ordering)
+
+
+def chunked_values(queryset, ordering, fields, chunk_size):
+    """
+    Like chunked_queryset(), but yield lists of `fields` tuples instead of
+    model instances, for scans too large to build models for. `fields` must
+    start with the `ordering` fields, unsigned and in order.
+    """
+    queryset = queryset.order_by(*ordering).values_list(*fields)
+    position = None
+    while True:
+        page = queryset if position is None else queryset.filter(keyset_filter(ordering, position))
+        rows = list(page[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        position = rows[-1][:len(ordering)]
+
+
+async def achunked_queryset(queryset, ordering, chunk_size):
+    """
+    Async version of chunked_queryset().
+    """
+    queryset = queryset.order_by(*ordering)
+    position = None
+    while True:
+        page = queryset if position is None else queryset.filter(keyset_filter(ordering, position))
+        rows = [row async for row in page[:chunk_size]]
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        position = row_position(rows[-1], ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a unique ordering.
+
+    Each page is fetched with `WHERE key > last_seen ORDER BY key LIMIT n`, so
+    latency stays flat however deep a client pages. Cursors are opaque tokens;
+    clients follow the `next` and `previous` links from the response.
+    Passing `?paginate=false` returns the full, unpaginated list.
+    """
+    ordering = ('pk',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    disable_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the rows of the requested page, or None if pagination is disabled.
+        """
+        if self.is_disabled(request):
+            return None
+
+        rows = list(self.get_requested_page(queryset, request))
+        return self.build_page(rows)
+
+    def page_values(self, queryset, request, *fields):
+        """
+        Return `fields` of the rows on the requested page, look-ahead row
+        included, without loading the rows themselves. With pagination
+        disabled, returns `fields` of every row.
+        """
+        if self.is_disabled(request):
+            return list(queryset.order_by(*self.ordering).values_list(*fields))
+        return list(self.get_requested_page(queryset, request).values_list(*fields))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of paginate_queryset(), for async views.
+        """
+        if self.is_disabled(request):
+            return None
+
+        rows = [row async for row in self.get_requested_page(queryset, request)]
+        return self.build_page(rows)
+
+    async def apage_values(self, queryset, request, *fields):
+        """
+        Async version of page_values(), for async views.
+        """
+        if self.is_disabled(request):
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = self.get_requested_page(queryset, request)
+        return [row async for row in queryset.values_list(*fields)]
+
+    def page_versions(self, queryset, request, timestamp='updated_at'):
+        """
+        Return rows that change whenever the requested page does, for
+        conditional.validators(). A page yields its primary keys and
+        `timestamp`s, as page_values() does. With pagination disabled the
+        list is unbounded, so one aggregate row stands in for it: the row
+        count and highest primary key (catching deletions and additions) and
+        the newest `timestamp` (catching edits).
+        """
+        if self.is_disabled(request):
+            return [tuple(queryset.order_by().aggregate(**self.list_version(timestamp)).values())]
+        return self.page_values(queryset, request, 'pk', timestamp)
+
+    async def apage_versions(self, queryset, request, timestamp='updated_at'):
+        """
+        Async version of page_versions(), for async views.
+        """
+        if self.is_disabled(request):
+            return [tuple((await queryset.order_by().aaggregate(**self.list_version(timestamp))).values())]
+        return await self.apage_values(queryset, request, 'pk', timestamp)
+
+    def list_version(self, timestamp):
+        return {'rows': Count('pk'), 'last': Max('pk'), 'newest': Max(timestamp)}
+
+    def get_requested_page(self, queryset, request):
+        """
+        Read the page size and cursor from `request` and return the page of
+        `queryset` they select, look-ahead row included (unevaluated).
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        try:
+            queryset = self.get_page_queryset(queryset)
+        except (TypeError, ValueError, ValidationError):
+            # The cursor decoded, but its values don't fit the ordering fields.
+            raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1]
+
+    def get_page_queryset(self, queryset):
+        """
+        Apply the cursor position and ordering to `queryset` (unevaluated).
+        """
+        ordering = tuple(self.ordering)
+        if self.cursor is None:
+            return queryset.order_by(*ordering)
+
+        values, reverse = self.cursor
+        queryset = queryset.filter(keyset_filter(ordering, values, reverse=reverse))
+        if reverse:
+            ordering = reverse_ordering(ordering)
+        return queryset.order_by(*ordering)
+
+    def build_page(self, rows):
+        """
+        Trim the look-ahead row from `rows` and work out the neighbouring pages.
+        """
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if self.cursor is not None and self.cursor[1]:
+            # Paging backwards: rows were fetched in reverse order.
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def is_disabled(self, request):
+        value = request.query_params.get(self.disable_query_param)
+        return value is not None and value.lower() in ('false', '0', 'no')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, row):
+        return row_position(row, self.ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Paged past the end; step back from the cursor we were given.
+            values, _ = self.cursor
+            return self.encode_cursor(values, reverse=True)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['v']
+            reverse = bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, values, reverse):
+        payload = {'v': values}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, default=str, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+
+class BookPagination(KeysetPagination):
+    ordering = ('book_id',)
+
+
+class BookSearchPagination(KeysetPagination):
+    # Search results are ranked; book_id breaks ties between equal ranks.
+    ordering = ('-search_rank', 'book_id')
+
+
+class ReservationPagination(KeysetPagination):
+    ordering = ('reservation_id',)
+
+
+class UserPagination(KeysetPagination):
+    ordering = ('user_id',)
+
+
+class WaitlistPagination(KeysetPagination):
+    ordering = ('queue_id',)
@@ -0,0 +1,132 @@
+"""
+Sampled per-request profiling, recorded by ProfilingMiddleware.
+
+For a PROFILING_SAMPLE_RATE share of requests, a QueryRecorder wraps every
+query on every database connection (`connection.execute_wrapper`), and the
+middleware then records in myapp.metrics, with the view's name as the
+`view` label:
+
+- timings `view.wall` and `view.db`, the request's wall time and the time
+  spent in its queries;
+- counters `view.requests`, `view.queries`, `view.duplicate_queries`
+  (queries repeating an earlier one of the request, SQL and parameters
+  alike) and `view.slow_queries`.
+
+Queries taking PROFILING_SLOW_QUERY_MS or more are also kept, with their view
+and the project frames of their stack, in a log of the last
+PROFILING_SLOW_QUERY_LOG_SIZE. Their parameters are left out, as they may
+hold personal data. Unsampled requests are not wrapped at all, so they only
+pay for drawing a random number.
+"""
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings  # type: ignore
+from django.utils import timezone  # type: ignore
+
+from myapp import metrics
+
+# Frames of this many calls are kept per slow query, innermost last
+STACK_DEPTH = 8
+
+_lock = threading.Lock()
+_slow_queries = deque(maxlen=settings.PROFILING_SLOW_QUERY_LOG_SIZE)
+
+
+def view_name(request):
+    """
+    Return the name of the view that handled `request`, or None if no URL matched.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = getattr(match.func, 'view_class', match.func)
+    return view.__name__
+
+
+def project_stack():
+    """
+    Return the current call stack as "path:line in function" strings, keeping
+    only frames of the project's own code.
+    """
+    base = str(settings.BASE_DIR) + '/'
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(('profiling.py', 'middleware.py'))
+    ]
+    return [
+        f"{Path(frame.filename).relative_to(settings.BASE_DIR)}:{frame.lineno} in {frame.name}"
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+class QueryRecorder:
+    """
+    Execute wrapper counting and timing the queries of one request.
+    """
+
+    def __init__(self, slow_seconds):
+        self.slow_seconds = slow_seconds
+        self.queries = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+        self.slow = []
+        self._seen = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.seconds += elapsed
+            if not many:
+                try:
+                    key = hash((sql, tuple(params or ())))
+                except TypeError:
+                    key = None
+                if key is not None:
+                    if key in self._seen:
+                        self.duplicates += 1
+                    self._seen.add(key)
+            if elapsed >= self.slow_seconds:
+                self.slow.append({
+                    'sql': sql,
+                    'ms': round(elapsed * 1000, 3),
+                    'database': context['connection'].alias,
+                    'stack': project_stack(),
+                })
+
+
+def record(name, wall_seconds, recorder):
+    """
+    Add a profiled request of view `name` to the metrics and slow query log.
+    """
+    metrics.observe('view.wall', wall_seconds, view=name)
+    metrics.observe('view.db', recorder.seconds, view=name)
+    metrics.incr('view.requests', view=name)
+    metrics.incr('view.queries', recorder.queries, view=name)
+    metrics.incr('view.duplicate_queries', recorder.duplicates, view=name)
+    if recorder.slow:
+        metrics.incr('view.slow_queries', len(recorder.slow), view=name)
+        at = timezone.now().isoformat()
+        with _lock:
+            _slow_queries.extend({'view': name, 'at': at, **query} for query in recorder.slow)
+
+
+def slow_queries():
+    """
+    Return the logged slow queries of this process, most recent first.
+    """
+    with _lock:
+        return list(reversed(_slow_queries))
+
+
+def reset():
+    with _lock:
+        _slow_queries.clear()
@@ -0,0 +1,207 @@
+import html
+import re
+import unicodedata
+from functools import reduce
+from operator import add, or_
+
+from django.conf import settings  # type: ignore
+from django.db import transaction  # type: ignore
+from django.db.models import (  # type: ignore
+    BooleanField, Case, FloatField, Func, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast  # type: ignore
+from django.utils.module_loading import import_string  # type: ignore
+
+from myapp.models import Book, BookSearchDocument, BookSearchToken
+
+# Relative importance of each indexed field when ranking results.
+FIELD_WEIGHTS = {
+    'title': 3,
+    'isbn': 3,
+    'author': 2,
+    'genre': 1,
+}
+
+MAX_TOKEN_LENGTH = 64
+
+_TOKEN_RE = re.compile(r'\w+')
+_ISBN_HYPHEN_RE = re.compile(r'(?<=\d)[- ](?=\d)')
+
+
+def tokenize(text):
+    """
+    Split `text` into lowercase, accent-free search tokens.
+
+    Stored values may be HTML-escaped (see sanitize_string), and hyphens or
+    spaces between digits are dropped so "978-0-306-40615-7" matches the
+    compact ISBN. Duplicates are removed, preserving order.
+    """
+    if not text:
+        return []
+    text = html.unescape(str(text))
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = _ISBN_HYPHEN_RE.sub('', text.lower())
+
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        token = token[:MAX_TOKEN_LENGTH]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def book_fields(book):
+    """
+    Return the searchable text of `book` keyed by FIELD_WEIGHTS.
+    """
+    return {
+        'title': book.title,
+        'isbn': book.isbn,
+        'author': book.author.name,
+        'genre': book.genre.name,
+    }
+
+
+class SearchBackend:
+    """
+    Base class for catalog search backends.
+
+    A backend keeps its own index in sync through `index_books` (called on
+    book, author and genre saves) and answers `search` by filtering a Book
+    queryset and annotating it with an integer `search_rank`, higher first.
+    Deleting a book removes its index rows through the CASCADE foreign key.
+    """
+
+    def index_books(self, book_ids):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def load_books(self, book_ids):
+        return Book.objects.filter(pk__in=list(book_ids)).select_related('author', 'genre')
+
+
+class InvertedIndexBackend(SearchBackend):
+    """
+    Portable backend using the book_search_token table.
+
+    Every query term must match a token of the book; the last term is matched
+    as a prefix so results update on every keystroke. Books are ranked by the
+    summed field weights of the matching tokens. Works on any database, and
+    is the backend used by the SQLite test settings.
+    """
+
+    def index_books(self, book_ids):
+        books = list(self.load_books(book_ids))
+        entries = []
+        for book in books:
+            weights = {}
+            for field, text in book_fields(book).items():
+                for token in tokenize(text):
+                    weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+            entries.extend(
+                BookSearchToken(token=token, book=book, weight=weight)
+                for token, weight in weights.items()
+            )
+
+        with transaction.atomic():
+            BookSearchToken.objects.filter(book_id__in=[book.pk for book in books]).delete()
+            BookSearchToken.objects.bulk_create(entries, batch_size=1000)
+
+    def matching_tokens(self, terms):
+        """
+        Group index rows by book, keeping books that match every term.
+        """
+        conditions = [Q(token=term) for term in terms[:-1]]
+        conditions.append(Q(token__startswith=terms[-1]))
+
+        coverage = reduce(add, [
+            Max(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField()))
+            for condition in conditions
+        ])
+        return (
+            BookSearchToken.objects
+            .filter(reduce(or_, conditions))
+            .values('book')
+            .annotate(coverage=coverage, score=Sum('weight'))
+            .filter(coverage=len(conditions))
+        )
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+
+        matches = self.matching_tokens(terms)
+        rank = matches.filter(book=OuterRef('pk')).values('score')
+        return (
+            queryset
+            .filter(pk__in=matches.values('book'))
+            .annotate(search_rank=Subquery(rank, output_field=IntegerField()))
+            .order_by('-search_rank', 'book_id')
+        )
+
+
+class MatchAgainst(Func):
+    """
+    MySQL `MATCH (column) AGAINST (query IN BOOLEAN MODE)`.
+    """
+
+    def __init__(self, expression, query, **extra):
+        super().__init__(expression, Value(query), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, against = self.source_expressions
+        column_sql, column_params = compiler.compile(column)
+        against_sql, against_params = compiler.compile(against)
+        sql = f'MATCH ({column_sql}) AGAINST ({against_sql} IN BOOLEAN MODE)'
+        return sql, (*column_params, *against_params)
+
+
+class MySQLFullTextBackend(SearchBackend):
+    """
+    Backend using a FULLTEXT index on book_search_document.document.
+
+    Query terms are all required and the last one is a prefix term, matching
+    the semantics of InvertedIndexBackend. Note InnoDB ignores tokens shorter
+    than `innodb_ft_min_token_size` (3 by default) and its stopword list.
+    """
+
+    def index_books(self, book_ids):
+        books = list(self.load_books(book_ids))
+        documents = [
+            BookSearchDocument(
+                book=book,
+                document=' '.join(' '.join(tokenize(text)) for text in book_fields(book).values()),
+            )
+            for book in books
+        ]
+        with transaction.atomic():
+            BookSearchDocument.objects.filter(book_id__in=[book.pk for book in books]).delete()
+            BookSearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+
+        expression = ' '.join([f'+{term}' for term in terms[:-1]] + [f'+{terms[-1]}*'])
+        column = 'search_document__document'
+        return (
+            queryset
+            .filter(MatchAgainst(column, expression, output_field=BooleanField()))
+            .annotate(search_rank=Cast(
+                MatchAgainst(column, expression, output_field=FloatField()) * 1000,
+                IntegerField(),
+            ))
+            .order_by('-search_rank', 'book_id')
+        )
+
+
+def get_search_backend():
+    """
+    Return an instance of the backend named by settings.BOOK_SEARCH_BACKEND.
+    """
+    return import_string(settings.BOOK_SEARCH_BACKEND)()
@@ -1,9 +1,22 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer # type: ignore
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer # type: ignore
+from myapp.authentication import RefreshToken, add_user_claims
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        # Carry is_staff, name and email in the tokens as well
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         # Add custom fields to the token response
         data['is_staff'] = self.user.is_staff
         data['name'] = self.user.name
         return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    # Checks and blacklists rotated tokens through the Bloom filter
+    token_class = RefreshToken
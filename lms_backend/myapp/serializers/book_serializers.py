@@ -1,5 +1,6 @@
 from rest_framework import serializers  # type: ignore
 from myapp.models import Book, BookCopies, Genre, Author
+from myapp.circulation import add_copies
 import re
 from stdnum import isbn as stdnum_isbn
 
@@ -31,11 +32,12 @@ class BookSerializer(serializers.ModelSerializer):
 
     def get_is_available(self, obj):
         # Check if at least one copy of the book is available
-        return BookCopies.objects.filter(book=obj, is_available=True).exists()
+        return obj.available_copies > 0
 
     def get_copies(self, obj):
-        # Get all copies for the book
-        copies = BookCopies.objects.filter(book=obj)
+        # Get all copies for the book (served from the prefetch cache when loaded
+        # through Book.objects.with_listing_data())
+        copies = obj.bookcopies_set.all()
         return BookCopySerializer(copies, many=True).data
 
     def create(self, validated_data):
@@ -66,8 +68,7 @@ class BookSerializer(serializers.ModelSerializer):
 
         # Create the specified number of BookCopies
         if copy_number > 0:
-            book_copies = [BookCopies(book=book, is_available=True) for _ in range(copy_number)]
-            BookCopies.objects.bulk_create(book_copies)
+            add_copies(book, copy_number)
 
         return book
 
@@ -1,5 +1,5 @@
 from rest_framework import serializers  # type: ignore
-from myapp.models import Reservations
+from myapp.models import Reservations, Waitlist
 from datetime import timedelta
 
 class ReservationSerializer(serializers.ModelSerializer):
@@ -31,3 +31,18 @@ class ReservationSerializer(serializers.ModelSerializer):
 
         # Create and return the reservation
         return super().create(validated_data)
+
+
+class WaitlistSerializer(serializers.ModelSerializer):
+    user_email = serializers.CharField(source='user.email', read_only=True)
+    book_title = serializers.CharField(source='book.title', read_only=True)
+    # Annotated by myapp.circulation.with_positions; 0 when a copy is on hold
+    position = serializers.IntegerField(read_only=True)
+    on_hold = serializers.BooleanField(source='book_lent', read_only=True)
+
+    class Meta:
+        model = Waitlist
+        fields = [
+            'queue_id', 'user', 'book', 'copy', 'user_email', 'book_title',
+            'date_placed', 'limit_date', 'position', 'on_hold',
+        ]
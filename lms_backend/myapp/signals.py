@@ -0,0 +1,104 @@
+from django.db.models import F  # type: ignore
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save  # type: ignore
+from django.dispatch import receiver  # type: ignore
+
+from myapp import stats
+from myapp.authentication import invalidate_user
+from myapp.cache import invalidate_books
+from myapp.models import Author, Book, BookCopies, Genre, User
+from myapp.search import get_search_backend
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, **kwargs):
+    """
+    Keep the search index in sync with book creates and updates.
+    Index rows of deleted books are removed by their CASCADE foreign key.
+    """
+    get_search_backend().index_books([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_cached_book(sender, instance, **kwargs):
+    """
+    Drop the cached payload of a saved or deleted book and retire cached
+    listings, which it may join, leave or move within.
+    """
+    invalidate_books([instance.pk], listings=True)
+
+
+@receiver(pre_save, sender=Book)
+def remember_book_genre(sender, instance, **kwargs):
+    """
+    Note the stored genre of a book about to be saved, so its copies can be
+    moved between genres in the dashboard rollups if it changes.
+    """
+    if instance.pk is not None and not instance._state.adding:
+        instance._stored_genre_id = Book.objects.filter(pk=instance.pk).values_list('genre_id', flat=True).first()
+
+
+@receiver(post_save, sender=Book)
+def move_book_stats(sender, instance, created, **kwargs):
+    """
+    Move the copies of a book whose genre changed to its new genre in the
+    dashboard rollups.
+    """
+    stored_genre_id = getattr(instance, '_stored_genre_id', None)
+    if not created and stored_genre_id is not None and stored_genre_id != instance.genre_id:
+        stats.book_moved(instance.pk, stored_genre_id, instance.genre_id)
+    instance._stored_genre_id = instance.genre_id
+
+
+@receiver(pre_delete, sender=Book)
+def remove_book_stats(sender, instance, **kwargs):
+    """
+    Take a book's copies and loans out of the dashboard rollups while they
+    still exist; the delete cascades to them.
+    """
+    stats.book_deleted(instance)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def reindex_renamed_books(sender, instance, created, **kwargs):
+    """
+    Re-index the books of an author or genre whose name changed, and mark
+    them modified since their payloads include the name.
+    """
+    if created:
+        return
+    field = 'author' if sender is Author else 'genre'
+    books = Book.objects.filter(**{field: instance})
+    book_ids = list(books.values_list('pk', flat=True))
+    books.touch()
+    get_search_backend().index_books(book_ids)
+    invalidate_books(book_ids, listings=True)
+
+
+@receiver(post_save, sender=BookCopies)
+def count_saved_copy(sender, instance, created, **kwargs):
+    """
+    Keep the book's copy counters, the dashboard rollups and cached payload
+    in step with copies saved one at a time.
+    Bulk-created copies are counted by myapp.circulation.add_copies.
+    """
+    if created:
+        Book.objects.filter(pk=instance.book_id).update(
+            # First: MySQL evaluates SET clauses in order, reading columns already set
+            quantity=F('total_copies') + 1,
+            total_copies=F('total_copies') + 1,
+            available_copies=F('available_copies') + (1 if instance.is_available else 0),
+        )
+        stats.record(total={instance.book_id: 1}, available={instance.book_id: 1 if instance.is_available else 0})
+    invalidate_books([instance.book_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached auth fields of a saved or deleted user, so edits made
+    through UserDetailView (or anywhere else) apply to their next request.
+    """
+    invalidate_user(instance.pk)
@@ -0,0 +1,198 @@
+"""
+Rollup tables behind the staff dashboard.
+
+GenreStats counts copies per genre, DueDateStats the loans still out per due
+date, and BookStats the checkouts per book. They are updated by the code that
+changes what they count, in the same transaction: myapp.circulation for
+checkouts, returns and holds, the copy and book signals for catalog edits,
+and the catalog importer. So the dashboard reads a few small tables, one row
+per genre and due date and the top of an index, whatever the catalog size.
+
+Counts are adjusted with `F()` updates, so concurrent changes add up. Changes
+made around this module (raw SQL, deleting users with loans out) leave the
+rollups behind; `manage.py rebuild_stats` recomputes them from the book_copy
+and reservations tables.
+"""
+from collections import Counter
+
+from django.db import transaction  # type: ignore
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When  # type: ignore
+
+from myapp.models import Book, BookCopies, BookStats, DueDateStats, GenreStats, Reservations
+
+
+def _add(model, changes):
+    """
+    Add `changes` ({pk: {field: delta}}) to the rows of `model`, in one
+    UPDATE per call, creating missing rows first.
+    """
+    changes = {pk: deltas for pk, deltas in changes.items() if any(deltas.values())}
+    if not changes:
+        return
+    fields = {field for deltas in changes.values() for field in deltas}
+
+    def update(pks):
+        return model.objects.filter(pk__in=pks).update(**{
+            field: F(field) + Case(
+                *[When(pk=pk, then=Value(changes[pk].get(field, 0))) for pk in pks],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            for field in fields
+        })
+
+    pks = list(changes)
+    if update(pks) < len(pks):
+        # New genres, books or due dates; rows other writers create meanwhile are kept
+        existing = set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+        missing = [pk for pk in pks if pk not in existing]
+        model.objects.bulk_create([model(pk=pk) for pk in missing], ignore_conflicts=True)
+        update(missing)
+
+
+def record(total=None, available=None, on_loan=None, borrowed=None, due=None, genres=None):
+    """
+    Apply one change to the rollups. `total`, `available` and `on_loan` map
+    book ids to changes in their copies' counts, `borrowed` book ids to new
+    checkouts, and `due` due dates to changes in the loans out. `genres`
+    maps the books to their genre ids, and is looked up if omitted.
+    """
+    book_fields = {'total_copies': total or {}, 'available_copies': available or {}, 'on_loan': on_loan or {}}
+    book_ids = {book_id for deltas in book_fields.values() for book_id, delta in deltas.items() if delta}
+    if book_ids:
+        if genres is None or not book_ids <= genres.keys():
+            genres = dict(Book.objects.filter(pk__in=list(book_ids)).values_list('pk', 'genre_id'))
+        by_genre = {}
+        for field, deltas in book_fields.items():
+            for book_id, delta in deltas.items():
+                if delta and book_id in genres:
+                    counts = by_genre.setdefault(genres[book_id], Counter())
+                    counts[field] += delta
+        _add(GenreStats, by_genre)
+    _add(DueDateStats, {due_date: {'on_loan': delta} for due_date, delta in (due or {}).items()})
+    _add(BookStats, {book_id: {'loans': count} for book_id, count in (borrowed or {}).items()})
+
+
+def loan_due_date():
+    """
+    The due date of a copy's latest reservation, as an expression on
+    BookCopies; for a copy on loan, that of its open loan.
+    """
+    latest = Reservations.objects.filter(copy=OuterRef('pk')).order_by('-reservation_id')
+    return Subquery(latest.values('due_date')[:1])
+
+
+def open_loan_due_dates(copy_ids):
+    """
+    Return {copy_id: due_date} of the open loans of `copy_ids`.
+    """
+    return dict(
+        BookCopies.objects.filter(pk__in=list(copy_ids), is_available=False)
+        .values_list('pk', loan_due_date())
+    )
+
+
+def book_deleted(book):
+    """
+    Take `book`'s copies and open loans out of the rollups, before it is deleted.
+    """
+    copies = BookCopies.objects.filter(book=book).aggregate(
+        total=Count('pk'),
+        available=Count('pk', filter=Q(is_available=True, hold__isnull=True)),
+        on_loan=Count('pk', filter=Q(is_available=False)),
+    )
+    due = Counter(Reservations.objects.open_loans().filter(book=book).values_list('due_date', flat=True))
+    record(
+        total={book.pk: -copies['total']},
+        available={book.pk: -copies['available']},
+        on_loan={book.pk: -copies['on_loan']},
+        due={due_date: -count for due_date, count in due.items()},
+        genres={book.pk: book.genre_id},
+    )
+
+
+def book_moved(book_id, old_genre_id, new_genre_id):
+    """
+    Move the copies of `book_id` between genres in the rollups.
+    """
+    copies = BookCopies.objects.filter(book_id=book_id).aggregate(
+        total_copies=Count('pk'),
+        available_copies=Count('pk', filter=Q(is_available=True, hold__isnull=True)),
+        on_loan=Count('pk', filter=Q(is_available=False)),
+    )
+    _add(GenreStats, {
+        old_genre_id: {field: -count for field, count in copies.items()},
+        new_genre_id: copies,
+    })
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Recompute every rollup from the book_copy and reservations tables.
+    Returns the number of (genre, due date, book) rows written.
+    """
+    GenreStats.objects.all().delete()
+    DueDateStats.objects.all().delete()
+    BookStats.objects.all().delete()
+
+    genres = [
+        GenreStats(genre_id=row['book__genre'], total_copies=row['total'],
+                   available_copies=row['available'], on_loan=row['on_loan'])
+        for row in BookCopies.objects.order_by().values('book__genre').annotate(
+            total=Count('pk'),
+            available=Count('pk', filter=Q(is_available=True, hold__isnull=True)),
+            on_loan=Count('pk', filter=Q(is_available=False)),
+        )
+    ]
+    due_dates = [
+        DueDateStats(due_date=due_date, on_loan=count)
+        for due_date, count in Reservations.objects.open_loans().order_by()
+        .values('due_date').annotate(count=Count('pk')).values_list('due_date', 'count')
+    ]
+    books = [
+        BookStats(book_id=book_id, loans=count)
+        for book_id, count in Reservations.objects.order_by()
+        .values('book').annotate(count=Count('pk')).values_list('book', 'count')
+    ]
+    GenreStats.objects.bulk_create(genres, batch_size=1000)
+    DueDateStats.objects.bulk_create(due_dates, batch_size=1000)
+    BookStats.objects.bulk_create(books, batch_size=1000)
+    return len(genres), len(due_dates), len(books)
+
+
+def dashboard(today, top=10):
+    """
+    Return the staff dashboard figures as of `today`, from the rollups only.
+    """
+    genres = list(
+        GenreStats.objects.order_by('genre__name', 'genre_id')
+        .values('genre_id', 'total_copies', 'available_copies', 'on_loan', name=F('genre__name'))
+    )
+    loans = DueDateStats.objects.aggregate(
+        loans_out=Sum('on_loan'),
+        overdue=Sum('on_loan', filter=Q(due_date__lt=today)),
+        due_today=Sum('on_loan', filter=Q(due_date=today)),
+    )
+    top_titles = list(
+        BookStats.objects.filter(loans__gt=0).order_by('-loans', 'book_id')
+        .values('book_id', 'loans', title=F('book__title'))[:top]
+    )
+    total = sum(genre['total_copies'] for genre in genres)
+    available = sum(genre['available_copies'] for genre in genres)
+    on_loan = sum(genre['on_loan'] for genre in genres)
+    return {
+        'copies': {
+            'total': total,
+            'available': available,
+            'on_loan': on_loan,
+            'on_hold': total - available - on_loan,
+        },
+        'loans': {
+            'on_loan': loans['loans_out'] or 0,
+            'overdue': loans['overdue'] or 0,
+            'due_today': loans['due_today'] or 0,
+        },
+        'genres': genres,
+        'top_titles': top_titles,
+    }
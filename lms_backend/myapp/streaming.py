@@ -0,0 +1,105 @@
+import logging
+
+from django.http import StreamingHttpResponse  # type: ignore
+from rest_framework.renderers import JSONRenderer  # type: ignore
+
+from myapp.pagination import achunked_queryset, chunked_queryset
+
+logger = logging.getLogger(__name__)
+
+# `?stream=` values and the content type each is served as
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows loaded, serialized and sent per query
+STREAM_CHUNK_SIZE = 500
+
+
+def requested_format(request):
+    """
+    Return the stream format requested with `?stream=`, or None for a normal
+    response. Raises ValueError with a message for the client if it is unknown.
+    """
+    value = request.query_params.get('stream')
+    if not value:
+        return None
+    if value not in STREAM_FORMATS:
+        raise ValueError(f"stream must be one of: {', '.join(STREAM_FORMATS)}.")
+    return value
+
+
+def render_chunk(items, stream_format, first):
+    """
+    Render serialized `items` as the next piece of a JSON array or of NDJSON.
+    """
+    renderer = JSONRenderer()
+    if stream_format == 'ndjson':
+        return b''.join(renderer.render(item) + b'\n' for item in items)
+    # Strip the brackets of the rendered list; the stream supplies its own
+    body = renderer.render(items)[1:-1]
+    return body if first else b',' + body
+
+
+def stream_chunks(chunks, serialize, stream_format):
+    first = True
+    if stream_format == 'json':
+        yield b'['
+    try:
+        for rows in chunks:
+            yield render_chunk(serialize(rows), stream_format, first)
+            first = False
+    except Exception:
+        # The status line is already sent; a truncated body is all the client gets
+        logger.exception("Streaming export failed")
+        raise
+    if stream_format == 'json':
+        yield b']'
+
+
+async def astream_chunks(chunks, serialize, stream_format):
+    first = True
+    if stream_format == 'json':
+        yield b'['
+    try:
+        async for rows in chunks:
+            yield render_chunk(serialize(rows), stream_format, first)
+            first = False
+    except Exception:
+        logger.exception("Streaming export failed")
+        raise
+    if stream_format == 'json':
+        yield b']'
+
+
+def stream_response(queryset, ordering, serialize, stream_format, chunk_size=None):
+    """
+    Stream every row of `queryset`, in `ordering`, as a JSON array or NDJSON.
+
+    Rows are loaded in keyset chunks and each chunk is serialized with
+    `serialize` (a list of rows to a list of payloads) and sent before the
+    next is loaded, so memory stays flat whatever the result size and the
+    first bytes go out after the first chunk. Under ASGI, Django buffers sync
+    iterators; async views should use astream_response().
+    """
+    # Choose the database now: the request's routing context is gone by the
+    # time the server iterates the response.
+    queryset = queryset.using(queryset.db)
+    chunks = chunked_queryset(queryset, ordering, chunk_size or STREAM_CHUNK_SIZE)
+    return StreamingHttpResponse(
+        stream_chunks(chunks, serialize, stream_format),
+        content_type=STREAM_FORMATS[stream_format],
+    )
+
+
+def astream_response(queryset, ordering, serialize, stream_format, chunk_size=None):
+    """
+    Async version of stream_response(), for async views.
+    """
+    queryset = queryset.using(queryset.db)
+    chunks = achunked_queryset(queryset, ordering, chunk_size or STREAM_CHUNK_SIZE)
+    return StreamingHttpResponse(
+        astream_chunks(chunks, serialize, stream_format),
+        content_type=STREAM_FORMATS[stream_format],
+    )
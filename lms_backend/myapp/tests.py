@@ -1,8 +1,42 @@
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from rest_framework.test import APITestCase, APITransactionTestCase
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
 from rest_framework import status
-from myapp.models import Author, Genre, Book, BookCopies, Reservations
+from rest_framework.views import APIView
+from myapp.models import (
+    Author, Genre, Book, BookCopies, BookStats, DueDateStats, GenreStats, LoanNotice, Reservations, Waitlist,
+)
 from datetime import date, timedelta
+import asyncio
+from asgiref.sync import async_to_sync
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from myapp.management.commands import audit_indexes, hash_passwords
+from myapp import catalog_import
+from stdnum import ean
+from myapp.circulation import (
+    HOLD_PERIOD, CopyUnavailable, add_copies, bulk_checkout, bulk_return, checkout, expire_holds, extend,
+    join_waitlist, mark_returned,
+)
+from myapp import cache as catalog_cache, metrics, profiling, throttling, token_blacklist
+from myapp.db.pool import ConnectionPool, PoolTimeout
+from myapp.db import routers
+from myapp.search import get_search_backend
+from rest_framework_simplejwt.tokens import AccessToken, BlacklistMixin, RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -138,6 +172,35 @@ class SignInTests(APITestCase):
         }, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_signin_checks_password_once(self):
+        """Test sign-in hashes the password a single time."""
+        with mock.patch.object(MD5PasswordHasher, 'verify', autospec=True,
+                               side_effect=MD5PasswordHasher.verify) as verify:
+            response = self.client.post('/api/auth/sign-in/', {
+                'email': 'testuser@example.com',
+                'password': 'password123'
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(str(AccessToken(response.data['access'])['user_id']), str(self.user.user_id))
+
+    @override_settings(PASSWORD_HASHERS=['myapp.hashers.PBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+                       PASSWORD_HASH_ITERATIONS=1000)
+    def test_signin_rehashes_outdated_password(self):
+        """Test sign-in re-hashes passwords from another hasher or iteration count."""
+        def sign_in():
+            response = self.client.post('/api/auth/sign-in/', {
+                'email': 'testuser@example.com',
+                'password': 'password123'
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.user.refresh_from_db()
+            return self.user.password
+
+        self.assertTrue(sign_in().startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(sign_in().startswith('pbkdf2_sha256$2000$'))
+
 
 class UserMeTests(APITestCase):
     """Tests for GET /api/auth/users/me/."""
@@ -193,7 +256,7 @@ class UserListTests(AuthTestMixin, APITestCase):
         self.authenticate_as_staff()
         response = self.client.get('/api/users/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        emails = [user['email'] for user in response.data]
+        emails = [user['email'] for user in response.data['results']]
         self.assertIn('regular@example.com', emails)
         self.assertNotIn('staff@example.com', emails)
 
@@ -249,6 +312,71 @@ class UserDetailTests(AuthTestMixin, APITestCase):
         self.assertFalse(User.objects.filter(user_id=self.user.user_id).exists())
 
 
+class AuthCacheTests(AuthTestMixin, APITestCase):
+    """Tests for resolving JWT users through the auth cache."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+
+    def test_cached_user_costs_no_queries(self):
+        """Test a repeat request authenticates without querying the user."""
+        self.authenticate_as_user(self.user)
+        self.client.get('/api/auth/users/me/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/users/me/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data['email'], 'testuser@example.com')
+        self.assertEqual(metrics.snapshot()['counters']['auth.user.miss'], 1)
+
+    def test_tokens_carry_user_claims(self):
+        """Test sign-in and sign-up tokens carry the user's email, name and staff flag."""
+        response = self.client.post('/api/auth/sign-in/', {
+            'email': 'testuser@example.com', 'password': 'password123'
+        }, format='json')
+        claims = AccessToken(response.data['access'])
+        self.assertEqual((claims['email'], claims['name'], claims['is_staff']),
+                         ('testuser@example.com', 'Test User', False))
+
+        response = self.client.post('/api/auth/sign-up/', {
+            'name': 'New User', 'email': 'new@example.com', 'password': 'password123'
+        }, format='json')
+        self.assertEqual(AccessToken(response.data['access'])['email'], 'new@example.com')
+
+    def test_saved_user_is_reloaded(self):
+        """Test a rename or demotion is seen by the next request."""
+        self.authenticate_as_user(self.user)
+        self.client.get('/api/auth/users/me/')
+        self.client.put(f'/api/users/{self.user.user_id}/', {'name': 'Updated Name'}, format='json')
+        self.assertEqual(self.client.get('/api/auth/users/me/').data['name'], 'Updated Name')
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertFalse(self.client.get('/api/auth/users/me/').data['is_staff'])
+        User.objects.get(pk=self.user.pk).save()
+        self.assertTrue(self.client.get('/api/auth/users/me/').data['is_staff'])
+
+    def test_deleted_or_inactive_user_is_rejected(self):
+        """Test tokens of deactivated and deleted users stop working."""
+        self.authenticate_as_user(self.user)
+        self.client.get('/api/auth/users/me/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/users/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/auth/users/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get('/api/async/auth/users/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_request_user_is_read_only(self):
+        """Test the cached request user refuses to be saved."""
+        self.authenticate_as_user(self.user)
+        request = self.client.get('/api/auth/users/me/').wsgi_request
+        with self.assertRaises(TypeError):
+            request.user.save()
+
+
 class BookListTests(AuthTestMixin, APITestCase):
     """Tests for /api/books/."""
 
@@ -267,26 +395,26 @@ class BookListTests(AuthTestMixin, APITestCase):
         """Test listing all books (public access)."""
         response = self.client.get('/api/books/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Test Book')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Test Book')
 
     def test_search_books_by_title(self):
         """Test searching books by title (public access)."""
         response = self.client.get('/api/books/', {'q': 'Test'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_search_books_by_author(self):
         """Test searching books by author name (public access)."""
         response = self.client.get('/api/books/', {'q': 'Test Author'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_search_books_no_results(self):
         """Test search with no matching results (public access)."""
         response = self.client.get('/api/books/', {'q': 'Nonexistent'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
 
     def test_create_book(self):
         """Test staff can create a new book."""
@@ -321,6 +449,163 @@ class BookListTests(AuthTestMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class BookListQueryCountTests(APITestCase):
+    """Query-count regression tests for GET /api/books/."""
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Test Author')
+        self.genre = Genre.objects.create(name='Fiction')
+
+    def create_books(self, count):
+        for i in range(count):
+            book = Book.objects.create(
+                title=f'Book {i}',
+                author=self.author,
+                genre=self.genre,
+                isbn='9780306406157',
+            )
+            BookCopies.objects.create(book=book, is_available=True)
+            BookCopies.objects.create(book=book, is_available=False)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/books/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_does_not_grow_with_catalog_size(self):
+        """Test listing books costs the same number of queries for 2 or 20 books."""
+        self.create_books(2)
+        small_count, _ = self.count_list_queries()
+        self.create_books(18)
+        large_count, response = self.count_list_queries()
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(small_count, large_count)
+
+    def test_listing_reports_copies_and_availability(self):
+        """Test the prefetched copies and annotated availability are serialized."""
+        self.create_books(1)
+        _, response = self.count_list_queries()
+        book = response.data['results'][0]
+        self.assertTrue(book['is_available'])
+        self.assertEqual(len(book['copies']), 2)
+        self.assertEqual(book['author_name'], 'Test Author')
+
+
+class BookSearchTests(AuthTestMixin, APITestCase):
+    """Tests for the `q` search parameter of GET /api/books/."""
+
+    def setUp(self):
+        orwell = Author.objects.create(name='George Orwell')
+        dystopian = Genre.objects.create(name='Dystopian')
+        self.nineteen = Book.objects.create(
+            title='1984', author=orwell, genre=dystopian, isbn='9780451524935'
+        )
+        self.farm = Book.objects.create(
+            title='Animal Farm', author=orwell, genre=Genre.objects.create(name='Political Fiction'),
+            isbn='9780451526342'
+        )
+        self.dystopia = Book.objects.create(
+            title='Dystopia Now', author=Author.objects.create(name='Jane Doe'), genre=dystopian,
+            isbn='9780306406157'
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/books/', {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def test_prefix_matching(self):
+        """Test the last query term matches as a prefix for typeahead."""
+        self.assertEqual(self.search('anim'), ['Animal Farm'])
+        self.assertEqual(self.search('orwell fa'), ['Animal Farm'])
+
+    def test_search_by_genre_and_isbn(self):
+        """Test genre names and hyphenated ISBNs are searchable."""
+        self.assertCountEqual(self.search('political'), ['Animal Farm'])
+        self.assertEqual(self.search('978-0-451-52493-5'), ['1984'])
+
+    def test_results_are_ranked(self):
+        """Test a title match ranks above a genre match."""
+        self.assertEqual(self.search('dystopia'), ['Dystopia Now', '1984'])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test the index is kept in sync on book update, author rename and delete."""
+        self.authenticate_as_staff()
+        self.client.put(f'/api/books/{self.farm.book_id}/', {'title': 'Burmese Days'}, format='json')
+        self.assertEqual(self.search('burmese'), ['Burmese Days'])
+        self.assertEqual(self.search('animal'), [])
+
+        author = self.dystopia.author
+        author.name = 'Aldous Huxley'
+        author.save()
+        self.assertEqual(self.search('huxley'), ['Dystopia Now'])
+
+        self.client.delete(f'/api/books/{self.nineteen.book_id}/')
+        self.assertEqual(self.search('orwell'), ['Burmese Days'])
+
+    def test_ranked_results_paginate(self):
+        """Test search results page by rank without repeating books."""
+        response = self.client.get('/api/books/', {'q': 'dystopia', 'page_size': 1})
+        titles = [book['title'] for book in response.data['results']]
+        response = self.client.get(response.data['next'])
+        titles += [book['title'] for book in response.data['results']]
+        self.assertEqual(titles, ['Dystopia Now', '1984'])
+        self.assertIsNone(response.data['next'])
+
+
+class PaginationTests(AuthTestMixin, APITestCase):
+    """Tests for keyset pagination on the list endpoints."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', author=author, genre=genre, isbn='9780306406157')
+            for i in range(5)
+        ]
+
+    def test_pages_follow_next_and_previous_cursors(self):
+        """Test walking forward and back through pages returns every book once."""
+        response = self.client.get('/api/books/', {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['previous'])
+        seen = [book['book_id'] for book in response.data['results']]
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [book['book_id'] for book in response.data['results']]
+        self.assertEqual(seen, [book.book_id for book in self.books])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [book['book_id'] for book in response.data['results']],
+            [book.book_id for book in self.books[2:4]],
+        )
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns 404."""
+        response = self.client.get('/api/books/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pagination_can_be_disabled(self):
+        """Test paginate=false returns the legacy unpaginated list."""
+        response = self.client.get('/api/books/', {'paginate': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_user_list_is_paginated(self):
+        """Test the staff user list is paginated by user_id."""
+        self.authenticate_as_staff()
+        for i in range(3):
+            User.objects.create_user(name=f'User {i}', email=f'user{i}@example.com', password='password123')
+        response = self.client.get('/api/users/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+
 class BookDetailTests(AuthTestMixin, APITestCase):
     """Tests for /api/books/<id>/."""
 
@@ -432,7 +717,7 @@ class ReservationListTests(AuthTestMixin, APITestCase):
         self.authenticate_as_user(self.user)
         response = self.client.get('/api/reservations/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
 
     def test_create_reservation(self):
         """Test staff can create a new reservation."""
@@ -466,6 +751,49 @@ class ReservationListTests(AuthTestMixin, APITestCase):
         }, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_create_reservation_picks_free_copy(self):
+        """Test a free copy is picked when copy_id is omitted."""
+        self.authenticate_as_staff()
+        BookCopies.objects.filter(pk=self.copy.pk).update(is_available=False)
+        free_copy = BookCopies.objects.create(book=self.book, is_available=True)
+        response = self.client.post('/api/reservations/', {
+            'email': 'testuser@example.com',
+            'book_id': self.book.book_id,
+            'start_date': str(date.today())
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['copy'], free_copy.copy_id)
+        self.assertEqual(response.data['due_date'], str(date.today() + timedelta(days=7)))
+
+    def test_create_reservation_copy_on_loan(self):
+        """Test checking out a copy that is already on loan is a conflict."""
+        self.authenticate_as_staff()
+        data = {
+            'email': 'testuser@example.com',
+            'book_id': self.book.book_id,
+            'copy_id': self.copy.copy_id,
+            'start_date': str(date.today())
+        }
+        self.assertEqual(self.client.post('/api/reservations/', data, format='json').status_code, 201)
+        response = self.client.post('/api/reservations/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Reservations.objects.count(), 1)
+
+        del data['copy_id']
+        response = self.client.post('/api/reservations/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_create_reservation_unknown_book_or_copy(self):
+        """Test reservation fails for a book or copy that does not exist."""
+        self.authenticate_as_staff()
+        data = {'email': 'testuser@example.com', 'book_id': 999, 'start_date': str(date.today())}
+        response = self.client.post('/api/reservations/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        data.update(book_id=self.book.book_id, copy_id=999)
+        response = self.client.post('/api/reservations/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_filter_reservations_by_book(self):
         """Test filtering reservations by book_id (staff sees all)."""
         self.authenticate_as_staff()
@@ -478,7 +806,7 @@ class ReservationListTests(AuthTestMixin, APITestCase):
         )
         response = self.client.get(f'/api/reservations/?book_id={self.book.book_id}')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
 
 class ReservationDetailTests(AuthTestMixin, APITestCase):
@@ -573,3 +901,1629 @@ class ExtendReservationTests(AuthTestMixin, APITestCase):
         self.authenticate_as_user(self.user)
         response = self.client.put('/api/reservations/99999/extend/')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkReservationTests(AuthTestMixin, APITestCase):
+    """Tests for /api/reservations/bulk/ and /api/reservations/bulk-return/."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.books = []
+        for i in range(3):
+            book = Book.objects.create(title=f'Book {i}', author=author, genre=genre, isbn='9780306406157')
+            add_copies(book, 2)
+            self.books.append(book)
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+        self.authenticate_as_staff()
+
+    def checkout_items(self, count):
+        return [
+            {'email': 'testuser@example.com', 'book_id': self.books[i % 3].book_id, 'start_date': str(date.today())}
+            for i in range(count)
+        ]
+
+    def test_bulk_checkout_reports_each_item(self):
+        """Test bulk checkout creates what it can and reports the rest."""
+        taken = BookCopies.objects.filter(book=self.books[0]).first()
+        items = [
+            {'email': 'testuser@example.com', 'book_id': self.books[0].book_id,
+             'copy_id': taken.copy_id, 'start_date': str(date.today())},
+            {'email': 'testuser@example.com', 'book_id': self.books[0].book_id,
+             'copy_id': taken.copy_id, 'start_date': str(date.today())},
+            {'email': 'testuser@example.com', 'book_id': self.books[1].book_id, 'start_date': str(date.today())},
+            {'email': 'nobody@example.com', 'book_id': self.books[1].book_id, 'start_date': str(date.today())},
+            {'email': 'testuser@example.com', 'book_id': 999, 'start_date': str(date.today())},
+            {'email': 'testuser@example.com', 'book_id': self.books[2].book_id, 'start_date': 'tomorrow'},
+        ]
+        response = self.client.post('/api/reservations/bulk/', {'reservations': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 409, 201, 404, 404, 400])
+        self.assertEqual(results[0]['reservation']['copy'], taken.copy_id)
+        self.assertEqual(results[2]['reservation']['book_title'], 'Book 1')
+        self.assertFalse(results[2]['reservation']['returned'])
+
+        reservation_ids = sorted(Reservations.objects.values_list('reservation_id', flat=True))
+        self.assertEqual(sorted([results[0]['reservation']['reservation_id'],
+                                 results[2]['reservation']['reservation_id']]), reservation_ids)
+        for book in self.books[:2]:
+            book.refresh_from_db()
+            self.assertEqual(book.available_copies, 1)
+
+    def test_bulk_checkout_query_count_is_constant(self):
+        """Test bulk checkout does not issue queries per item."""
+        # Let the first measured request find the user in the auth cache too
+        self.client.get('/api/auth/users/me/')
+        # and the rollup rows the first loans of a book or due date create
+        BookStats.objects.bulk_create([BookStats(book=book) for book in self.books])
+        DueDateStats.objects.create(due_date=date.today() + timedelta(days=7))
+        with CaptureQueriesContext(connection) as small:
+            self.client.post('/api/reservations/bulk/', {'reservations': self.checkout_items(1)}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post('/api/reservations/bulk/', {'reservations': self.checkout_items(3)}, format='json')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Reservations.objects.count(), 4)
+
+    def test_bulk_return(self):
+        """Test bulk return makes copies available and reports each id."""
+        response = self.client.post('/api/reservations/bulk/', {'reservations': self.checkout_items(3)}, format='json')
+        ids = [result['reservation']['reservation_id'] for result in response.data['results']]
+
+        response = self.client.post('/api/reservations/bulk-return/', {'reservation_ids': ids[:2]}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [200, 200])
+        self.assertTrue(response.data['results'][0]['reservation']['returned'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/reservations/bulk-return/', {'reservation_ids': ids + [999]}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [400, 400, 200, 404])
+        # Two of them update the genre and due-date rollups, one picks out the open loans
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(BookCopies.objects.filter(is_available=False).count(), 0)
+        for book in self.books:
+            book.refresh_from_db()
+            self.assertEqual(book.available_copies, 2)
+
+    def test_bulk_return_skips_stale_loans(self):
+        """Test an old reservation of a copy lent again reads as returned and leaves the new loan out."""
+        copy = BookCopies.objects.filter(book=self.books[0]).first()
+        old = checkout(self.user, self.books[0].book_id, date.today(), copy_id=copy.copy_id)
+        mark_returned(copy)
+        new = checkout(self.user, self.books[0].book_id, date.today(), copy_id=copy.copy_id)
+
+        response = self.client.post('/api/reservations/bulk-return/', {'reservation_ids': [old.pk]}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [400])
+        self.assertIn('already returned', response.data['results'][0]['error'])
+        copy.refresh_from_db()
+        self.assertFalse(copy.is_available)
+
+        response = self.client.post('/api/reservations/bulk-return/', {'reservation_ids': [old.pk, new.pk]}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [400, 200])
+        copy.refresh_from_db()
+        self.assertTrue(copy.is_available)
+
+    def test_bulk_requires_staff_and_list(self):
+        """Test bulk endpoints validate the payload and require staff."""
+        response = self.client.post('/api/reservations/bulk/', {'reservations': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/reservations/bulk-return/', {'reservation_ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.authenticate_as_user(self.user)
+        response = self.client.post('/api/reservations/bulk/', {'reservations': self.checkout_items(1)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class WaitlistTests(AuthTestMixin, APITestCase):
+    """Tests for the waitlist endpoints and hold allocation on return."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='Popular Book', author=author, genre=genre, isbn='9780306406157')
+        add_copies(self.book, 1)
+        self.copy = BookCopies.objects.get(book=self.book)
+        self.readers = [
+            User.objects.create_user(name=f'Reader {i}', email=f'reader{i}@example.com', password='password123')
+            for i in range(3)
+        ]
+        self.loan = checkout(self.readers[0], self.book.book_id, date.today())
+
+    def join(self, reader):
+        self.authenticate_as_user(reader)
+        return self.client.post(f'/api/books/{self.book.book_id}/waitlist/')
+
+    def hold_of(self, reader):
+        return Waitlist.objects.filter(user=reader, book=self.book, book_lent=True).values_list('copy_id', flat=True).first()
+
+    def test_join_waitlist(self):
+        """Test readers join in order, once, and only when no copy is free."""
+        response = self.join(self.readers[1])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['position'], 1)
+        self.assertFalse(response.data['on_hold'])
+        self.assertEqual(self.join(self.readers[1]).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.join(self.readers[2]).data['position'], 2)
+
+        response = self.client.get('/api/waitlist/')
+        self.assertEqual([entry['user_email'] for entry in response.data['results']], ['reader2@example.com'])
+        self.assertEqual(self.client.post('/api/books/999/waitlist/').status_code, status.HTTP_404_NOT_FOUND)
+
+        add_copies(self.book, 1)
+        self.assertEqual(self.join(self.readers[0]).status_code, status.HTTP_409_CONFLICT)
+
+    def test_return_holds_copy_for_first_in_line(self):
+        """Test a returned copy is held for the head of the line, not put back on the shelf."""
+        self.join(self.readers[2])
+        self.join(self.readers[1])
+        self.authenticate_as_staff()
+        response = self.client.put(f'/api/reservations/{self.loan.reservation_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.hold_of(self.readers[2]), self.copy.copy_id)
+        self.assertIsNone(self.hold_of(self.readers[1]))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(Book.objects.with_counted_copies().get(pk=self.book.pk).counted_available, 0)
+        self.assertTrue(Reservations.objects.get(pk=self.loan.pk).returned)
+
+        with self.assertRaises(CopyUnavailable):
+            checkout(self.readers[1], self.book.book_id, date.today())
+        reservation = checkout(self.readers[2], self.book.book_id, date.today())
+        self.assertEqual(reservation.copy_id, self.copy.copy_id)
+        self.assertFalse(Waitlist.objects.filter(user=self.readers[2]).exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_holds_change_book_etags(self):
+        """Test placing a hold and its holder's checkout change the book's ETags and copy list."""
+        self.join(self.readers[1])
+        detail_etag = self.client.get(f'/api/books/{self.book.book_id}/')['ETag']
+        list_etag = self.client.get('/api/books/')['ETag']
+        mark_returned(self.copy)
+
+        response = self.client.get(f'/api/books/{self.book.book_id}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['copies'], [{'copy_id': self.copy.copy_id, 'is_available': True}])
+        self.assertFalse(response.data['is_available'])
+        self.assertEqual(self.client.get('/api/books/', HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+
+        detail_etag = response['ETag']
+        checkout(self.readers[1], self.book.book_id, date.today())
+        response = self.client.get(f'/api/books/{self.book.book_id}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['copies'], [{'copy_id': self.copy.copy_id, 'is_available': False}])
+
+    def test_leaving_passes_hold_on(self):
+        """Test leaving the waitlist passes a held copy to the next reader, or back to the shelf."""
+        self.join(self.readers[1])
+        self.join(self.readers[2])
+        mark_returned(self.copy)
+
+        self.authenticate_as_user(self.readers[1])
+        response = self.client.delete(f'/api/books/{self.book.book_id}/waitlist/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.hold_of(self.readers[2]), self.copy.copy_id)
+        response = self.client.delete(f'/api/books/{self.book.book_id}/waitlist/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.authenticate_as_user(self.readers[2])
+        self.client.delete(f'/api/books/{self.book.book_id}/waitlist/')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_bulk_checkout_gives_held_copy_to_holder(self):
+        """Test bulk checkout lends a held copy only to the reader it is held for."""
+        self.join(self.readers[1])
+        bulk_return([self.loan])
+        self.assertEqual(self.hold_of(self.readers[1]), self.copy.copy_id)
+
+        results = bulk_checkout([
+            (self.readers[2], self.book.book_id, None, date.today()),
+            (self.readers[1], self.book.book_id, None, date.today()),
+        ])
+        self.assertIsInstance(results[0], CopyUnavailable)
+        self.assertEqual(results[1].copy_id, self.copy.copy_id)
+        self.assertFalse(Waitlist.objects.exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_expire_holds(self):
+        """Test expired holds pass down the line and lapsed entries are dropped."""
+        self.join(self.readers[1])
+        self.join(self.readers[2])
+        mark_returned(self.copy)
+        later = date.today() + HOLD_PERIOD + timedelta(days=1)
+
+        out = StringIO()
+        call_command('expire_holds', '--date', str(later), stdout=out)
+        self.assertIn('Expired 1 holds', out.getvalue())
+        self.assertFalse(Waitlist.objects.filter(user=self.readers[1]).exists())
+        self.assertEqual(self.hold_of(self.readers[2]), self.copy.copy_id)
+
+        self.assertEqual(expire_holds(later + HOLD_PERIOD + timedelta(days=1)), (1, 0))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+        Waitlist.objects.create(user=self.readers[1], book=self.book, date_placed=date.today(), limit_date=date.today())
+        self.assertEqual(expire_holds(date.today() + timedelta(days=1)), (0, 1))
+
+
+class SweepDueLoansTests(APITestCase):
+    """Tests for the sweep_due_loans command and its notice outbox."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        book = Book.objects.create(title='Due Book', author=author, genre=genre, isbn='9780306406157')
+        add_copies(book, 5)
+        self.alice = User.objects.create_user(name='Alice', email='alice@example.com', password='password123')
+        self.bob = User.objects.create_user(name='Bob', email='bob@example.com', password='password123')
+        self.today = date(2024, 6, 15)
+        # Due dates: overdue, due tomorrow, overdue, not due yet, overdue but returned
+        self.overdue = checkout(self.alice, book.book_id, self.today - timedelta(days=10))
+        self.due_soon = checkout(self.alice, book.book_id, self.today - timedelta(days=6))
+        self.bob_overdue = checkout(self.bob, book.book_id, self.today - timedelta(days=8))
+        checkout(self.bob, book.book_id, self.today)
+        mark_returned(checkout(self.bob, book.book_id, self.today - timedelta(days=9)).copy)
+
+        outbox_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(outbox_dir.cleanup)
+        self.outbox_path = os.path.join(outbox_dir.name, 'notices.ndjson')
+        settings_override = override_settings(
+            LOAN_NOTICE_OUTBOX='myapp.notices.FileOutbox', LOAN_NOTICE_OUTBOX_PATH=self.outbox_path,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def sweep(self, *args):
+        out = StringIO()
+        call_command('sweep_due_loans', '--date', str(self.today), '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def outbox(self):
+        with open(self.outbox_path) as outbox:
+            return [json.loads(line) for line in outbox]
+
+    def test_sweep_sends_one_batch_per_user(self):
+        """Test due and overdue loans still out are sent as one batch per user."""
+        output = self.sweep()
+        self.assertIn('recorded 3 notices, sent 3 to 2 users', output)
+        batches = {batch['to']: batch for batch in self.outbox()}
+        self.assertEqual(set(batches), {'alice@example.com', 'bob@example.com'})
+        alice = batches['alice@example.com']
+        self.assertEqual(alice['subject'], 'Your library loans are overdue')
+        self.assertEqual(
+            sorted((notice['reservation_id'], notice['kind']) for notice in alice['notices']),
+            [(self.overdue.reservation_id, 'overdue'), (self.due_soon.reservation_id, 'due_soon')],
+        )
+        self.assertIn('Due Book was due on', alice['body'])
+        self.assertEqual([notice['reservation_id'] for notice in batches['bob@example.com']['notices']],
+                         [self.bob_overdue.reservation_id])
+
+    def test_sweep_is_idempotent(self):
+        """Test rerunning the sweep sends nothing new until a loan's due date or kind changes."""
+        self.sweep()
+        self.assertIn('recorded 0 notices, sent 0 to 0 users', self.sweep())
+        self.assertEqual(len(self.outbox()), 2)
+
+        self.today += timedelta(days=2)
+        self.assertIn('recorded 1 notices, sent 1 to 1 users', self.sweep())
+        self.assertEqual(self.outbox()[-1]['notices'][0]['kind'], 'overdue')
+
+        Reservations.objects.filter(pk=self.bob_overdue.pk).update(due_date=self.today + timedelta(days=1))
+        self.assertIn('recorded 1 notices', self.sweep())
+        self.assertEqual(LoanNotice.objects.filter(sent_at__isnull=True).count(), 0)
+
+    def test_sweep_skips_earlier_loans_of_relent_copy(self):
+        """Test a returned loan is not notified once its copy is lent again."""
+        returned = Reservations.objects.get(user=self.bob, copy__is_available=True)
+        checkout(self.alice, returned.book_id, self.today, copy_id=returned.copy_id)
+        self.sweep()
+        self.assertFalse(LoanNotice.objects.filter(reservation=returned).exists())
+        self.assertEqual(LoanNotice.objects.count(), 3)
+
+    def test_failed_send_is_retried(self):
+        """Test notices whose batch failed to send are sent by the next run."""
+        with mock.patch('myapp.notices.FileOutbox.send', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.sweep()
+        self.assertIn('recorded 0 notices, sent 3 to 2 users', self.sweep())
+
+    def test_dry_run(self):
+        """Test a dry run counts notices without recording them."""
+        self.assertIn('2 overdue and 1 due-soon notices would be recorded', self.sweep('--dry-run'))
+        self.assertFalse(LoanNotice.objects.exists())
+        self.assertFalse(os.path.exists(self.outbox_path))
+
+
+class StatsDashboardTests(AuthTestMixin, APITestCase):
+    """Tests for /api/stats/dashboard/ and the rollups behind it."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        self.fiction = Genre.objects.create(name='Fiction')
+        self.poetry = Genre.objects.create(name='Poetry')
+        self.novel = Book.objects.create(title='Novel', author=author, genre=self.fiction, isbn='9780306406157')
+        self.verse = Book.objects.create(title='Verse', author=author, genre=self.poetry, isbn='9780306406157')
+        add_copies(self.novel, 3)
+        add_copies(self.verse, 2)
+        self.readers = [
+            User.objects.create_user(name=f'Reader {i}', email=f'reader{i}@example.com', password='password123')
+            for i in range(3)
+        ]
+        self.today = timezone.localdate()
+        self.authenticate_as_staff()
+
+    def dashboard(self):
+        response = self.client.get('/api/stats/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def genre_counts(self, data):
+        return {
+            genre['name']: (genre['total_copies'], genre['available_copies'], genre['on_loan'])
+            for genre in data['genres']
+        }
+
+    def assert_rebuild_matches(self):
+        before = self.dashboard()
+        out = StringIO()
+        call_command('rebuild_stats', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        self.assertEqual(self.dashboard(), before)
+
+    def test_checkout_return_hold_and_extend_update_dashboard(self):
+        """Test circulation keeps the rollups in step and a rebuild agrees with them."""
+        due_today = checkout(self.readers[0], self.novel.book_id, self.today - timedelta(days=7))
+        overdue = checkout(self.readers[1], self.novel.book_id, self.today - timedelta(days=10))
+        bulk_checkout([(self.readers[0], self.verse.book_id, None, self.today),
+                       (self.readers[1], self.verse.book_id, None, self.today)])
+
+        data = self.dashboard()
+        self.assertEqual(data['copies'], {'total': 5, 'available': 1, 'on_loan': 4, 'on_hold': 0})
+        self.assertEqual(data['loans'], {'on_loan': 4, 'overdue': 1, 'due_today': 1})
+        self.assertEqual(self.genre_counts(data), {'Fiction': (3, 1, 2), 'Poetry': (2, 0, 2)})
+        self.assertEqual([(title['title'], title['loans']) for title in data['top_titles']], [('Novel', 2), ('Verse', 2)])
+
+        join_waitlist(self.readers[2], self.verse.book_id)
+        verse_loan = Reservations.objects.select_related('book', 'copy').filter(book=self.verse).first()
+        bulk_return([verse_loan])
+        mark_returned(overdue.copy)
+        extend(due_today, timedelta(days=7))
+
+        data = self.dashboard()
+        self.assertEqual(data['copies'], {'total': 5, 'available': 2, 'on_loan': 2, 'on_hold': 1})
+        self.assertEqual(data['loans'], {'on_loan': 2, 'overdue': 0, 'due_today': 0})
+        self.assertEqual(self.genre_counts(data), {'Fiction': (3, 2, 1), 'Poetry': (2, 0, 1)})
+
+        # The reader collects their hold
+        checkout(self.readers[2], self.verse.book_id, self.today)
+        data = self.dashboard()
+        self.assertEqual(data['copies']['on_hold'], 0)
+        self.assertEqual(data['top_titles'][0], {'book_id': self.verse.book_id, 'loans': 3, 'title': 'Verse'})
+        self.assert_rebuild_matches()
+
+    def test_catalog_changes_update_dashboard(self):
+        """Test moving a book to another genre or deleting it moves or drops its copies."""
+        checkout(self.readers[0], self.verse.book_id, self.today - timedelta(days=10))
+        self.verse.genre = self.fiction
+        self.verse.save()
+        data = self.dashboard()
+        self.assertEqual(self.genre_counts(data), {'Fiction': (5, 4, 1), 'Poetry': (0, 0, 0)})
+
+        BookCopies.objects.create(book=self.novel)
+        self.verse.delete()
+        data = self.dashboard()
+        self.assertEqual(data['copies'], {'total': 4, 'available': 4, 'on_loan': 0, 'on_hold': 0})
+        self.assertEqual(data['loans'], {'on_loan': 0, 'overdue': 0, 'due_today': 0})
+        self.assertEqual(data['top_titles'], [])
+
+        # A rebuild has no rows for empty genres
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertEqual(self.genre_counts(self.dashboard()), {'Fiction': (4, 4, 0)})
+
+    def test_dashboard_reads_only_rollups(self):
+        """Test the dashboard takes the same queries however many loans there are."""
+        checkout(self.readers[0], self.novel.book_id, self.today)
+        # Let the measured requests find the user in the auth cache
+        self.dashboard()
+        with CaptureQueriesContext(connection) as few:
+            self.dashboard()
+        bulk_checkout([(self.readers[1], self.novel.book_id, None, self.today - timedelta(days=days))
+                       for days in (1, 9)])
+        with CaptureQueriesContext(connection) as more:
+            self.dashboard()
+        self.assertEqual(len(few), len(more))
+        self.assertFalse(any('reservations' in query['sql'] for query in more.captured_queries))
+
+    def test_dashboard_requires_staff_and_valid_top(self):
+        """Test customers are refused and `top` is validated."""
+        self.assertEqual(self.client.get('/api/stats/dashboard/?top=0').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/stats/dashboard/?top=x').status_code, status.HTTP_400_BAD_REQUEST)
+        checkout(self.readers[0], self.novel.book_id, self.today)
+        checkout(self.readers[0], self.verse.book_id, self.today)
+        self.assertEqual(len(self.client.get('/api/stats/dashboard/?top=1').data['top_titles']), 1)
+
+        self.authenticate_as_user(self.readers[0])
+        self.assertEqual(self.client.get('/api/stats/dashboard/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'},
+})
+class CatalogCacheTests(AuthTestMixin, APITestCase):
+    """Tests for the catalog read-through cache."""
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        metrics.reset()
+        self.author = Author.objects.create(name='Frank Herbert')
+        self.genre = Genre.objects.create(name='Science Fiction')
+        self.book = Book.objects.create(title='Dune', author=self.author, genre=self.genre, isbn='9780306406157')
+        add_copies(self.book, 1)
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+
+    def test_detail_is_served_from_cache(self):
+        """Test a second detail read only checks the book's timestamp."""
+        first = self.client.get(f'/api/books/{self.book.book_id}/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(f'/api/books/{self.book.book_id}/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.client.get('/api/books/999/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_page_reloads_only_changed_books(self):
+        """Test an availability change invalidates just that book's payload."""
+        other = Book.objects.create(title='Emma', author=self.author, genre=self.genre, isbn='9780306406157')
+        add_copies(other, 1)
+        self.client.get('/api/books/')
+
+        checkout(self.user, self.book.book_id, date.today())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/')
+        self.assertEqual([book['is_available'] for book in response.data['results']], [False, True])
+        # Page timestamps, then the changed book and its copies; the page itself is cached
+        self.assertEqual(len(queries), 3)
+
+        copy = BookCopies.objects.get(book=self.book)
+        mark_returned(copy)
+        self.assertTrue(self.client.get(f'/api/books/{self.book.book_id}/').data['is_available'])
+
+    def test_writes_retire_cached_listings(self):
+        """Test creating, editing and deleting books refreshes list and search pages."""
+        self.assertEqual(len(self.client.get('/api/books/').data['results']), 1)
+        self.assertEqual(len(self.client.get('/api/books/?q=dune').data['results']), 1)
+
+        self.authenticate_as_staff()
+        self.client.post('/api/books/', {
+            'title': 'Dune Messiah', 'author_name': 'Frank Herbert',
+            'genre_name': 'Science Fiction', 'isbn': '9780306406157',
+        }, format='json')
+        self.assertEqual(len(self.client.get('/api/books/').data['results']), 2)
+        self.assertEqual(len(self.client.get('/api/books/?q=dune').data['results']), 2)
+
+        self.client.put(f'/api/books/{self.book.book_id}/', {'title': 'Children of Dune'}, format='json')
+        self.assertEqual(self.client.get(f'/api/books/{self.book.book_id}/').data['title'], 'Children of Dune')
+        self.assertEqual(len(self.client.get('/api/books/?q=children').data['results']), 1)
+
+        self.author.name = 'F. Herbert'
+        self.author.save()
+        self.assertEqual(self.client.get(f'/api/books/{self.book.book_id}/').data['author_name'], 'F. Herbert')
+
+        self.client.delete(f'/api/books/{self.book.book_id}/')
+        self.assertEqual(len(self.client.get('/api/books/').data['results']), 1)
+        self.assertEqual(self.client.get(f'/api/books/{self.book.book_id}/').status_code, 404)
+
+    def test_metrics_report_hits_and_misses(self):
+        """Test cache hits and misses are counted and exposed to staff."""
+        self.client.get('/api/books/')
+        self.client.get('/api/books/')
+        self.authenticate_as_staff()
+        counters = self.client.get('/api/metrics/').data['counters']
+        self.assertEqual(counters['catalog.list.miss'], 1)
+        self.assertEqual(counters['catalog.list.hit'], 1)
+        self.assertEqual(counters['catalog.book.hit'], 1)
+
+        self.authenticate_as_user(self.user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ConditionalGetTests(AuthTestMixin, APITestCase):
+    """Tests for ETag / Last-Modified on catalog and reservation lists."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='Test Book', author=author, genre=genre, isbn='9780306406157')
+        add_copies(self.book, 2)
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+
+    def test_book_list_not_modified(self):
+        """Test a matching If-None-Match gets a 304 without loading the books."""
+        response = self.client.get('/api/books/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+
+        # Another page of the same rows is a different representation
+        self.assertEqual(self.client.get('/api/books/?paginate=false', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_full_list_etag_is_one_aggregate(self):
+        """Test the unpaginated list is validated by one aggregate query that sees deletions."""
+        other = Book.objects.create(title='Other Book', author=self.book.author, genre=self.book.genre,
+                                    isbn='9780131103627')
+        etag = self.client.get('/api/books/?paginate=false')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/?paginate=false', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('COUNT(', queries[0]['sql'])
+
+        # Deleting an older book leaves the newest timestamp and highest id alone
+        Book.objects.filter(pk=self.book.pk).update(updated_at=other.updated_at - timedelta(days=1))
+        etag = self.client.get('/api/books/?paginate=false')['ETag']
+        self.book.delete()
+        response = self.client.get('/api/books/?paginate=false', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['book_id'] for book in response.json()], [other.pk])
+
+    def test_checkout_changes_etags(self):
+        """Test a checkout changes the list and detail ETags."""
+        list_etag = self.client.get('/api/books/')['ETag']
+        detail_etag = self.client.get(f'/api/books/{self.book.book_id}/')['ETag']
+        checkout(self.user, self.book.book_id, date.today())
+
+        response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/api/books/{self.book.book_id}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], detail_etag)
+
+    def test_book_detail_if_modified_since(self):
+        """Test If-Modified-Since is honoured on book details."""
+        response = self.client.get(f'/api/books/{self.book.book_id}/')
+        last_modified = response['Last-Modified']
+        response = self.client.get(f'/api/books/{self.book.book_id}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get('/api/books/999/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reservation_list_etag(self):
+        """Test reservation ETags are per user and change when a copy is returned."""
+        reservation = checkout(self.user, self.book.book_id, date.today())
+        self.authenticate_as_staff()
+        staff_etag = self.client.get('/api/reservations/')['ETag']
+
+        self.authenticate_as_user(self.user)
+        response = self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=staff_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('private', response['Cache-Control'])
+        user_etag = response['ETag']
+        response = self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=user_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        mark_returned(reservation.copy)
+        response = self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=user_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['results'][0]['returned'])
+
+
+class AsyncViewTests(AuthTestMixin, APITestCase):
+    """Tests for the async read endpoints under /api/async/."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.books = [
+            Book.objects.create(title=f'Book {n}', author=author, genre=genre, isbn='9780306406157')
+            for n in range(3)
+        ]
+        add_copies(self.books[0], 2)
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+        checkout(self.user, self.books[0].book_id, date.today())
+
+    def assertSameAsSync(self, path):
+        sync = self.client.get(f'/api/{path}')
+        response = self.client.get(f'/api/async/{path}')
+        self.assertEqual(response.status_code, sync.status_code)
+        # Same payload, with page links pointing back at the async endpoint
+        self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), sync.content)
+        return response
+
+    def test_book_endpoints_match_sync_views(self):
+        """Test async book list, search, pages and detail return the sync payloads."""
+        self.assertSameAsSync('books/')
+        self.assertSameAsSync('books/?q=book')
+        self.assertSameAsSync('books/?paginate=false')
+        page = self.assertSameAsSync('books/?page_size=2').json()
+        self.assertSameAsSync(page['next'].split('/api/async/')[1])
+        self.assertSameAsSync(f'books/{self.books[0].book_id}/')
+
+        self.assertEqual(self.client.get('/api/async/books/999/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/async/books/?cursor=bad').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_book_list_conditional_get(self):
+        """Test the async book list answers If-None-Match with 304."""
+        etag = self.client.get('/api/async/books/')['ETag']
+        response = self.client.get('/api/async/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_reservations_and_me_require_authentication(self):
+        """Test async reservation list and me return 401 without a valid token."""
+        for path in ('/api/async/reservations/', '/api/async/auth/users/me/'):
+            self.assertEqual(self.client.get(path).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get('/api/async/books/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reservations_and_me_match_sync_views(self):
+        """Test async reservation list and me return the sync payloads for the signed-in user."""
+        self.authenticate_as_user(self.user)
+        response = self.assertSameAsSync('reservations/')
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertSameAsSync('reservations/?returned=true')
+        self.assertEqual(
+            self.client.get('/api/async/auth/users/me/').json(),
+            self.client.get('/api/auth/users/me/').json(),
+        )
+
+        self.authenticate_as_staff()
+        self.assertSameAsSync('reservations/?paginate=false')
+
+    async def test_concurrent_requests(self):
+        """Test async views serve concurrent requests on one event loop."""
+        paths = [f'/api/async/books/{book.book_id}/' for book in self.books] + ['/api/async/books/']
+        responses = await asyncio.gather(*(self.async_client.get(path) for path in paths))
+        self.assertEqual([response.status_code for response in responses], [200] * len(paths))
+        self.assertEqual(responses[1].json()['title'], 'Book 1')
+
+
+class StreamingExportTests(AuthTestMixin, APITestCase):
+    """Tests for ?stream=json|ndjson on the book and reservation lists."""
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.books = [
+            Book.objects.create(title=f'Book {n}', author=author, genre=genre, isbn='9780306406157')
+            for n in range(5)
+        ]
+        for book in self.books:
+            add_copies(book, 1)
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+        for book in self.books:
+            checkout(self.user, book.book_id, date.today())
+
+    def stream(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        if response.is_async:
+            async def consume():
+                return b''.join([chunk async for chunk in response.streaming_content])
+            return response, async_to_sync(consume)()
+        return response, b''.join(response.streaming_content)
+
+    @mock.patch('myapp.streaming.STREAM_CHUNK_SIZE', 2)
+    def test_stream_json_matches_full_list(self):
+        """Test stream=json returns the same array as paginate=false, across chunks."""
+        self.authenticate_as_staff()
+        for path in ('/api/reservations/', '/api/books/', '/api/async/reservations/', '/api/async/books/'):
+            response, body = self.stream(f'{path}?stream=json')
+            self.assertEqual(response['Content-Type'], 'application/json')
+            full = self.client.get(f'{path}?paginate=false').json()
+            self.assertEqual(json.loads(body), full)
+
+    @mock.patch('myapp.streaming.STREAM_CHUNK_SIZE', 2)
+    def test_stream_ndjson_keeps_filters_and_search_order(self):
+        """Test stream=ndjson emits one object per line, filtered and in rank order."""
+        self.authenticate_as_staff()
+        _, body = self.stream(f'/api/reservations/?stream=ndjson&book_id={self.books[0].book_id}')
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['book'], self.books[0].book_id)
+
+        response, body = self.stream('/api/books/?stream=ndjson&q=book')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        expected = [book['book_id'] for book in self.client.get('/api/books/?paginate=false&q=book').json()]
+        self.assertEqual([json.loads(line)['book_id'] for line in body.decode().splitlines()], expected)
+
+        _, body = self.stream('/api/books/?stream=json&q=nomatch')
+        self.assertEqual(json.loads(body), [])
+
+    @mock.patch('myapp.streaming.STREAM_CHUNK_SIZE', 2)
+    def test_stream_loads_one_chunk_per_query(self):
+        """Test streaming queries the database per chunk, not once for everything."""
+        self.authenticate_as_staff()
+        response = self.client.get('/api/reservations/?stream=ndjson')
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(response.streaming_content)
+        # 5 rows in chunks of 2: three queries; the json wrapper adds no query
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(len(chunks), 3)
+
+    def test_stream_scoped_to_user_and_validated(self):
+        """Test customers only stream their own reservations and bad formats are rejected."""
+        other = User.objects.create_user(name='Other', email='other@example.com', password='password123')
+        self.authenticate_as_user(other)
+        _, body = self.stream('/api/reservations/?stream=json')
+        self.assertEqual(json.loads(body), [])
+
+        response = self.client.get('/api/reservations/?stream=csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Tests for the per-process database connection pool."""
+
+    def make_pool(self, **options):
+        return ConnectionPool(
+            connect=FakeConnection,
+            close=lambda connection: connection.close(),
+            check=lambda connection: connection.healthy,
+            **options
+        )
+
+    def test_connections_are_reused(self):
+        """Test a released connection is handed out again."""
+        pool = self.make_pool(max_size=2)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['in_use'], stats['idle']), (1, 1, 0))
+
+    def test_pool_is_bounded(self):
+        """Test acquire waits for a free connection and times out."""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        connection = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        threading.Timer(0.05, pool.release, args=(connection,)).start()
+        pool.timeout = 5
+        self.assertIs(pool.acquire(), connection)
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['waits'], stats['size']), (1, 1, 1))
+        self.assertGreater(stats['wait_seconds_max'], 0)
+
+    def test_idle_and_broken_connections_are_replaced(self):
+        """Test idle connections are evicted and failed health checks reconnect."""
+        pool = self.make_pool(max_idle=0, check_after=0)
+        idle = pool.acquire()
+        pool.release(idle)
+        time.sleep(0.01)
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, idle)
+        self.assertTrue(idle.closed)
+
+        pool = self.make_pool(check_after=0)
+        broken = pool.acquire()
+        broken.healthy = False
+        pool.release(broken)
+        self.assertIsNot(pool.acquire(), broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_discard_and_warm(self):
+        """Test discarded connections free their slot and warm() opens min_size."""
+        pool = self.make_pool(max_size=3, min_size=2)
+        pool.warm()
+        self.assertEqual(pool.stats()['idle'], 2)
+
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+        pool.close_all()
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class ReplicaRoutingTests(AuthTestMixin, APITransactionTestCase):
+    """Tests for read-replica routing, with a second SQLite database as the replica."""
+
+    # Not TestCase: its wrapping transaction would keep every read on the primary
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        routers._lag_checked.clear()
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='Test Book', author=author, genre=genre, isbn='9780306406157')
+
+    def book_count(self, **extra):
+        return len(self.client.get('/api/books/', **extra).data['results'])
+
+    @override_settings(DATABASE_REPLICAS={'replica': 1})
+    def test_safe_reads_use_replica_until_client_writes(self):
+        """Test GETs read the replica, and a client's reads follow its writes to the primary."""
+        self.authenticate_as_staff()
+        # Nothing is replicated into the stand-in replica
+        self.assertEqual(self.book_count(), 0)
+
+        self.client.put(f'/api/books/{self.book.book_id}/', {'title': 'Renamed'}, format='json')
+        self.assertEqual(self.book_count(), 1)
+        # Other clients still read the replica
+        self.client.credentials()
+        self.assertEqual(self.book_count(REMOTE_ADDR='10.0.0.2'), 0)
+
+    @override_settings(DATABASE_REPLICAS={'replica': 1})
+    def test_pin_follows_user_across_tokens(self):
+        """Test a user's reads stay on the primary after a write when their token is refreshed."""
+        staff = self.authenticate_as_staff()
+        self.client.put(f'/api/books/{self.book.book_id}/', {'title': 'Renamed'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(staff)}')
+        self.assertEqual(self.book_count(REMOTE_ADDR='10.0.0.2'), 1)
+
+    @override_settings(DATABASE_REPLICAS={'replica': 1})
+    def test_primary_used_in_transactions_and_for_lagging_replicas(self):
+        """Test atomic blocks and replicas past the lag tolerance use the primary."""
+        router = routers.ReplicaRouter()
+        token = routers.replica_reads_allowed.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Book), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Book), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Book), 'default')
+            with mock.patch.object(routers, 'replica_lag', return_value=60.0):
+                routers._lag_checked.clear()
+                self.assertEqual(router.db_for_read(Book), 'default')
+        finally:
+            routers.replica_reads_allowed.reset(token)
+        # Outside a request (commands, shells) reads use the primary
+        self.assertEqual(router.db_for_read(Book), 'default')
+
+    @override_settings(DATABASE_REPLICAS={'replica': 1})
+    def test_failed_lag_check_is_logged_and_counted(self):
+        """Test a replica whose lag can't be read is skipped, with a warning and a counter."""
+        metrics.reset()
+        router = routers.ReplicaRouter()
+        token = routers.replica_reads_allowed.set(True)
+        try:
+            with mock.patch.object(routers, 'replica_lag', side_effect=Exception('access denied')):
+                with self.assertLogs('myapp.db.routers', 'WARNING'):
+                    self.assertEqual(router.db_for_read(Book), 'default')
+        finally:
+            routers.replica_reads_allowed.reset(token)
+        self.assertEqual(metrics.snapshot()['counters']['db.replica.replica.lag_check_failed'], 1)
+
+    def test_replica_lag_on_older_mysql(self):
+        """Test servers before MySQL 8.0.22 are asked for SHOW SLAVE STATUS."""
+        replica = mock.MagicMock(vendor='mysql', mysql_is_mariadb=False, mysql_version=(8, 0, 21))
+        cursor = replica.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ('Yes', 7)
+        cursor.description = [('Slave_IO_Running',), ('Seconds_Behind_Master',)]
+        with mock.patch.object(routers, 'connections', {'replica': replica}):
+            self.assertEqual(routers.replica_lag('replica'), 7.0)
+        cursor.execute.assert_called_once_with('SHOW SLAVE STATUS')
+
+        replica.mysql_version = (8, 0, 22)
+        cursor.description = [('Replica_IO_Running',), ('Seconds_Behind_Source',)]
+        with mock.patch.object(routers, 'connections', {'replica': replica}):
+            self.assertEqual(routers.replica_lag('replica'), 7.0)
+        cursor.execute.assert_called_with('SHOW REPLICA STATUS')
+
+    @override_settings(DATABASE_REPLICAS={'replica': 3, 'default': 1})
+    def test_weighted_replica_choice(self):
+        """Test replicas are chosen in proportion to their weights."""
+        router = routers.ReplicaRouter()
+        token = routers.replica_reads_allowed.set(True)
+        try:
+            choices = [router.db_for_read(Book) for _ in range(2000)]
+        finally:
+            routers.replica_reads_allowed.reset(token)
+        self.assertAlmostEqual(choices.count('replica') / len(choices), 0.75, delta=0.05)
+
+    @override_settings(DATABASE_REPLICAS={'replica': 1, 'default': 1})
+    def test_replica_picked_once_per_request(self):
+        """Test a request's reads all go to the replica picked for its first read."""
+        router = routers.ReplicaRouter()
+        token = routers.replica_reads_allowed.set(True)
+        try:
+            for alias in ('replica', 'default'):
+                replica_token = routers.request_replica.set({})
+                try:
+                    with mock.patch.object(routers.random, 'choices', return_value=[alias]) as choices:
+                        self.assertEqual({router.db_for_read(Book) for _ in range(5)}, {alias})
+                finally:
+                    routers.request_replica.reset(replica_token)
+                choices.assert_called_once()
+        finally:
+            routers.replica_reads_allowed.reset(token)
+
+
+class BookCopyCounterTests(AuthTestMixin, APITestCase):
+    """Tests for the maintained Book.total_copies / available_copies counters."""
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Test Author')
+        self.genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(
+            title='Test Book',
+            author=self.author,
+            genre=self.genre,
+            isbn='9780306406157'
+        )
+        self.copy = BookCopies.objects.create(book=self.book, is_available=True)
+        BookCopies.objects.create(book=self.book, is_available=False)
+        self.user = User.objects.create_user(
+            name='Test User',
+            email='testuser@example.com',
+            password='password123'
+        )
+        self.authenticate_as_staff()
+
+    def assertCounters(self, total, available):
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (total, available))
+        self.assertEqual(self.book.quantity, total)
+
+    def test_create_book_sets_counters(self):
+        """Test creating a book with copies sets its counters."""
+        response = self.client.post('/api/books/', {
+            'author_name': 'New Author',
+            'genre_name': 'Science Fiction',
+            'title': 'New Book',
+            'isbn': '978-0-13-468599-1',
+            'copy_number': 3
+        }, format='json')
+        book = Book.objects.get(pk=response.data['book_id'])
+        self.assertEqual((book.total_copies, book.available_copies, book.quantity), (3, 3, 3))
+        self.assertTrue(response.data['is_available'])
+
+    def test_checkout_and_return_update_counters(self):
+        """Test checkout decrements and return increments available_copies."""
+        self.assertCounters(2, 1)
+        response = self.client.post('/api/reservations/', {
+            'email': 'testuser@example.com',
+            'book_id': self.book.book_id,
+            'copy_id': self.copy.copy_id,
+            'start_date': str(date.today())
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounters(2, 0)
+        self.assertFalse(self.client.get(f'/api/books/{self.book.book_id}/').data['is_available'])
+
+        self.client.put(f"/api/reservations/{response.data['reservation_id']}/")
+        self.assertCounters(2, 1)
+
+    def test_added_copies_keep_quantity_in_step(self):
+        """Test adding copies raises quantity by the copies added, not from the new total."""
+        with CaptureQueriesContext(connection) as queries:
+            add_copies(self.book, 3)
+        self.assertCounters(5, 4)
+        # MySQL evaluates SET clauses left to right, so quantity must read total_copies before it is raised
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE "book"'))
+        self.assertLess(update.index('"quantity" ='), update.index('"total_copies" ='))
+
+        BookCopies.objects.create(book=self.book, is_available=True)
+        self.assertCounters(6, 5)
+
+    def test_reconcile_copy_counts(self):
+        """Test the reconcile command repairs drifted counters."""
+        Book.objects.filter(pk=self.book.pk).update(total_copies=7, available_copies=5, quantity=1)
+        call_command('reconcile_copy_counts', '--dry-run', stdout=StringIO())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.total_copies, 7)
+
+        call_command('reconcile_copy_counts', stdout=StringIO())
+        self.assertCounters(2, 1)
+
+
+class CatalogImportTests(APITestCase):
+    """Tests for the import_catalog command."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        Author.objects.create(name='Frank Herbert')
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def csv_file(self, count, name='catalog.csv'):
+        rows = ['title,author_name,genre,isbn,copies']
+        for n in range(count):
+            isbn = f'978000000{n:03d}'
+            rows.append(f'Book {n},Author {n % 3},Genre {n % 2},{isbn}{ean.calc_check_digit(isbn)},2')
+        return self.write(name, '\n'.join(rows) + '\n')
+
+    def test_csv_import(self):
+        """Test books, copies, counters, authors and the search index are built, and bad rows reported."""
+        path = self.write('catalog.csv', (
+            'title,author,genre,isbn,copies\n'
+            'Dune,Frank Herbert,Science Fiction,978-0-306-40615-7,3\n'
+            'Children of Dune,Frank Herbert,Science Fiction,0306406152,\n'
+            'Bad ISBN,Someone,Drama,9780306406158,1\n'
+            'No Author,,Drama,9780131103627,1\n'
+        ))
+        err = StringIO()
+        call_command('import_catalog', path, stdout=StringIO(), stderr=err)
+
+        self.assertEqual(Book.objects.count(), 1)  # both valid rows share one ISBN
+        dune = Book.objects.get(isbn='9780306406157')
+        self.assertEqual((dune.total_copies, dune.available_copies, dune.quantity), (3, 3, 3))
+        self.assertEqual(BookCopies.objects.filter(book=dune, is_available=True).count(), 3)
+        self.assertEqual(Author.objects.filter(name='Frank Herbert').count(), 1)
+        self.assertIn('Record 3: Invalid ISBN', err.getvalue())
+        self.assertIn('Record 4: author is required.', err.getvalue())
+        self.assertEqual(len(self.client.get('/api/books/?q=dune').data['results']), 1)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+        # Re-importing skips catalogued ISBNs
+        call_command('import_catalog', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_ndjson_and_marc_import(self):
+        """Test NDJSON and MARC-lite records are read."""
+        ndjson = self.write('catalog.ndjson', (
+            '{"title": "Dune", "author": "Frank Herbert", "genre": "Science Fiction", "isbn": "9780306406157"}\n'
+            'not json\n'
+        ))
+        marc = self.write('catalog.mrk', (
+            '=LDR  00000nam a2200000 a 4500\n'
+            '=020  \\\\$a9780131103627 (pbk.)\n'
+            '=100  1\\$aKernighan, Brian W.,\n'
+            '=245  14$aThe C programming language /$cBrian W. Kernighan.\n'
+            '=650  \\0$aC (Computer program language).\n'
+            '=952  \\\\$pBC1\n'
+            '=952  \\\\$pBC2\n'
+        ))
+        err = StringIO()
+        call_command('import_catalog', ndjson, stdout=StringIO(), stderr=err)
+        call_command('import_catalog', marc, stdout=StringIO(), stderr=err)
+
+        self.assertIn('Record 2: Invalid JSON.', err.getvalue())
+        book = Book.objects.select_related('author', 'genre').get(isbn='9780131103627')
+        self.assertEqual(book.title, 'The C programming language')
+        self.assertEqual(book.author.name, 'Kernighan, Brian W')
+        self.assertEqual(book.genre.name, 'C (Computer program language)')
+        self.assertEqual(book.total_copies, 2)
+
+    def test_queries_per_chunk_are_constant(self):
+        """Test a chunk costs the same number of queries however many records it holds."""
+        counts = []
+        for count in (10, 40):
+            path = self.csv_file(count, name=f'catalog{count}.csv')
+            BookCopies.objects.all().delete()
+            Book.objects.all().delete()
+            Author.objects.exclude(name='Frank Herbert').delete()
+            Genre.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                call_command('import_catalog', path, stdout=StringIO())
+            counts.append(len(queries))
+            self.assertEqual(BookCopies.objects.count(), count * 2)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_resume_after_crash(self):
+        """Test an interrupted import resumes from its checkpoint."""
+        path = self.csv_file(10)
+        original = catalog_import.CatalogImporter.import_chunk
+        calls = []
+
+        def crash_on_third_chunk(importer, entries):
+            calls.append(len(entries))
+            if len(calls) == 3:
+                raise OperationalError('connection lost')
+            return original(importer, entries)
+
+        with mock.patch.object(catalog_import.CatalogImporter, 'import_chunk', crash_on_third_chunk):
+            with self.assertRaises(OperationalError):
+                call_command('import_catalog', path, '--chunk-size', '3', stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 6)
+
+        with self.assertRaises(CommandError):
+            call_command('import_catalog', path, stdout=StringIO())
+
+        out = StringIO()
+        call_command('import_catalog', path, '--chunk-size', '3', '--resume', stdout=out)
+        self.assertIn('Resuming after record 6.', out.getvalue())
+        self.assertIn('10 books, 20 copies', out.getvalue())
+        self.assertEqual(Book.objects.count(), 10)
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+
+class HashPasswordsTests(APITestCase):
+    """Tests for the hash_passwords command."""
+
+    def setUp(self):
+        self.plain = [
+            User.objects.create(name=f'Legacy {n}', email=f'legacy{n}@example.com', password=f'secret{n}')
+            for n in range(5)
+        ]
+        self.hashed = User.objects.create_user(name='Hashed', email='hashed@example.com', password='password123')
+        self.unusable = User.objects.create_user(name='Unusable', email='unusable@example.com')
+        self.empty = User.objects.create(name='Empty', email='empty@example.com', password='')
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('hash_passwords', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_hashes_plain_text_passwords(self):
+        """Test plain-text passwords are hashed in chunks and others are left alone."""
+        hashed_before = User.objects.get(pk=self.hashed.pk).password
+        out = self.run_command('--chunk-size', '3')
+
+        self.assertIn('Hashed 5 of 8 passwords.', out)
+        self.assertIn('Skipped 1 users with an empty password.', out)
+        for n, user in enumerate(self.plain):
+            user.refresh_from_db()
+            self.assertTrue(user.check_password(f'secret{n}'))
+        self.assertEqual(User.objects.get(pk=self.hashed.pk).password, hashed_before)
+        self.assertFalse(User.objects.get(pk=self.unusable.pk).has_usable_password())
+        self.assertEqual(User.objects.get(pk=self.empty.pk).password, '')
+
+        # A second run finds nothing to do
+        self.assertIn('Hashed 0 of 8 passwords.', self.run_command())
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ])
+    def test_recognizes_every_configured_hasher(self):
+        """Test hashes from any configured hasher, not just the default, are left alone."""
+        encoded = make_password('secret', hasher='pbkdf2_sha1')
+        User.objects.filter(pk=self.plain[0].pk).update(password=encoded)
+        self.assertIn('Hashed 4 of 8 passwords.', self.run_command())
+        self.assertEqual(User.objects.get(pk=self.plain[0].pk).password, encoded)
+
+    def test_dry_run_and_start_id(self):
+        """Test --dry-run writes nothing and --start-id skips lower ids."""
+        out = self.run_command('--dry-run')
+        self.assertIn('Dry run: 5 of 8 passwords are plain text.', out)
+        self.assertEqual(User.objects.get(pk=self.plain[0].pk).password, 'secret0')
+
+        self.run_command('--start-id', str(self.plain[3].pk))
+        self.assertEqual(User.objects.get(pk=self.plain[2].pk).password, 'secret2')
+        self.assertTrue(User.objects.get(pk=self.plain[3].pk).check_password('secret3'))
+
+    def test_password_changed_while_hashing_is_kept(self):
+        """Test a password changed between reading and writing the chunk is not overwritten."""
+        def change_then_hash(password):
+            if password == 'secret1':
+                User.objects.filter(pk=self.plain[1].pk).update(password=make_password('new-password'))
+            return make_password(password)
+
+        with mock.patch.object(hash_passwords, 'make_password', change_then_hash):
+            out = self.run_command()
+        self.assertIn('Hashed 4 of 8 passwords.', out)
+        self.assertTrue(User.objects.get(pk=self.plain[1].pk).check_password('new-password'))
+
+    def test_process_pool(self):
+        """Test hashing across worker processes."""
+        call_command('hash_passwords', '--workers', '2', stdout=StringIO())
+        self.assertTrue(User.objects.get(pk=self.plain[4].pk).check_password('secret4'))
+
+
+class TokenBlacklistTests(APITestCase):
+    """Tests for refresh token rotation and the blacklist Bloom filter."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        token_blacklist._filter = None
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+        self.refresh = self.client.post('/api/auth/sign-in/', {
+            'email': 'testuser@example.com', 'password': 'password123'
+        }, format='json').data['refresh']
+
+    def refresh_token(self, refresh):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+
+    def test_refresh_rotates_and_blacklists(self):
+        """Test a refresh returns new tokens and the old refresh token stops working."""
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['email'], 'testuser@example.com')
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh_token(response.data['refresh']).status_code, status.HTTP_200_OK)
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+    def test_filter_skips_lookup_of_clean_tokens(self):
+        """Test refreshing a token the filter rules out does not query the blacklist."""
+        self.refresh_token(self.refresh)
+        fresh = self.client.post('/api/auth/sign-in/', {
+            'email': 'testuser@example.com', 'password': 'password123'
+        }, format='json').data['refresh']
+        metrics.reset()
+        with mock.patch.object(BlacklistMixin, 'check_blacklist') as lookup:
+            self.assertEqual(self.refresh_token(fresh).status_code, status.HTTP_200_OK)
+        lookup.assert_not_called()
+        self.assertEqual(metrics.snapshot()['counters']['auth.blacklist.skipped'], 1)
+
+    def test_filter_is_rebuilt_when_lost(self):
+        """Test a lost filter falls back to the database and is rebuilt from it."""
+        self.refresh_token(self.refresh)
+        bloom = token_blacklist.get_filter()
+        bloom.store(bytearray(len(bloom.bits)))
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(bloom.might_contain(RefreshToken(self.refresh, verify=False)['jti']))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test every added jti is found, and the built bitmap matches incremental adds."""
+        bloom = token_blacklist.LocalBloomFilter(capacity=1000, error_rate=0.01)
+        jtis = [f'jti-{i}' for i in range(1000)]
+        bloom.add(jtis)
+        bloom.bits[0] |= 0x80
+        self.assertTrue(all(bloom.might_contain(jti) for jti in jtis))
+        self.assertEqual(bloom.bits, bloom.bitmap(jtis))
+        false_positives = sum(bool(bloom.might_contain(f'other-{i}')) for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_compact_deletes_expired_tokens_in_batches(self):
+        """Test compaction deletes expired outstanding and blacklisted tokens only."""
+        self.refresh_token(self.refresh)
+        expired = OutstandingToken.objects.order_by('pk')[:1].values_list('pk', flat=True)
+        OutstandingToken.objects.filter(pk__in=list(expired)).update(expires_at=timezone.now() - timedelta(days=1))
+        for i in range(4):
+            OutstandingToken.objects.create(jti=f'old-{i}', token='', expires_at=timezone.now() - timedelta(days=1))
+        live = OutstandingToken.objects.count() - 5
+
+        out = StringIO()
+        call_command('compact_token_blacklist', '--dry-run', stdout=out)
+        self.assertIn('5 of', out.getvalue())
+        out = StringIO()
+        call_command('compact_token_blacklist', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted 5 expired tokens', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), live)
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+
+    @override_settings(TOKEN_BLACKLIST_PRUNE_INTERVAL=3600, TOKEN_BLACKLIST_PRUNE_BATCH_SIZE=2)
+    def test_expired_tokens_are_pruned_on_refresh(self):
+        """Test refreshes prune one batch of expired tokens per interval."""
+        for i in range(3):
+            OutstandingToken.objects.create(jti=f'old-{i}', token='', expires_at=timezone.now() - timedelta(days=1))
+        self.refresh = self.refresh_token(self.refresh).data['refresh']
+        self.refresh_token(self.refresh)
+        self.assertEqual(OutstandingToken.objects.filter(jti__startswith='old-').count(), 1)
+
+
+class ThrottlingTests(AuthTestMixin, APITestCase):
+    """Tests for the sliding-window, per-scope throttles."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        rates = {'anon': '100/minute', 'user': '100/minute', 'sign-in': '3/minute',
+                 'catalog': '100/minute', 'checkout': '2/minute'}
+        throttles = [throttling.AnonSlidingWindowThrottle, throttling.UserSlidingWindowThrottle,
+                     throttling.ScopedSlidingWindowThrottle]
+        for patcher in (mock.patch.object(APIView, 'throttle_classes', throttles),
+                        mock.patch.object(throttling.SlidingWindowThrottle, 'THROTTLE_RATES', rates)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+
+    def sign_in(self):
+        return self.client.post('/api/auth/sign-in/', {
+            'email': 'testuser@example.com', 'password': 'password123'
+        }, format='json')
+
+    def test_scope_limits_its_views_only(self):
+        """Test the sign-in scope limits sign-ins without affecting the catalog."""
+        statuses = [self.sign_in().status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        response = self.sign_in()
+        self.assertGreater(int(response.headers['Retry-After']), 0)
+        self.assertEqual(self.client.get('/api/books/').status_code, status.HTTP_200_OK)
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['throttle.denied.sign-in'], 2)
+
+    def test_method_scopes(self):
+        """Test reservation creation is limited by the checkout scope while listing isn't."""
+        self.authenticate_as_user(self.user)
+        statuses = [self.client.post('/api/reservations/', {}, format='json').status_code for _ in range(3)]
+        self.assertNotEqual(statuses[1], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(statuses[2], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get('/api/reservations/').status_code, status.HTTP_200_OK)
+
+    def test_returns_and_extensions_share_the_checkout_scope(self):
+        """Test single returns, copy returns and extensions count against the checkout scope."""
+        self.authenticate_as_staff()
+        paths = ['/api/reservations/999/', '/api/reservations/999/extend/', '/api/books/999/copies/1/']
+        statuses = [self.client.put(path, {}, format='json').status_code for path in paths]
+        self.assertNotEqual(statuses[1], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(statuses[2], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_sliding_window_estimate(self):
+        """Test the previous window counts in proportion to its overlap."""
+        throttle = throttling.UserSlidingWindowThrottle()
+        throttle.num_requests, throttle.duration = 2, 60
+        request = mock.Mock(user=self.user, method='GET')
+        view = mock.Mock(throttle_scope=None)
+
+        def allowed_at(now):
+            with mock.patch.object(throttle, 'timer', return_value=now):
+                return throttle.allow_request(request, view)
+
+        self.assertEqual([allowed_at(50), allowed_at(55), allowed_at(58)], [True, True, False])
+        # Next window, once half of this one's 2 requests no longer overlap
+        self.assertAlmostEqual(throttle.wait(), 2 + 30)
+        # At 70s, 5/6 of the previous window's 2 requests still count
+        self.assertEqual([allowed_at(70), allowed_at(71)], [True, False])
+        self.assertAlmostEqual(throttle.wait(), 49)
+        self.assertEqual([allowed_at(105), allowed_at(110)], [True, False])
+
+    def test_decision_latency_is_recorded(self):
+        """Test each throttle decision is timed in the metrics."""
+        self.client.get('/api/books/')
+        self.client.get('/api/books/')
+        timing = metrics.snapshot()['timings']['throttle.decision']
+        self.assertEqual(timing['count'], 2)
+        self.assertEqual(timing['buckets']['+Inf'], 2)
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_QUERY_MS=0)
+class ProfilingTests(AuthTestMixin, APITestCase):
+    """Tests for the request profiling middleware and the metrics it exposes."""
+
+    def setUp(self):
+        metrics.reset()
+        profiling.reset()
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='Test Book', author=author, genre=genre, isbn='9780306406157')
+        add_copies(self.book, 1)
+
+    def test_sampled_requests_are_recorded_per_view(self):
+        """Test wall time, database time and queries are recorded under the view's name."""
+        self.client.get('/api/books/')
+        self.client.get('/api/books/')
+        self.client.get(f'/api/books/{self.book.book_id}/')
+        self.client.get('/api/no-such-endpoint/')
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['view.requests{view="BookListView"}'], 2)
+        self.assertGreater(snapshot['counters']['view.queries{view="BookListView"}'], 2)
+        self.assertEqual(snapshot['counters']['view.requests{view="BookDetailView"}'], 1)
+        self.assertEqual(snapshot['timings']['view.wall{view="BookListView"}']['count'], 2)
+        self.assertEqual(snapshot['timings']['view.db{view="BookListView"}']['count'], 2)
+        self.assertFalse([name for name in snapshot['counters'] if 'None' in name])
+
+        # Every query is slow with a threshold of 0
+        slow = profiling.slow_queries()
+        self.assertEqual(len(slow), sum(
+            count for name, count in snapshot['counters'].items() if name.startswith('view.queries{')
+        ))
+        self.assertEqual(slow[0]['view'], 'BookDetailView')
+        self.assertTrue(any(frame.startswith('myapp/views/book_views.py:') for frame in slow[-1]['stack']))
+        self.assertNotIn('9780306406157', json.dumps(slow))
+
+    def test_duplicate_queries_are_counted(self):
+        """Test a query repeating an earlier one with the same parameters counts as a duplicate."""
+        recorder = profiling.QueryRecorder(slow_seconds=1)
+        with connection.execute_wrapper(recorder):
+            Book.objects.filter(pk=self.book.pk).exists()
+            Book.objects.filter(pk=self.book.pk).exists()
+            Book.objects.filter(pk=self.book.pk + 1).exists()
+        self.assertEqual((recorder.queries, recorder.duplicates, recorder.slow), (3, 1, []))
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_off_by_default(self):
+        """Test nothing is recorded with a sample rate of 0."""
+        self.client.get('/api/books/')
+        self.assertFalse(metrics.snapshot()['timings'])
+        self.assertEqual(profiling.slow_queries(), [])
+
+    async def test_async_views_are_profiled(self):
+        """Test queries of async views, made from the ORM's thread, are recorded."""
+        response = await self.async_client.get('/api/async/books/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(metrics.snapshot()['counters']['view.queries{view="AsyncBookListView"}'], 0)
+
+    def test_staff_read_slow_queries_and_prometheus_metrics(self):
+        """Test the slow query log and the Prometheus rendering of the metrics."""
+        self.client.get('/api/books/')
+        user = User.objects.create_user(name='Test User', email='testuser@example.com', password='password123')
+        self.authenticate_as_user(user)
+        self.assertEqual(self.client.get('/api/metrics/slow-queries/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/api/metrics/?format=prometheus')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(response.content.startswith(b'# detail: '))
+
+        self.authenticate_as_staff()
+        response = self.client.get('/api/metrics/slow-queries/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[-1]['view'], 'BookListView')
+
+        response = self.client.get('/api/metrics/', HTTP_ACCEPT='text/plain')
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertEqual(text.count('# TYPE lms_view_wall_seconds histogram\n'), 1)
+        labels = f'pid="{os.getpid()}",view="BookListView"'
+        self.assertIn(f'lms_view_wall_seconds_bucket{{{labels},le="+Inf"}} 1\n', text)
+        self.assertIn(f'lms_view_requests_total{{{labels}}} 1\n', text)
+        self.assertIn(f'lms_view_requests_total{{pid="{os.getpid()}",view="SlowQueryView"}} 2\n', text)
+        # A request is recorded once it has been answered
+        self.assertEqual(self.client.get('/api/metrics/').json()['counters']['view.requests{view="MetricsView"}'], 2)
+
+    def test_prometheus_text_flattens_gauges(self):
+        """Test nested numeric gauges become one gauge each and others are skipped."""
+        text = metrics.prometheus_text({
+            'pid': 42,
+            'counters': {'notices.sent': 3},
+            'gauges': {'db_pool': {'default': {'in_use': 2, 'idle': 1}}, 'name': 'x'},
+            'timings': {},
+        })
+        self.assertEqual(text.splitlines(), [
+            '# TYPE lms_notices_sent_total counter', 'lms_notices_sent_total{pid="42"} 3',
+            '# TYPE lms_db_pool_default_idle gauge', 'lms_db_pool_default_idle{pid="42"} 1',
+            '# TYPE lms_db_pool_default_in_use gauge', 'lms_db_pool_default_in_use{pid="42"} 2',
+        ])
+
+    def test_labelled_metrics_share_a_family(self):
+        """Test metrics recorded with labels render as labelled series under one TYPE line."""
+        metrics.reset()
+        metrics.incr('view.requests', view='BookListView')
+        metrics.incr('view.requests', 2, view='Odd"View')
+        metrics.incr('view.requests_total_extra')
+        text = metrics.prometheus_text({**metrics.snapshot(), 'pid': 42})
+        self.assertEqual(text.splitlines(), [
+            '# TYPE lms_view_requests_total counter',
+            'lms_view_requests_total{pid="42",view="BookListView"} 1',
+            'lms_view_requests_total{pid="42",view="Odd\\"View"} 2',
+            '# TYPE lms_view_requests_total_extra_total counter',
+            'lms_view_requests_total_extra_total{pid="42"} 1',
+        ])
+
+
+class MigrationBackfillTests(TransactionTestCase):
+    """Tests for the migrations that fill new tables from the existing catalog."""
+
+    def migrate(self, target):
+        """Migrate myapp to `target` and return the historical models at that state."""
+        executor = MigrationExecutor(connection)
+        executor.migrate([('myapp', target)])
+        return executor.loader.project_state([('myapp', target)]).apps
+
+    def tearDown(self):
+        call_command('migrate', verbosity=0)
+
+    def create_book(self, apps, copies):
+        author = apps.get_model('myapp', 'Author').objects.create(name='Old Author')
+        genre = apps.get_model('myapp', 'Genre').objects.create(name='Old Genre')
+        book = apps.get_model('myapp', 'Book').objects.create(
+            title='Forgotten Lighthouse', author=author, genre=genre, isbn='9780306406157',
+        )
+        BookCopies = apps.get_model('myapp', 'BookCopies')
+        return book, [BookCopies.objects.create(book=book, is_available=available) for available in copies]
+
+    def test_rollups_are_backfilled(self):
+        """Test the rollups count the copies and loans that existed before them."""
+        apps = self.migrate('0007_loan_notices')
+        book, (lent, _) = self.create_book(apps, [False, True])
+        reader = apps.get_model('myapp', 'User').objects.create(name='Reader', email='reader@example.com')
+        due_date = date.today() + timedelta(days=3)
+        apps.get_model('myapp', 'Reservations').objects.create(
+            user=reader, book=book, copy=lent, start_date=date.today(), due_date=due_date,
+        )
+
+        apps = self.migrate('0008_stats_rollups')
+        genre = apps.get_model('myapp', 'GenreStats').objects.get(genre_id=book.genre_id)
+        self.assertEqual((genre.total_copies, genre.available_copies, genre.on_loan), (2, 1, 1))
+        self.assertEqual(
+            list(apps.get_model('myapp', 'DueDateStats').objects.values_list('due_date', 'on_loan')), [(due_date, 1)],
+        )
+        self.assertEqual(apps.get_model('myapp', 'BookStats').objects.get(book_id=book.pk).loans, 1)
+
+    def test_existing_books_are_indexed(self):
+        """Test a book created before the search index existed can be found."""
+        book, _ = self.create_book(self.migrate('0001_initial'), [True])
+
+        self.migrate('0002_book_search_index')
+        call_command('migrate', verbosity=0)
+        found = get_search_backend().search(Book.objects.all(), 'forgotten light')
+        self.assertEqual(list(found.values_list('pk', flat=True)), [book.pk])
+
+
+class IndexAuditTests(APITestCase):
+    def test_view_queries_use_indexes(self):
+        """Test every audited view query is served by an index."""
+        out = StringIO()
+        call_command('audit_indexes', stdout=out)
+        self.assertIn('queries use an index', out.getvalue())
+
+    def test_full_scan_is_reported(self):
+        """Test a query filtering on an unindexed column fails the audit."""
+        audited = {'book-by-quantity': lambda: Book.objects.filter(quantity=3)}
+        with mock.patch.object(audit_indexes, 'AUDITED_QUERIES', audited):
+            with self.assertRaises(CommandError):
+                call_command('audit_indexes', stdout=StringIO())
+
+    def test_plan_parsers(self):
+        """Test scans are told apart from index lookups in SQLite and MySQL plans."""
+        self.assertEqual(audit_indexes.sqlite_full_scans('2 0 0 SCAN book\n5 0 0 SEARCH author USING INDEX a (name=?)'), ['book'])
+        self.assertEqual(audit_indexes.sqlite_full_scans('3 0 0 SCAN U0 USING INDEX book_search_token_idx'), [])
+        plan = '{"query_block": {"nested_loop": [{"table": {"table_name": "book", "access_type": "ALL"}},' \
+               ' {"table": {"table_name": "author", "access_type": "ALL", "possible_keys": ["PRIMARY"]}}]}}'
+        self.assertEqual(audit_indexes.mysql_full_scans(plan), ['book'])
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Stress test checkout from many threads at once."""
+
+    threads = 16
+    copies = 5
+
+    def setUp(self):
+        author = Author.objects.create(name='Test Author')
+        genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='Test Book', author=author, genre=genre, isbn='9780306406157')
+        add_copies(self.book, self.copies)
+        self.users = [
+            User.objects.create_user(name=f'Reader {i}', email=f'reader{i}@example.com', password='password123')
+            for i in range(self.threads)
+        ]
+
+    def run_checkouts(self, copy_id=None):
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def worker(user):
+            barrier.wait()
+            try:
+                # SQLite allows a single writer; retry when the database is busy
+                for _ in range(50):
+                    try:
+                        checkout(user, self.book.book_id, date.today(), copy_id=copy_id)
+                        outcomes.append('ok')
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+                outcomes.append('busy')
+            except CopyUnavailable:
+                outcomes.append('unavailable')
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(user,)) for user in self.users]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return outcomes
+
+    def assertNoDoubleLoans(self):
+        loaned = list(Reservations.objects.values_list('copy_id', flat=True))
+        self.assertEqual(len(loaned), len(set(loaned)))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, self.copies - len(loaned))
+        self.assertEqual(BookCopies.objects.filter(book=self.book, is_available=False).count(), len(loaned))
+
+    def test_parallel_checkouts_of_any_copy(self):
+        """Test parallel checkouts lend each copy at most once."""
+        outcomes = self.run_checkouts()
+        self.assertEqual(outcomes.count('ok'), self.copies)
+        self.assertEqual(outcomes.count('unavailable'), self.threads - self.copies)
+        self.assertNoDoubleLoans()
+
+    def test_parallel_checkouts_of_one_copy(self):
+        """Test parallel checkouts of the same copy lend it once."""
+        copy = BookCopies.objects.filter(book=self.book).first()
+        outcomes = self.run_checkouts(copy_id=copy.copy_id)
+        self.assertEqual(outcomes.count('ok'), 1)
+        self.assertNoDoubleLoans()
@@ -0,0 +1,134 @@
+"""
+Sliding-window throttles kept in the default cache.
+
+DRF's SimpleRateThrottle stores a list of request times per client and
+rewrites it on every request. These keep one counter per client and fixed
+window instead, and estimate the sliding window from the current and
+previous counters, so a decision is one get_many and one incr. With Redis as
+the default cache the counters are shared by all workers.
+
+Views pick a limit with `throttle_scope`, a scope name or a {method: scope}
+dict: scoped views are limited by that scope's rate in DEFAULT_THROTTLE_RATES,
+and all others by the 'anon' and 'user' rates.
+"""
+import time
+
+from django.core.cache import cache as default_cache  # type: ignore
+from rest_framework.throttling import SimpleRateThrottle  # type: ignore
+
+from myapp import metrics
+
+
+def view_scope(request, view):
+    """
+    Return the throttle scope `view` declares for `request`, or None.
+    """
+    scope = getattr(view, 'throttle_scope', None)
+    if isinstance(scope, dict):
+        scope = scope.get(request.method)
+    return scope
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Allows `num_requests` per `duration` seconds, counted over a sliding
+    window: the previous window's count weighted by how much of it still
+    overlaps, plus the current window's count.
+    """
+    cache = default_cache
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        started = time.perf_counter()
+        allowed = self.count_request()
+        metrics.observe('throttle.decision', time.perf_counter() - started)
+        if not allowed:
+            metrics.incr(f'throttle.denied.{self.scope}')
+        return allowed
+
+    def count_request(self):
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key, previous_key = f'{self.key}:{window}', f'{self.key}:{window - 1}'
+        counts = self.cache.get_many([previous_key, current_key])
+        self.previous = counts.get(previous_key, 0)
+        self.current = counts.get(current_key, 0)
+        self.overlap = 1 - (self.now - window * self.duration) / self.duration
+
+        if self.previous * self.overlap + self.current >= self.num_requests:
+            return False
+        # Windows are kept for two durations, while they count as previous
+        self.cache.add(current_key, 0, timeout=2 * self.duration)
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            # Evicted since the add
+            self.cache.set(current_key, 1, timeout=2 * self.duration)
+        return True
+
+    def wait(self):
+        """
+        Seconds until the window's estimate drops below the limit.
+        """
+        window_left = self.overlap * self.duration
+        if self.current >= self.num_requests:
+            # Only the next window helps; there the current count decays
+            overlap_needed = (self.num_requests - 1) / self.current
+            return window_left + (1 - overlap_needed) * self.duration
+        overlap_needed = (self.num_requests - 1 - self.current) / self.previous
+        return max(window_left - overlap_needed * self.duration, 0)
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits unauthenticated clients, by IP address, on views without a scope.
+    """
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if (request.user and request.user.is_authenticated) or view_scope(request, view):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits authenticated users, by user id, on views without a scope.
+    """
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated) or view_scope(request, view):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Limits each client, by user id or IP address, on views with a
+    `throttle_scope`, at that scope's rate.
+    """
+
+    def __init__(self):
+        # The scope, and so the rate, depends on the view
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = view_scope(request, view)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -0,0 +1,238 @@
+"""
+A Bloom filter in front of the refresh token blacklist.
+
+With ROTATE_REFRESH_TOKENS and BLACKLIST_AFTER_ROTATION every refresh checks
+that the token is not blacklisted, and nearly all of them aren't. The filter
+holds the jti of every blacklisted token, so when it says a jti is absent the
+database lookup is skipped; a possible match still goes to the database.
+
+The filter is a bitmap whose bit 0 marks it as built. In Redis it is a
+single key: if it is evicted or flushed the ready bit goes with it, lookups
+fall back to the database, and the next one rebuilds it. Set
+TOKEN_BLACKLIST_BLOOM to 'redis' (the default cache must be Redis), 'local'
+(a bitmap per process, only safe with one server process, since a token
+blacklisted in another process would be missing from it) or 'off'.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.db import transaction  # type: ignore
+from django.utils import timezone  # type: ignore
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken  # type: ignore
+
+from myapp import metrics
+
+BLOOM_KEY = 'token_blacklist:bloom'
+REBUILD_LOCK_KEY = 'token_blacklist:rebuilding'
+PRUNE_KEY = 'token_blacklist:pruned'
+
+# Tokens blacklisted this long before a rebuild started are added again after
+# it, in case their transaction committed while the bitmap was being replaced
+REBUILD_MARGIN = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """
+    Bloom filter over jtis, sized for `capacity` entries at `error_rate`
+    false positives. Subclasses store the bitmap: bit i is the (i % 8)-th most
+    significant bit of byte i // 8, the layout of Redis GETBIT/SETBIT.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+
+    def positions(self, jti):
+        # Double hashing (Kirsch & Mitzenmacher); bit 0 is the ready bit
+        digest = hashlib.blake2b(jti.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [1 + (first + i * second) % self.size for i in range(self.hashes)]
+
+    def bitmap(self, jtis):
+        """
+        Return a built bitmap holding `jtis`.
+        """
+        bits = bytearray(math.ceil((self.size + 1) / 8))
+        for position in [0] + [position for jti in jtis for position in self.positions(jti)]:
+            bits[position // 8] |= 0x80 >> (position % 8)
+        return bits
+
+    def might_contain(self, jti):
+        """
+        Return False if `jti` was never added, True if it may have been, or
+        None if the filter isn't built.
+        """
+        bits = self.get_bits([0] + self.positions(jti))
+        if not bits[0]:
+            return None
+        return all(bits[1:])
+
+    def add(self, jtis):
+        raise NotImplementedError
+
+    def get_bits(self, positions):
+        raise NotImplementedError
+
+    def store(self, bits):
+        raise NotImplementedError
+
+
+class LocalBloomFilter(BloomFilter):
+    """
+    Bitmap in this process's memory.
+    """
+    mode = 'local'
+
+    def __init__(self, capacity, error_rate):
+        super().__init__(capacity, error_rate)
+        self.bits = bytearray(math.ceil((self.size + 1) / 8))
+        self.lock = threading.Lock()
+
+    def get_bits(self, positions):
+        bits = self.bits
+        return [bits[position // 8] & (0x80 >> (position % 8)) for position in positions]
+
+    def add(self, jtis):
+        with self.lock:
+            for position in [position for jti in jtis for position in self.positions(jti)]:
+                self.bits[position // 8] |= 0x80 >> (position % 8)
+
+    def store(self, bits):
+        with self.lock:
+            self.bits = bits
+
+
+class RedisBloomFilter(BloomFilter):
+    """
+    Bitmap in one Redis string, shared by all server processes.
+    """
+    mode = 'redis'
+
+    def __init__(self, capacity, error_rate):
+        super().__init__(capacity, error_rate)
+        self.key = cache.make_and_validate_key(BLOOM_KEY)
+        # Django's Redis cache has no bit operations; use its client directly
+        self.client = cache._cache.get_client(self.key, write=True)
+
+    def get_bits(self, positions):
+        pipeline = self.client.pipeline(transaction=False)
+        for position in positions:
+            pipeline.getbit(self.key, position)
+        return pipeline.execute()
+
+    def add(self, jtis):
+        # On an evicted key this sets bits but not the ready bit, which is right
+        pipeline = self.client.pipeline(transaction=False)
+        for position in [position for jti in jtis for position in self.positions(jti)]:
+            pipeline.setbit(self.key, position, 1)
+        pipeline.execute()
+
+    def store(self, bits):
+        self.client.set(self.key, bytes(bits))
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_filter():
+    """
+    Return the configured Bloom filter, or None if TOKEN_BLACKLIST_BLOOM is off.
+    """
+    global _filter
+    mode = settings.TOKEN_BLACKLIST_BLOOM
+    if mode == 'off':
+        return None
+    with _filter_lock:
+        if _filter is None or _filter.mode != mode:
+            filter_class = {'local': LocalBloomFilter, 'redis': RedisBloomFilter}[mode]
+            _filter = filter_class(settings.TOKEN_BLACKLIST_BLOOM_CAPACITY, settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE)
+        return _filter
+
+
+def rebuild_filter(bloom=None):
+    """
+    Rebuild the Bloom filter from the blacklist table. Returns how many
+    jtis it holds, or None if the filter is off.
+    """
+    bloom = bloom or get_filter()
+    if bloom is None:
+        return None
+    started = timezone.now()
+    jtis = list(BlacklistedToken.objects.values_list('token__jti', flat=True).iterator())
+    bloom.store(bloom.bitmap(jtis))
+    # Catch tokens blacklisted while the bitmap was replaced
+    bloom.add(BlacklistedToken.objects.filter(blacklisted_at__gte=started - REBUILD_MARGIN)
+              .values_list('token__jti', flat=True))
+    metrics.incr('auth.blacklist.rebuild')
+    return len(jtis)
+
+
+def surely_not_blacklisted(jti):
+    """
+    True if the Bloom filter rules out `jti` being blacklisted; otherwise
+    only the database can tell.
+    """
+    bloom = get_filter()
+    if bloom is None:
+        return False
+    found = bloom.might_contain(jti)
+    if found is None:
+        # One process rebuilds it; the others use the database meanwhile
+        if cache.add(REBUILD_LOCK_KEY, True, timeout=300):
+            try:
+                rebuild_filter(bloom)
+            finally:
+                cache.delete(REBUILD_LOCK_KEY)
+        return False
+    metrics.incr('auth.blacklist.maybe' if found else 'auth.blacklist.skipped')
+    return not found
+
+
+def add_blacklisted(jti):
+    """
+    Add `jti` to the Bloom filter, before and after the blacklist row commits.
+    """
+    bloom = get_filter()
+    if bloom is None:
+        return
+    bloom.add([jti])
+    # Again on commit, in case a rebuild replaced the bitmap in between
+    transaction.on_commit(lambda: bloom.add([jti]))
+
+
+def prune_expired(batch_size=1000, max_batches=None):
+    """
+    Delete outstanding tokens (and their blacklist rows) past their expiry, in
+    batches of `batch_size`. Yields the number deleted after each batch.
+    """
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        batches += 1
+        yield len(ids)
+
+
+def prune_if_due():
+    """
+    Prune one batch of expired tokens at most every TOKEN_BLACKLIST_PRUNE_INTERVAL
+    seconds across all processes, so the tables stay near their live size
+    without a scheduled job.
+    """
+    interval = settings.TOKEN_BLACKLIST_PRUNE_INTERVAL
+    if interval and cache.add(PRUNE_KEY, time.time(), timeout=interval):
+        for deleted in prune_expired(batch_size=settings.TOKEN_BLACKLIST_PRUNE_BATCH_SIZE, max_batches=1):
+            metrics.incr('auth.blacklist.pruned', deleted)
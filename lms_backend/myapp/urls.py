@@ -1,21 +1,43 @@
 from django.urls import path # type: ignore
 from myapp.views.book_views import BookListView, BookDetailView, BookCopyUpdateView
-from myapp.views.reservation_views import ReservationListView, ExtendReservationView, ReservationDetailView
+from myapp.views.reservation_views import (
+    ReservationListView, ExtendReservationView, ReservationDetailView,
+    ReservationBulkCheckoutView, ReservationBulkReturnView,
+)
+from myapp.views.waitlist_views import BookWaitlistView, WaitlistListView
 from myapp.views.user_views import UserListView, UserDetailView
 from myapp.views.auth_views import UserMeView
-from myapp.views.signin_views import SignInAPIView
+from myapp.views.signin_views import SignInAPIView, TokenRefreshAPIView
 from myapp.views.signup_views import SignupAPIView
+from myapp.views.metrics_views import MetricsView, SlowQueryView
+from myapp.views.stats_views import DashboardView
+from myapp.views.async_views import (
+    AsyncBookListView, AsyncBookDetailView, AsyncReservationListView, AsyncUserMeView,
+)
 
 urlpatterns = [
     path('books/', BookListView.as_view(), name='book_list'),  # GET requests for listing books
     path('books/<int:book_id>/', BookDetailView.as_view(), name='book_detail'),
     path('books/<int:book_id>/copies/<int:copy_number>/', BookCopyUpdateView.as_view(), name='book_copy_update'),
+    path('books/<int:book_id>/waitlist/', BookWaitlistView.as_view(), name='book_waitlist'),
     path('reservations/', ReservationListView.as_view(), name='reservation_list'),
+    path('reservations/bulk/', ReservationBulkCheckoutView.as_view(), name='reservation_bulk_checkout'),
+    path('reservations/bulk-return/', ReservationBulkReturnView.as_view(), name='reservation_bulk_return'),
     path('reservations/<int:reservation_id>/extend/', ExtendReservationView.as_view(), name='extend_reservation'),
     path('reservations/<int:reservation_id>/', ReservationDetailView.as_view(), name='reservation_detail'),
+    path('waitlist/', WaitlistListView.as_view(), name='waitlist_list'),
     path('users/', UserListView.as_view(), name='user_list'),
     path('users/<int:user_id>/', UserDetailView.as_view(), name='user_detail'),
     path('auth/users/me/', UserMeView.as_view(), name='user_me'),
     path('auth/sign-in/', SignInAPIView.as_view(), name='sign_in'),
     path('auth/sign-up/', SignupAPIView.as_view(), name='sign_up'),
+    path('auth/token/refresh/', TokenRefreshAPIView.as_view(), name='token_refresh'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('metrics/slow-queries/', SlowQueryView.as_view(), name='metrics_slow_queries'),
+    path('stats/dashboard/', DashboardView.as_view(), name='stats_dashboard'),
+    # Async-native read endpoints, for ASGI deployments (SERVER_MODE=asgi)
+    path('async/books/', AsyncBookListView.as_view(), name='async_book_list'),
+    path('async/books/<int:book_id>/', AsyncBookDetailView.as_view(), name='async_book_detail'),
+    path('async/reservations/', AsyncReservationListView.as_view(), name='async_reservation_list'),
+    path('async/auth/users/me/', AsyncUserMeView.as_view(), name='async_user_me'),
 ]
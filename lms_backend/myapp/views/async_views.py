@@ -0,0 +1,228 @@
+"""
+Async-native versions of the hot read endpoints, served under /api/async/.
+
+Under an ASGI server these run on the event loop and use the async ORM, so a
+slow client holds a coroutine rather than a worker thread. They return the
+same payloads, validators and cache entries as the sync views.
+"""
+from asgiref.sync import sync_to_async  # type: ignore
+from django.http import HttpResponse  # type: ignore
+from django.views import View  # type: ignore
+from rest_framework import exceptions  # type: ignore
+from rest_framework.renderers import JSONRenderer  # type: ignore
+from rest_framework.request import Request  # type: ignore
+from rest_framework.settings import api_settings  # type: ignore
+from rest_framework_simplejwt.authentication import JWTAuthentication  # type: ignore
+from django.contrib.auth.models import AnonymousUser  # type: ignore
+from myapp.authentication import auser_state, build_user, claimed_user_id
+from myapp.models import Book, Reservations
+from myapp.pagination import BookPagination, BookSearchPagination, ReservationPagination
+from myapp.search import get_search_backend
+from myapp.serializers.reservation_serializers import ReservationSerializer
+from myapp.views.book_views import serialize_books
+from myapp import cache as catalog_cache, conditional, streaming
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def render(data, status=200):
+    """
+    Render `data` the way the sync API views do.
+    """
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def authenticate(request):
+    """
+    Return the user of the JWT access token sent with `request`, resolved
+    like CachedJWTAuthentication does, or an AnonymousUser if none was sent.
+    Invalid tokens raise AuthenticationFailed.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return AnonymousUser()
+
+    user_id = claimed_user_id(authentication.get_validated_token(raw_token))
+    return build_user(user_id, await auser_state(user_id))
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of APIView: JWT authentication, the default
+    throttles, an authentication requirement and DRF-style error responses.
+    Handlers receive a DRF Request, so paginators and helpers work unchanged.
+    """
+    require_authentication = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, authenticators=())
+        try:
+            request.user = await authenticate(request)
+            if self.require_authentication and not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            await self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def check_throttles(self, request):
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            # Throttle state lives in the (sync) cache
+            if not await sync_to_async(throttle.allow_request)(request, self):
+                raise exceptions.Throttled(throttle.wait())
+
+    def handle_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+        response = render(data, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            # Like the sync views, whose first authenticator is the JWT one
+            response.status_code = 401
+            response.headers['WWW-Authenticate'] = JWTAuthentication().authenticate_header(None)
+        if getattr(exc, 'wait', None):
+            response.headers['Retry-After'] = str(int(exc.wait))
+        return response
+
+
+class AsyncBookListView(AsyncAPIView):
+    require_authentication = False
+    throttle_scope = 'catalog'
+
+    async def get(self, request):
+        """
+        Async version of BookListView.get.
+        """
+        search_query = request.query_params.get("q", None)
+
+        books = Book.objects.with_listing_data()
+        if search_query:
+            books = get_search_backend().search(books, search_query)
+            paginator = BookSearchPagination()
+        else:
+            paginator = BookPagination()
+
+        try:
+            stream_format = streaming.requested_format(request)
+        except ValueError as e:
+            return render({"error": str(e)}, status=400)
+        if stream_format:
+            return streaming.astream_response(books, paginator.ordering, serialize_books, stream_format)
+
+        versions = await paginator.apage_versions(books, request)
+        etag, last_modified = conditional.validators(versions, scope=request.get_full_path())
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        # Cache backends are sync; their async API runs them in a thread too
+        key = await sync_to_async(catalog_cache.listing_key)(request)
+        listing = await sync_to_async(catalog_cache.get_listing)(key)
+        if listing is not None:
+            results = await sync_to_async(catalog_cache.book_payloads)(listing['ids'], serialize_books)
+            data = results if listing['links'] is None else {**listing['links'], 'results': results}
+            return conditional.add_validators(render(data), etag, last_modified)
+
+        page = await paginator.apaginate_queryset(books, request, view=self)
+        if page is None:
+            books = [book async for book in books]
+            data = serialize_books(books)
+            await sync_to_async(catalog_cache.store_listing)(key, books, data)
+            return conditional.add_validators(render(data), etag, last_modified)
+
+        data = serialize_books(page)
+        links = {'next': paginator.get_next_link(), 'previous': paginator.get_previous_link()}
+        await sync_to_async(catalog_cache.store_listing)(key, page, data, links=links)
+        return conditional.add_validators(render({**links, 'results': data}), etag, last_modified)
+
+
+class AsyncBookDetailView(AsyncAPIView):
+    require_authentication = False
+    throttle_scope = 'catalog'
+
+    async def get(self, request, book_id):
+        """
+        Async version of BookDetailView.get.
+        """
+        versions = [row async for row in Book.objects.filter(pk=book_id).values_list('pk', 'updated_at')]
+        if not versions:
+            return render({"error": "Book not found"}, status=404)
+
+        etag, last_modified = conditional.validators(versions)
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        payloads = await sync_to_async(catalog_cache.book_payloads)([book_id], serialize_books)
+        if not payloads:
+            return render({"error": "Book not found"}, status=404)
+        return conditional.add_validators(render(payloads[0]), etag, last_modified)
+
+
+class AsyncReservationListView(AsyncAPIView):
+
+    async def get(self, request):
+        """
+        Async version of ReservationListView.get.
+        """
+        try:
+            reservations = Reservations.objects.select_related('user', 'book', 'copy')
+            if not request.user.is_staff:
+                reservations = reservations.filter(user=request.user)
+
+            book_id = request.query_params.get("book_id", None)
+            returned = request.query_params.get("returned", None)
+            if book_id:
+                reservations = reservations.filter(book_id=book_id)
+            if returned is not None:
+                reservations = reservations.filter(copy__is_available=returned.lower() == "true")
+
+            try:
+                stream_format = streaming.requested_format(request)
+            except ValueError as e:
+                return render({"error": str(e)}, status=400)
+            if stream_format:
+                return streaming.astream_response(
+                    reservations, ReservationPagination.ordering,
+                    lambda rows: ReservationSerializer(rows, many=True).data, stream_format,
+                )
+
+            paginator = ReservationPagination()
+            versions = await paginator.apage_values(
+                reservations, request,
+                'pk', 'updated_at', 'copy__updated_at', 'book__updated_at', 'user__email',
+            )
+            scope = f"{request.user.pk}|{request.get_full_path()}"
+            etag, last_modified = conditional.validators(versions, scope=scope)
+            response = conditional.not_modified(request, etag, last_modified, private=True)
+            if response is not None:
+                return response
+
+            page = await paginator.apaginate_queryset(reservations, request, view=self)
+            if page is None:
+                rows = [reservation async for reservation in reservations]
+                data = ReservationSerializer(rows, many=True).data
+            else:
+                data = {
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                    'results': ReservationSerializer(page, many=True).data,
+                }
+            return conditional.add_validators(render(data), etag, last_modified, private=True)
+        except exceptions.NotFound:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching reservations: {e}")
+            return render({"error": str(e)}, status=500)
+
+
+class AsyncUserMeView(AsyncAPIView):
+
+    async def get(self, request):
+        return render({
+            "email": request.user.email,
+            "name": request.user.name,
+            "is_staff": request.user.is_staff,
+        })
@@ -3,34 +3,82 @@ from rest_framework.response import Response  # type: ignore
 from rest_framework import status  # type: ignore
 from myapp.models import Book, BookCopies, Reservations, Author, Genre
 from myapp.serializers.book_serializers import BookSerializer, BookCopySerializer
-from django.db.models import Q  # type: ignore
 from myapp.serializers.reservation_serializers import ReservationSerializer
 import logging
 from django.db import transaction
 import re
 from stdnum import isbn as stdnum_isbn
 from myapp.permissions import IsStaffOrReadOnly, IsStaffUser
+from myapp.pagination import BookPagination, BookSearchPagination
+from myapp.search import get_search_backend
+from myapp.circulation import add_copies, mark_returned
 from myapp.utils import sanitize_string
+from myapp import cache as catalog_cache, conditional, streaming
 
 logger = logging.getLogger(__name__)
 
 
+def serialize_books(books):
+    return BookSerializer(books, many=True).data
+
+
 class BookListView(APIView):
     permission_classes = [IsStaffOrReadOnly]
+    throttle_scope = 'catalog'
 
     def get(self, request):
+        """
+        List books, optionally searched with `q`. Results are keyset-paginated;
+        pass `paginate=false` for the full list, or `stream=json` / `stream=ndjson`
+        to stream it for large exports. Responses carry an ETag and
+        Last-Modified, and pages are served from the catalog cache when possible.
+        """
         search_query = request.query_params.get("q", None)
 
-        # Filter books by title or author's name
+        # Rank books matching the query on title, author, genre or ISBN
+        books = Book.objects.with_listing_data()
         if search_query:
-            books = Book.objects.filter(
-                Q(title__icontains=search_query) | Q(author__name__icontains=search_query)
-            )
+            books = get_search_backend().search(books, search_query)
+            paginator = BookSearchPagination()
         else:
-            books = Book.objects.all()
+            paginator = BookPagination()
 
-        serializer = BookSerializer(books, many=True)
-        return Response(serializer.data)
+        try:
+            stream_format = streaming.requested_format(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if stream_format:
+            return streaming.stream_response(books, paginator.ordering, serialize_books, stream_format)
+
+        # Answer conditional requests from the page's timestamps alone
+        versions = paginator.page_versions(books, request)
+        etag, last_modified = conditional.validators(versions, scope=request.get_full_path())
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        key = catalog_cache.listing_key(request)
+        listing = catalog_cache.get_listing(key)
+        if listing is not None:
+            results = catalog_cache.book_payloads(listing['ids'], serialize_books)
+            if listing['links'] is None:
+                response = Response(results)
+            else:
+                response = Response({**listing['links'], 'results': results})
+            return conditional.add_validators(response, etag, last_modified)
+
+        page = paginator.paginate_queryset(books, request, view=self)
+        if page is None:
+            books = list(books)
+            data = serialize_books(books)
+            catalog_cache.store_listing(key, books, data)
+            return conditional.add_validators(Response(data), etag, last_modified)
+
+        data = serialize_books(page)
+        response = paginator.get_paginated_response(data)
+        links = {'next': response.data['next'], 'previous': response.data['previous']}
+        catalog_cache.store_listing(key, page, data, links=links)
+        return conditional.add_validators(response, etag, last_modified)
 
     @transaction.atomic
     def post(self, request):
@@ -82,8 +130,7 @@ class BookListView(APIView):
             )
 
             # Create book copies
-            book_copies = [BookCopies(book=book, is_available=True) for _ in range(copy_number)]
-            BookCopies.objects.bulk_create(book_copies)
+            add_copies(book, copy_number)
 
             # Serialize and return the book
             serializer = BookSerializer(book)
@@ -102,14 +149,22 @@ class BookListView(APIView):
 
 class BookDetailView(APIView):
     permission_classes = [IsStaffOrReadOnly]
+    throttle_scope = 'catalog'
 
     def get(self, request, book_id):
-        try:
-            book = Book.objects.get(pk=book_id)
-            serializer = BookSerializer(book)
-            return Response(serializer.data)
-        except Book.DoesNotExist:
+        versions = list(Book.objects.filter(pk=book_id).values_list('pk', 'updated_at'))
+        if not versions:
+            return Response({"error": "Book not found"}, status=404)
+
+        etag, last_modified = conditional.validators(versions)
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        payloads = catalog_cache.book_payloads([book_id], serialize_books)
+        if not payloads:
             return Response({"error": "Book not found"}, status=404)
+        return conditional.add_validators(Response(payloads[0]), etag, last_modified)
     
     def put(self, request, book_id):
         """
@@ -158,6 +213,7 @@ class BookCopyUpdateView(APIView):
     Only staff can mark books as returned.
     """
     permission_classes = [IsStaffUser]
+    throttle_scope = {'PUT': 'checkout'}
 
     def put(self, request, book_id, copy_number):
         """
@@ -178,8 +234,7 @@ class BookCopyUpdateView(APIView):
 
             # If a reservation exists, mark the book copy as available
             if reservation:
-                book_copy.is_available = True
-                book_copy.save()
+                mark_returned(book_copy)
 
             # Prepare the response data
             response_data = {
@@ -0,0 +1,45 @@
+from rest_framework.views import APIView  # type: ignore
+from rest_framework.response import Response  # type: ignore
+from rest_framework.renderers import BaseRenderer  # type: ignore
+from rest_framework.settings import api_settings  # type: ignore
+from myapp.permissions import IsStaffUser
+from myapp import metrics, profiling
+
+
+class PrometheusRenderer(BaseRenderer):
+    """
+    Renders a metrics snapshot in the Prometheus text format, for
+    `Accept: text/plain` or `?format=prometheus`.
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if 'counters' not in data:
+            # An error, e.g. for a non-staff user
+            return ''.join(f'# {key}: {value}\n' for key, value in data.items())
+        return metrics.prometheus_text(data)
+
+
+class MetricsView(APIView):
+    """
+    API view exposing the process's internal counters, e.g. catalog cache hits and misses.
+    Only staff can read metrics.
+    """
+    permission_classes = [IsStaffUser]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+
+class SlowQueryView(APIView):
+    """
+    API view listing the slow queries caught by request profiling, most recent first.
+    Only staff can read them.
+    """
+    permission_classes = [IsStaffUser]
+
+    def get(self, request):
+        return Response(profiling.slow_queries())
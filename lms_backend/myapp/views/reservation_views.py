@@ -2,32 +2,66 @@ from rest_framework.views import APIView  # type: ignore
 from rest_framework.response import Response  # type: ignore
 from rest_framework import status  # type: ignore
 from rest_framework.permissions import IsAuthenticated  # type: ignore
-from myapp.models import Reservations, User, BookCopies
+from rest_framework.exceptions import NotFound  # type: ignore
+from myapp.models import Book, BookCopies, Reservations, User
+from myapp.circulation import CopyUnavailable, bulk_checkout, bulk_return, checkout, extend, mark_returned
 from myapp.serializers.reservation_serializers import ReservationSerializer
 from datetime import timedelta, datetime
 from myapp.permissions import IsStaffUser
+from myapp.pagination import ReservationPagination
+from myapp import conditional, streaming
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Largest number of items accepted by the bulk checkout and return endpoints
+MAX_BULK_ITEMS = 100
+
+
+def parse_checkout(data):
+    """
+    Validate a checkout request and return (email, book_id, copy_id, start_date).
+    Raises ValueError with a message for the client if the request is invalid.
+    """
+    for field in ["email", "book_id", "start_date"]:
+        if not data.get(field):
+            raise ValueError(f"{field} is required.")
+
+    try:
+        book_id = int(data["book_id"])
+        copy_id = data.get("copy_id")
+        copy_id = int(copy_id) if copy_id not in (None, "") else None
+    except (TypeError, ValueError):
+        raise ValueError("book_id and copy_id must be integers.")
+
+    try:
+        start_date = datetime.strptime(str(data["start_date"]), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+
+    return data["email"], book_id, copy_id, start_date
+
 
 class ReservationListView(APIView):
     """
     API view to handle creating, retrieving, and updating reservations.
     """
     permission_classes = [IsAuthenticated]
+    throttle_scope = {'POST': 'checkout', 'PUT': 'checkout'}
 
     def get(self, request):
         """
         Retrieve reservations with optional filtering by `book_id` and `returned`.
         Staff sees all reservations, customers see only their own.
+        Results are keyset-paginated; pass `paginate=false` for the full list,
+        or `stream=json` / `stream=ndjson` to stream it for large exports.
+        Responses carry an ETag and Last-Modified for conditional requests.
         """
         try:
             # Staff sees all, customer sees only their own
-            if request.user.is_staff:
-                reservations = Reservations.objects.all()
-            else:
-                reservations = Reservations.objects.filter(user=request.user)
+            reservations = Reservations.objects.select_related('user', 'book', 'copy')
+            if not request.user.is_staff:
+                reservations = reservations.filter(user=request.user)
 
             book_id = request.query_params.get("book_id", None)
             returned = request.query_params.get("returned", None)
@@ -41,34 +75,57 @@ class ReservationListView(APIView):
                 returned_bool = returned.lower() == "true"
                 reservations = reservations.filter(copy__is_available=returned_bool)
 
-            serializer = ReservationSerializer(reservations, many=True)
-            return Response(serializer.data, status=200)
+            try:
+                stream_format = streaming.requested_format(request)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if stream_format:
+                return streaming.stream_response(
+                    reservations, ReservationPagination.ordering,
+                    lambda rows: ReservationSerializer(rows, many=True).data, stream_format,
+                )
+
+            paginator = ReservationPagination()
+
+            # Answer conditional requests from the timestamps of what each row serializes
+            versions = paginator.page_values(
+                reservations, request,
+                'pk', 'updated_at', 'copy__updated_at', 'book__updated_at', 'user__email',
+            )
+            scope = f"{request.user.pk}|{request.get_full_path()}"
+            etag, last_modified = conditional.validators(versions, scope=scope)
+            response = conditional.not_modified(request, etag, last_modified, private=True)
+            if response is not None:
+                return response
+
+            page = paginator.paginate_queryset(reservations, request, view=self)
+            if page is None:
+                serializer = ReservationSerializer(reservations, many=True)
+                response = Response(serializer.data, status=200)
+            else:
+                serializer = ReservationSerializer(page, many=True)
+                response = paginator.get_paginated_response(serializer.data)
+            return conditional.add_validators(response, etag, last_modified, private=True)
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Error fetching reservations: {e}")
             return Response({"error": str(e)}, status=500)
 
     def post(self, request):
         """
-        Create a new reservation. When a reservation is created,
-        set the copy's is_available to False, indicating it's checked out.
+        Create a new reservation, checking out the copy in the same transaction.
+        If `copy_id` is omitted, a free copy of the book is picked.
         Only staff can create reservations.
         """
         # Only staff can create reservations
         if not request.user.is_staff:
             return Response({"error": "Only staff can create reservations"}, status=status.HTTP_403_FORBIDDEN)
 
-        required_fields = ["email", "book_id", "copy_id", "start_date"]
-        for field in required_fields:
-            if not request.data.get(field):
-                return Response(
-                    {"error": f"{field} is required."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        email = request.data["email"]
-        book_id = request.data["book_id"]
-        copy_id = request.data["copy_id"]
-        start_date = request.data["start_date"]
+        try:
+            email, book_id, copy_id, start_date_obj = parse_checkout(request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             user = User.objects.get(email=email)
@@ -79,37 +136,14 @@ class ReservationListView(APIView):
             )
 
         try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-        except ValueError:
-            return Response(
-                {"error": "Invalid date format. Use YYYY-MM-DD."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        due_date = start_date_obj + timedelta(days=7)
-        data = {
-            "user": user.user_id,
-            "book": book_id,
-            "copy": copy_id,
-            "start_date": start_date_obj,
-            "due_date": due_date,
-            # 'returned' removed from the model, no need to set it
-        }
-
-        serializer = ReservationSerializer(data=data)
-        if serializer.is_valid():
-            reservation = serializer.save()
+            reservation = checkout(user, book_id, start_date_obj, copy_id=copy_id)
+        except (Book.DoesNotExist, BookCopies.DoesNotExist) as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except CopyUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
-            # Mark the copy as no longer available since it's reserved
-            copy = BookCopies.objects.get(pk=copy_id)
-            copy.is_available = False
-            copy.save()
-
-            # Re-serialize to reflect updated data
-            reservation_serializer = ReservationSerializer(reservation)
-            return Response(reservation_serializer.data, status=status.HTTP_201_CREATED)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        reservation_serializer = ReservationSerializer(reservation)
+        return Response(reservation_serializer.data, status=status.HTTP_201_CREATED)
 
     def put(self, request, reservation_id):
         """
@@ -129,8 +163,7 @@ class ReservationListView(APIView):
 
         # Make the copy available again, which implies the book is returned
         copy = reservation.copy
-        copy.is_available = True
-        copy.save()
+        mark_returned(copy)
 
         serializer = ReservationSerializer(reservation)
         return Response(
@@ -145,12 +178,130 @@ class ReservationListView(APIView):
 
 
 
+class ReservationBulkCheckoutView(APIView):
+    """
+    API view to check out many copies in one request, e.g. a cart at the desk.
+    Only staff can create reservations.
+    """
+    permission_classes = [IsStaffUser]
+    throttle_scope = 'checkout'
+
+    def post(self, request):
+        """
+        Create a reservation for each item of `reservations`. Items take the
+        same fields as a single checkout; each gets its own status and result.
+        """
+        items = request.data.get("reservations")
+        if not isinstance(items, list) or not items:
+            return Response({"error": "reservations must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BULK_ITEMS:
+            return Response(
+                {"error": f"At most {MAX_BULK_ITEMS} reservations per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(items)
+        parsed = {}
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Each reservation must be an object.")
+                parsed[index] = parse_checkout(item)
+            except ValueError as e:
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "error": str(e)}
+
+        users = User.objects.in_bulk({email for email, _, _, _ in parsed.values()}, field_name="email")
+        loans = []
+        for index, (email, book_id, copy_id, start_date) in parsed.items():
+            if email not in users:
+                results[index] = {
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "error": "User with the given email does not exist.",
+                }
+                continue
+            loans.append((index, (users[email], book_id, copy_id, start_date)))
+
+        try:
+            outcomes = bulk_checkout([loan for _, loan in loans])
+        except CopyUnavailable as e:
+            # The whole batch was rolled back; the client can safely retry it
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+        for (index, _), outcome in zip(loans, outcomes):
+            if isinstance(outcome, Reservations):
+                results[index] = {
+                    "status": status.HTTP_201_CREATED,
+                    "reservation": ReservationSerializer(outcome).data,
+                }
+            elif isinstance(outcome, CopyUnavailable):
+                results[index] = {"status": status.HTTP_409_CONFLICT, "error": str(outcome)}
+            else:
+                results[index] = {"status": status.HTTP_404_NOT_FOUND, "error": str(outcome)}
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class ReservationBulkReturnView(APIView):
+    """
+    API view to mark many reservations as returned in one request.
+    Only staff can mark books as returned.
+    """
+    permission_classes = [IsStaffUser]
+    throttle_scope = 'checkout'
+
+    def post(self, request):
+        """
+        Return the copy of each reservation in `reservation_ids`, reporting a
+        status per id in the order given.
+        """
+        ids = request.data.get("reservation_ids")
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "reservation_ids must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_BULK_ITEMS:
+            return Response(
+                {"error": f"At most {MAX_BULK_ITEMS} reservations per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            ids = [int(reservation_id) for reservation_id in ids]
+        except (TypeError, ValueError):
+            return Response({"error": "reservation_ids must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        reservations = Reservations.objects.select_related("user", "book", "copy").in_bulk(ids)
+        returned = bulk_return(list(reservations.values()))
+
+        results = []
+        for reservation_id in ids:
+            if reservation_id not in reservations:
+                results.append({
+                    "reservation_id": reservation_id,
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "error": "Reservation not found.",
+                })
+            elif reservation_id in returned:
+                returned.discard(reservation_id)
+                results.append({
+                    "reservation_id": reservation_id,
+                    "status": status.HTTP_200_OK,
+                    "reservation": ReservationSerializer(reservations[reservation_id]).data,
+                })
+            else:
+                results.append({
+                    "reservation_id": reservation_id,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "error": "This reservation's copy is already available (already returned).",
+                })
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 class ReservationDetailView(APIView):
     """
     API view to mark reservations as returned.
     Only staff can mark books as returned.
     """
     permission_classes = [IsStaffUser]
+    throttle_scope = {'PUT': 'checkout'}
 
     def put(self, request, reservation_id):
         try:
@@ -167,8 +318,7 @@ class ReservationDetailView(APIView):
             )
 
         # Mark the copy as available
-        copy.is_available = True
-        copy.save()
+        mark_returned(copy)
 
         return Response({"message": "Reservation updated successfully.", "copy_id": copy.copy_id}, status=status.HTTP_200_OK)
 
@@ -179,6 +329,7 @@ class ExtendReservationView(APIView):
     Staff can extend any reservation, customers can only extend their own.
     """
     permission_classes = [IsAuthenticated]
+    throttle_scope = {'PUT': 'checkout'}
 
     def put(self, request, reservation_id):
         """
@@ -194,8 +345,7 @@ class ExtendReservationView(APIView):
             return Response({"error": "Permission denied"}, status=403)
 
         # Extend the due_date by 7 days
-        reservation.due_date += timedelta(days=7)
-        reservation.save()
+        extend(reservation, timedelta(days=7))
 
         serializer = ReservationSerializer(reservation)
         return Response(serializer.data, status=200)
@@ -1,34 +1,43 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer 
+from django.contrib.auth.models import update_last_login
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.views import TokenRefreshView
+from myapp.authentication import tokens_for
 from myapp.serializers.signin_serializers import UserSignInSerializer
 
 from rest_framework.permissions import AllowAny
 
 class SignInAPIView(APIView):
     permission_classes = [AllowAny]  # Anyone can access this endpoint to sign in.
+    throttle_scope = 'sign-in'
     
     def post(self, request):
         serializer = UserSignInSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            # Generate tokens for the authenticated user
-            token_serializer = TokenObtainPairSerializer(data={
-                'email': user.email,
-                'password': request.data.get('password')
-            })
-            if token_serializer.is_valid():
-                return Response({
-                    'access': token_serializer.validated_data['access'],
-                    'refresh': token_serializer.validated_data['refresh'],
-                    'user': {
-                        'email': user.email,
-                        'name': user.name,
-                        'is_staff': user.is_staff
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response(token_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # The serializer already checked the password; mint the tokens
+            # directly rather than authenticating (and hashing) a second time
+            refresh = tokens_for(user)
+            if jwt_settings.UPDATE_LAST_LOGIN:
+                update_last_login(None, user)
+            return Response({
+                'access': str(refresh.access_token),
+                'refresh': str(refresh),
+                'user': {
+                    'email': user.email,
+                    'name': user.name,
+                    'is_staff': user.is_staff
+                }
+            }, status=status.HTTP_200_OK)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TokenRefreshAPIView(TokenRefreshView):
+    """
+    Exchange a refresh token for a new access token (and a rotated refresh
+    token), throttled like sign-in.
+    """
+    throttle_scope = 'sign-in'
@@ -1,7 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from myapp.authentication import tokens_for
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import AllowAny
 from myapp.utils import sanitize_string
@@ -14,6 +14,7 @@ User = get_user_model()
 
 class SignupAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'sign-in'
 
     def post(self, request):
         # Extract and sanitize fields
@@ -37,7 +38,7 @@ class SignupAPIView(APIView):
             return Response({"error": "Failed to create user"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for(user)
 
         # Return success response
         return Response({
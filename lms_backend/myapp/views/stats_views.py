@@ -0,0 +1,27 @@
+from rest_framework.views import APIView  # type: ignore
+from rest_framework.response import Response  # type: ignore
+from rest_framework import status  # type: ignore
+from django.utils import timezone  # type: ignore
+from myapp.permissions import IsStaffUser
+from myapp import stats
+
+
+class DashboardView(APIView):
+    """
+    API view for the staff dashboard: copies and loans out, overdue loans,
+    copies per genre and the most borrowed titles. Only staff can read it.
+    """
+    permission_classes = [IsStaffUser]
+
+    def get(self, request):
+        """
+        Retrieve the dashboard figures, read from the rollup tables. `top`
+        sets how many titles are listed (10 by default, at most 100).
+        """
+        try:
+            top = int(request.query_params.get("top", 10))
+        except ValueError:
+            return Response({"error": "top must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= top <= 100:
+            return Response({"error": "top must be between 1 and 100."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats.dashboard(timezone.localdate(), top=top))
@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated  # type: ignore
 from rest_framework import status  # type: ignore
 from myapp.models import User
 from myapp.permissions import IsStaffUser
+from myapp.pagination import UserPagination
 
 
 class UserDetailView(APIView):
@@ -78,7 +79,14 @@ class UserListView(APIView):
         """
         Retrieve a list of all users with is_staff = False.
         Only staff can list users.
+        Results are keyset-paginated; pass `paginate=false` for the full list.
         """
-        users = User.objects.filter(is_staff=False)
-        user_list = [{"id": user.pk, "name": user.name, "email": user.email} for user in users]
-        return Response(user_list, status=200)
+        users = User.objects.filter(is_staff=False).only('user_id', 'name', 'email')
+        paginator = UserPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+        if page is None:
+            user_list = [{"id": user.pk, "name": user.name, "email": user.email} for user in users]
+            return Response(user_list, status=200)
+
+        user_list = [{"id": user.pk, "name": user.name, "email": user.email} for user in page]
+        return paginator.get_paginated_response(user_list)
@@ -0,0 +1,71 @@
+from rest_framework.views import APIView  # type: ignore
+from rest_framework.response import Response  # type: ignore
+from rest_framework import status  # type: ignore
+from rest_framework.permissions import IsAuthenticated  # type: ignore
+from myapp.models import Book, Waitlist
+from myapp.circulation import AlreadyWaiting, CopyAvailable, join_waitlist, leave_waitlist, with_positions
+from myapp.serializers.reservation_serializers import WaitlistSerializer
+from myapp.pagination import WaitlistPagination
+
+
+class BookWaitlistView(APIView):
+    """
+    API view for readers to join or leave the waitlist of a book.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = {'POST': 'checkout', 'DELETE': 'checkout'}
+
+    def post(self, request, book_id):
+        """
+        Join the waitlist of a book with no copies available. When a copy is
+        returned it is held for the reader first in line for HOLD_PERIOD.
+        """
+        try:
+            entry = join_waitlist(request.user, book_id)
+        except Book.DoesNotExist as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except (AlreadyWaiting, CopyAvailable) as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+        entry = with_positions(Waitlist.objects.select_related('user', 'book')).get(pk=entry.pk)
+        return Response(WaitlistSerializer(entry).data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, book_id):
+        """
+        Leave the waitlist of a book; a copy on hold passes to the next reader.
+        """
+        if not leave_waitlist(request.user, book_id):
+            return Response({"error": "You are not on the waitlist for this book."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class WaitlistListView(APIView):
+    """
+    API view to list waitlist entries with their place in line.
+    Staff sees all entries, customers see only their own.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Retrieve waitlist entries, optionally filtered by `book_id` and by
+        `on_hold`. Results are keyset-paginated; pass `paginate=false` for
+        the full list.
+        """
+        entries = Waitlist.objects.select_related('user', 'book')
+        if not request.user.is_staff:
+            entries = entries.filter(user=request.user)
+
+        book_id = request.query_params.get("book_id", None)
+        on_hold = request.query_params.get("on_hold", None)
+        if book_id:
+            entries = entries.filter(book_id=book_id)
+        if on_hold is not None:
+            entries = entries.filter(book_lent=on_hold.lower() == "true")
+
+        entries = with_positions(entries)
+        paginator = WaitlistPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        if page is None:
+            return Response(WaitlistSerializer(entries.order_by('queue_id'), many=True).data, status=200)
+        return paginator.get_paginated_response(WaitlistSerializer(page, many=True).data)
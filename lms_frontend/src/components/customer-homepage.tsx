@@ -56,7 +56,7 @@ function CustomerHomePageContent() {
       try {
         setIsLoading(true)
         setError(null)
-        const response = await api.get<Book[]>(`/api/books/`)
+        const response = await api.get<Book[]>(`/api/books/?paginate=false`)
         setFeaturedBooks(response.data.slice(0, 6)) // Assuming we want to feature the first 4 books
       } catch (error) {
         console.error("Error fetching featured books:", error)
@@ -87,7 +87,7 @@ function CustomerHomePageContent() {
       if (searchQuery.length > 2) {
         setIsSearching(true)
         try {
-          const response = await api.get<Book[]>(`/api/books/?q=${searchQuery}`)
+          const response = await api.get<Book[]>(`/api/books/?paginate=false&q=${searchQuery}`)
           setSearchResults(response.data.slice(0, 5)) // Limit to 5 results
           setHasSearched(true)
         } catch (error) {
@@ -125,7 +125,7 @@ function BookReservationPageContent() {
 
     const fetchReservations = async () => {
       try {
-        const response = await api.get<Reservation[]>(`/api/reservations/?book_id=${bookId}&returned=false`);
+        const response = await api.get<Reservation[]>(`/api/reservations/?paginate=false&book_id=${bookId}&returned=false`);
         setReservations(response.data);
       } catch (error) {
         console.error('Error fetching reservations:', error);
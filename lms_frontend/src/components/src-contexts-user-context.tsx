@@ -49,6 +49,10 @@ export const UserProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
 
       const data = await response.json();
       localStorage.setItem('accessToken', data.access);
+      // Refresh tokens are rotated: the one just sent is now blacklisted
+      if (data.refresh) {
+        localStorage.setItem('refreshToken', data.refresh);
+      }
       return data.access;
     } catch (error) {
       console.error('Error refreshing token:', error);
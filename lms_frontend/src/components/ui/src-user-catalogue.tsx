@@ -61,7 +61,7 @@ function CatalogueContent() {
       try {
         setIsLoading(true);
         setError(null);
-        const response = await api.get<Book[]>(`/api/books/`);
+        const response = await api.get<Book[]>(`/api/books/?paginate=false`);
         setBooks(response.data);
         const fetchedGenres = [...new Set(response.data.map(book => book.genre_name))];
         setGenres(fetchedGenres);
@@ -52,7 +52,7 @@ function UsersContent() {
     try {
       setIsLoading(true);
       setError(null);
-      const response = await api.get<UserData[]>(`/api/users/`);
+      const response = await api.get<UserData[]>(`/api/users/?paginate=false`);
       setUsers(response.data);
     } catch (error) {
       console.error("Error fetching users:", error);
@@ -19,7 +19,7 @@ export function useBookSearch() {
       if (searchQuery.length > 2) {
         setIsSearching(true)
         try {
-          const response = await api.get<Book[]>(`/api/books/?q=${searchQuery}`)
+          const response = await api.get<Book[]>(`/api/books/?paginate=false&q=${searchQuery}`)
           setRecommendations(response.data.slice(0, 5)) // Limit to 5 recommendations
           setHasSearched(true)
         } catch (error) {